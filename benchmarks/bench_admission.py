@@ -0,0 +1,49 @@
+import threading
+import time
+
+from wechat.admission import AdmissionController
+from wechat.core import Event
+from wechat.events import EMOJI_MESSAGE, TRANSFER_MESSAGE
+
+EMOJIS = 5000
+TRANSFERS = 10
+HANDLER_TIME = 0.001
+
+
+class Sink:
+    """代替WeChat，记录每个事件从入队到开始处理的时间"""
+
+    def __init__(self):
+        self.admission = None
+        self.handled = {EMOJI_MESSAGE: 0, TRANSFER_MESSAGE: 0}
+        self.transfer_delays = []
+        self.lock = threading.Lock()
+
+    def process_event(self, event: Event) -> None:
+        with self.lock:
+            self.handled[event.type] += 1
+            if event.type == TRANSFER_MESSAGE:
+                self.transfer_delays.append(time.monotonic() - event.data["queued_at"])
+        time.sleep(HANDLER_TIME)
+
+
+def run(max_workers: int = 8) -> None:
+    sink = Sink()
+    admission = AdmissionController(sink, max_workers=max_workers)
+    for i in range(EMOJIS):
+        admission.submit(Event(EMOJI_MESSAGE, 1, {"msgid": i}))
+    for i in range(TRANSFERS):
+        admission.submit(Event(TRANSFER_MESSAGE, 1, {"msgid": i, "queued_at": time.monotonic()}))
+    admission.drain()
+    admission.close()
+
+    stats = admission.stats()
+    delays = sorted(sink.transfer_delays)
+    print(f"transfers handled {sink.handled[TRANSFER_MESSAGE]}/{TRANSFERS}  "
+          f"max delay {delays[-1] * 1000:.1f} ms  median {delays[len(delays) // 2] * 1000:.1f} ms")
+    print(f"emojis    handled {sink.handled[EMOJI_MESSAGE]}/{EMOJIS}  "
+          f"shed {stats['low']['shed']} ({stats['low']['shed'] / EMOJIS:.0%})  dropped {stats['low']['dropped']}")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,76 @@
+import copy
+import json
+import threading
+import time
+import tracemalloc
+
+from wechat.core import Event, ReqData
+from wechat.utils import parse_event, parse_xml
+
+MESSAGE = json.dumps({
+    "type": 11046,
+    "data": {
+        "at_user_list": [],
+        "from_wxid": "wxid_sender0000001",
+        "is_pc": 0,
+        "msg": "hello world",
+        "msgid": "1234567890123456789",
+        "raw_msg": "<msgsource><signature>v1_abcdef</signature></msgsource>",
+        "room_wxid": "12345678901@chatroom",
+        "timestamp": 1700000000,
+        "to_wxid": "wxid_receiver00001",
+        "wx_type": 1
+    }
+}, ensure_ascii=False)
+
+
+def legacy_event(raw: str) -> dict:
+    event = json.loads(raw)
+    event["client_id"] = 1
+    data = copy.deepcopy(event)
+    for field in ["raw_msg"]:
+        try:
+            data["data"][field] = parse_xml(data["data"][field])
+        except Exception:
+            pass
+    return data
+
+
+def slots_event(raw: str) -> Event:
+    return parse_event(Event.from_dict(json.loads(raw), 1))
+
+
+class LegacyReqData:
+    def __init__(self, msg_type, data):
+        self.msg_type = msg_type
+        self.request_data = data
+        self.response_message = None
+        self.wait_event = threading.Event()
+
+
+def legacy_request() -> LegacyReqData:
+    return LegacyReqData(11028, {})
+
+
+def slots_request() -> ReqData:
+    return ReqData(11028, {})
+
+
+def measure(name: str, func, *args, n: int = 20000) -> None:
+    keep = []
+    tracemalloc.start()
+    start = time.perf_counter()
+    for _ in range(n):
+        keep.append(func(*args))
+    elapsed = time.perf_counter() - start
+    blocks = sum(stat.count for stat in tracemalloc.take_snapshot().statistics("filename"))
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{name:<16} {blocks / n:>6.1f} allocs/obj  {current / n:>8.1f} bytes/obj  {elapsed / n * 1e6:>7.2f} us/obj")
+
+
+if __name__ == "__main__":
+    measure("legacy event", legacy_event, MESSAGE)
+    measure("slots event", slots_event, MESSAGE)
+    measure("legacy request", legacy_request)
+    measure("slots request", slots_request)
@@ -0,0 +1,34 @@
+import binascii
+import json
+import time
+
+from wechat.template import CommandTemplate
+
+CONTENT = "【公告】本周六晚8点直播，欢迎大家准时参加！" * 4
+
+
+def legacy_encode(to_wxid: str) -> bytes:
+    data = {"type": 11036, "data": {"to_wxid": to_wxid, "content": CONTENT}}
+    return binascii.hexlify(json.dumps(data, ensure_ascii=False).encode("utf-8"))
+
+
+TEMPLATE = CommandTemplate(11036, {"content": CONTENT}, ["to_wxid"])
+
+
+def template_encode(to_wxid: str) -> bytes:
+    return TEMPLATE.render(to_wxid=to_wxid)
+
+
+def measure(name: str, func, n: int = 200000) -> None:
+    wxids = [f"wxid_{i:014d}" for i in range(1000)]
+    start = time.process_time()
+    for i in range(n):
+        func(wxids[i % 1000])
+    elapsed = time.process_time() - start
+    print(f"{name:<10} {n / elapsed:>10.0f} encodes/s  {elapsed / n * 1e6:>6.2f} us CPU/send")
+
+
+if __name__ == "__main__":
+    assert json.loads(binascii.unhexlify(legacy_encode("a"))) == json.loads(binascii.unhexlify(template_encode("a")))
+    measure("legacy", legacy_encode)
+    measure("template", template_encode)
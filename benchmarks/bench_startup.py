@@ -0,0 +1,51 @@
+import socket
+import sys
+import threading
+import time
+
+import psutil
+
+from wechat.utils import get_processes, wait_for_port
+
+
+def attrs_get_processes(process_name: str) -> list:
+    process_name = process_name.lower()
+    return [process for process in psutil.process_iter(attrs=["name"])
+            if (process.info["name"] or "").lower() == process_name]
+
+
+def measure(name: str, func, *args, n: int = 20) -> None:
+    start = time.perf_counter()
+    for _ in range(n):
+        func(*args)
+    print(f"{name:<24} {(time.perf_counter() - start) / n * 1000:>8.2f} ms")
+
+
+def delayed_listener(delay: float) -> socket.socket:
+    listener = socket.socket()
+    listener.bind(("127.0.0.1", 0))
+
+    def listen():
+        time.sleep(delay)
+        listener.listen()
+
+    threading.Thread(target=listen, daemon=True).start()
+    return listener
+
+
+if __name__ == "__main__":
+    # process_iter(attrs=...)没有更快，get_processes保留逐个name()的写法
+    measure("attrs get_processes", attrs_get_processes, "hook.exe")
+    measure("get_processes", get_processes, "hook.exe")
+
+    listener = delayed_listener(0.2)
+    start = time.perf_counter()
+    wait_for_port("127.0.0.1", listener.getsockname()[1], 5)
+    print(f"{'port ready (0.2s delay)':<24} {(time.perf_counter() - start) * 1000:>8.2f} ms")
+
+    if "--wechat" in sys.argv:
+        from wechat.core import WeChat
+
+        wechat = WeChat()
+        for phase, elapsed in wechat.startup_timings.items():
+            print(f"{'startup ' + phase:<24} {elapsed * 1000:>8.2f} ms")
@@ -0,0 +1,175 @@
+import collections
+import concurrent.futures
+import heapq
+import itertools
+import threading
+import time
+import typing
+
+from wechat.core import Event
+from wechat.events import (
+    TEXT_MESSAGE,
+    IMAGE_MESSAGE,
+    VIDEO_MESSAGE,
+    FILE_MESSAGE,
+    CARD_MESSAGE,
+    EMOJI_MESSAGE,
+    LINK_CARD_MESSAGE
+)
+from wechat.logger import logger
+
+
+class PendingAck:
+    __slots__ = ("id", "future", "content", "deadline")
+
+    def __init__(self, id: int, content: typing.Optional[str], deadline: float):
+        self.id = id
+        self.future = concurrent.futures.Future()
+        self.content = content
+        self.deadline = deadline
+
+
+class AckTracker:
+
+    def __init__(self, wechat, timeout: float = 30, timeout_for_self_info: typing.Optional[int] = None):
+        self.wechat = wechat
+        self.timeout = timeout
+        self.timeout_for_self_info = timeout_for_self_info
+        self.confirmed = 0
+        self.expired = 0
+        self.__ids = itertools.count()
+        self.__pending: typing.Dict[typing.Tuple[int, str, int], typing.Deque[PendingAck]] = {}
+        self.__deadlines: typing.List[typing.Tuple[float, int, tuple, PendingAck]] = []
+        self.__cond = threading.Condition()
+        wechat.use(self)
+        self.__thread = threading.Thread(target=self.__sweep, daemon=True)
+        self.__thread.start()
+
+    def __track(self, client_id: int, to_wxid: str, msg_type: int, content: typing.Optional[str],
+                send: typing.Callable[[], dict], timeout: typing.Optional[float]) -> concurrent.futures.Future:
+        self.wechat.self_wxid(client_id, self.timeout_for_self_info)
+        key = (client_id, to_wxid, msg_type)
+        pending = PendingAck(next(self.__ids), content, time.monotonic() + (timeout or self.timeout))
+        with self.__cond:
+            self.__pending.setdefault(key, collections.deque()).append(pending)
+            heapq.heappush(self.__deadlines, (pending.deadline, pending.id, key, pending))
+            self.__cond.notify()
+        try:
+            send()
+        except Exception as e:
+            if self.__discard(key, pending):
+                pending.future.set_exception(e)
+        return pending.future
+
+    def __discard(self, key: tuple, pending: PendingAck) -> bool:
+        """移出等待队列，返回是否由本次调用移出（已被确认的返回False）"""
+        with self.__cond:
+            queue = self.__pending.get(key)
+            if queue is not None and pending in queue:
+                queue.remove(pending)
+                if not queue:
+                    del self.__pending[key]
+                return True
+            return False
+
+    def __sweep(self) -> None:
+        while True:
+            with self.__cond:
+                while not self.__deadlines or self.__deadlines[0][0] > time.monotonic():
+                    self.__cond.wait(self.__deadlines[0][0] - time.monotonic() if self.__deadlines else None)
+                _, _, key, pending = heapq.heappop(self.__deadlines)
+            # 只有仍在等待队列中的才过期，已被__call__取出的由其设置结果
+            if self.__discard(key, pending):
+                self.expired += 1
+                pending.future.set_exception(TimeoutError(f"no outgoing message event for {key}"))
+
+    def __call__(self, wechat, event: Event) -> Event:
+        client_id = event["client_id"]
+        data = event["data"]
+        if not self.__pending or not isinstance(data, dict):
+            return event
+        if data.get("from_wxid") != wechat.self_wxids.get(client_id):
+            return event
+
+        key = (client_id, data.get("room_wxid") or data.get("to_wxid"), event["type"])
+        content = data.get("msg", data.get("content"))
+        with self.__cond:
+            queue = self.__pending.get(key)
+            if not queue:
+                return event
+            for pending in queue:
+                if pending.content is None or pending.content == content:
+                    queue.remove(pending)
+                    if not queue:
+                        del self.__pending[key]
+                    break
+            else:
+                return event
+        self.confirmed += 1
+        pending.future.set_result(event)
+        return event
+
+    def send_text(self, client_id: int, to_wxid: str, content: str,
+                  timeout: typing.Optional[float] = None) -> concurrent.futures.Future:
+        """发送文本消息，返回在收到自己发出的消息事件时完成的Future"""
+        return self.__track(client_id, to_wxid, TEXT_MESSAGE, content,
+                            lambda: self.wechat.send_text(client_id, to_wxid, content), timeout)
+
+    def send_room_at(self, client_id: int, to_wxid: str, content: str, at_list: typing.List[str],
+                     timeout: typing.Optional[float] = None) -> concurrent.futures.Future:
+        """发送群at消息（带确认）"""
+        return self.__track(client_id, to_wxid, TEXT_MESSAGE, None,
+                            lambda: self.wechat.send_room_at(client_id, to_wxid, content, at_list), timeout)
+
+    def send_card(self, client_id: int, to_wxid: str, card_wxid: str,
+                  timeout: typing.Optional[float] = None) -> concurrent.futures.Future:
+        """发送名片消息（带确认）"""
+        return self.__track(client_id, to_wxid, CARD_MESSAGE, None,
+                            lambda: self.wechat.send_card(client_id, to_wxid, card_wxid), timeout)
+
+    def send_link_card(self, client_id: int, to_wxid: str, title: str, desc: str, url: str, image_url: str,
+                       timeout: typing.Optional[float] = None) -> concurrent.futures.Future:
+        """发送链接卡片消息（带确认）"""
+        return self.__track(client_id, to_wxid, LINK_CARD_MESSAGE, None,
+                            lambda: self.wechat.send_link_card(client_id, to_wxid, title, desc, url, image_url),
+                            timeout)
+
+    def send_image(self, client_id: int, to_wxid: str, file: str,
+                   timeout: typing.Optional[float] = None) -> concurrent.futures.Future:
+        """发送图片消息（带确认）"""
+        return self.__track(client_id, to_wxid, IMAGE_MESSAGE, None,
+                            lambda: self.wechat.send_image(client_id, to_wxid, file), timeout)
+
+    def send_video(self, client_id: int, to_wxid: str, file: str,
+                   timeout: typing.Optional[float] = None) -> concurrent.futures.Future:
+        """发送视频消息（带确认）"""
+        return self.__track(client_id, to_wxid, VIDEO_MESSAGE, None,
+                            lambda: self.wechat.send_video(client_id, to_wxid, file), timeout)
+
+    def send_file(self, client_id: int, to_wxid: str, file: str,
+                  timeout: typing.Optional[float] = None) -> concurrent.futures.Future:
+        """发送文件消息（带确认）"""
+        return self.__track(client_id, to_wxid, FILE_MESSAGE, None,
+                            lambda: self.wechat.send_file(client_id, to_wxid, file), timeout)
+
+    def send_emotion(self, client_id: int, to_wxid: str, file: str,
+                     timeout: typing.Optional[float] = None) -> concurrent.futures.Future:
+        """发送表情消息（带确认）"""
+        return self.__track(client_id, to_wxid, EMOJI_MESSAGE, None,
+                            lambda: self.wechat.send_emotion(client_id, to_wxid, file), timeout)
+
+    @staticmethod
+    def wait_all(futures: typing.Iterable[concurrent.futures.Future],
+                 timeout: typing.Optional[float] = None) -> typing.Tuple[int, int]:
+        """等待一批发送确认，返回(成功数, 失败数)"""
+        done, not_done = concurrent.futures.wait(list(futures), timeout)
+        failed = len(not_done) + sum(1 for future in done if future.exception() is not None)
+        succeeded = len(done) + len(not_done) - failed
+        if failed:
+            logger.warning(f"{failed} sends not confirmed")
+        return succeeded, failed
+
+    def stats(self) -> dict:
+        with self.__cond:
+            pending = sum(len(queue) for queue in self.__pending.values())
+        return {"pending": pending, "confirmed": self.confirmed, "expired": self.expired}
@@ -0,0 +1,175 @@
+import collections
+import random
+import threading
+import time
+import traceback
+import typing
+
+from wechat.core import Event
+from wechat.events import (
+    WECHAT_CONNECT_MESSAGE,
+    USER_LOGIN_MESSAGE,
+    USER_LOGOUT_MESSAGE,
+    FRIEND_REQUEST_MESSAGE,
+    TRANSFER_MESSAGE,
+    QR_CODE_PAYMENT_MESSAGE,
+    EMOJI_MESSAGE,
+    CHAT_CHANGE_MESSAGE,
+    WINDOW_HANDLE_CHANGE_MESSAGE
+)
+from wechat.logger import logger
+
+HIGH = 0
+NORMAL = 1
+LOW = 2
+
+DEFAULT_PRIORITIES = {
+    # 无类型的事件（客户端断开）和连接/登录事件影响客户端状态，优先处理
+    None: HIGH,
+    WECHAT_CONNECT_MESSAGE: HIGH,
+    USER_LOGIN_MESSAGE: HIGH,
+    USER_LOGOUT_MESSAGE: HIGH,
+    FRIEND_REQUEST_MESSAGE: HIGH,
+    TRANSFER_MESSAGE: HIGH,
+    QR_CODE_PAYMENT_MESSAGE: HIGH,
+    EMOJI_MESSAGE: LOW,
+    CHAT_CHANGE_MESSAGE: LOW,
+    WINDOW_HANDLE_CHANGE_MESSAGE: LOW
+}
+
+
+class ClassMetrics:
+    __slots__ = ("admitted", "processed", "dropped", "shed", "delayed", "total_delay", "max_delay")
+
+    def __init__(self):
+        self.admitted = 0
+        self.processed = 0
+        self.dropped = 0
+        self.shed = 0
+        self.delayed = 0
+        self.total_delay = 0.0
+        self.max_delay = 0.0
+
+
+class AdmissionController:
+
+    def __init__(
+            self,
+            wechat,
+            priorities: typing.Optional[typing.Dict[typing.Optional[int], int]] = None,
+            default_priority: int = NORMAL,
+            queue_sizes: typing.Sequence[int] = (10000, 10000, 2000),
+            sample_rates: typing.Sequence[float] = (1.0, 1.0, 0.1),
+            shed_watermark: float = 0.5,
+            delay_threshold: float = 1,
+            max_workers: int = 8
+    ):
+        self.wechat = wechat
+        self.priorities = dict(DEFAULT_PRIORITIES if priorities is None else priorities)
+        self.default_priority = default_priority
+        self.queue_sizes = list(queue_sizes)
+        # 积压超过shed_watermark时，各优先级按sample_rates的比例采样接收
+        self.sample_rates = list(sample_rates)
+        self.shed_watermark = shed_watermark
+        self.delay_threshold = delay_threshold
+        self.queues: typing.List[typing.Deque[typing.Tuple[float, Event]]] = [
+            collections.deque() for _ in self.queue_sizes
+        ]
+        self.metrics = [ClassMetrics() for _ in self.queue_sizes]
+        self.__active = 0
+        self.__closed = False
+        self.__cond = threading.Condition()
+        self.__threads = [threading.Thread(target=self.__work, daemon=True) for _ in range(max_workers)]
+        for thread in self.__threads:
+            thread.start()
+        wechat.admission = self
+
+    def priority(self, event: Event) -> int:
+        return self.priorities.get(event.get("type"), self.default_priority)
+
+    def submit(self, event: Event) -> bool:
+        """按优先级入队，返回是否被接收"""
+        priority = self.priority(event)
+        queue = self.queues[priority]
+        metrics = self.metrics[priority]
+        with self.__cond:
+            if len(queue) >= self.queue_sizes[priority] * self.shed_watermark and \
+                    random.random() >= self.sample_rates[priority]:
+                metrics.shed += 1
+                return False
+            if len(queue) >= self.queue_sizes[priority]:
+                metrics.dropped += 1
+                return False
+            queue.append((time.monotonic(), event))
+            metrics.admitted += 1
+            self.__cond.notify()
+        return True
+
+    def __next(self) -> typing.Optional[typing.Tuple[int, float, Event]]:
+        with self.__cond:
+            while True:
+                for priority, queue in enumerate(self.queues):
+                    if queue:
+                        self.__active += 1
+                        return (priority,) + queue.popleft()
+                if self.__closed:
+                    return None
+                self.__cond.wait()
+
+    def __work(self) -> None:
+        while True:
+            item = self.__next()
+            if item is None:
+                return
+            priority, queued_at, event = item
+            delay = time.monotonic() - queued_at
+            metrics = self.metrics[priority]
+            with self.__cond:
+                metrics.processed += 1
+                metrics.total_delay += delay
+                if delay > metrics.max_delay:
+                    metrics.max_delay = delay
+                if delay >= self.delay_threshold:
+                    metrics.delayed += 1
+            try:
+                self.wechat.process_event(event)
+            except Exception:
+                logger.error(traceback.format_exc())
+            finally:
+                with self.__cond:
+                    self.__active -= 1
+                    self.__cond.notify_all()
+
+    def pending(self) -> int:
+        return sum(len(queue) for queue in self.queues)
+
+    def drain(self, timeout: typing.Optional[float] = None) -> bool:
+        """等待队列中的事件处理完成"""
+        with self.__cond:
+            drained = self.__cond.wait_for(lambda: not self.__active and not self.pending(), timeout)
+        if not drained:
+            logger.warning(f"{self.pending()} events still queued after {timeout}s")
+        return drained
+
+    def stats(self) -> typing.Dict[str, dict]:
+        return {
+            name: {
+                "queued": len(self.queues[priority]),
+                "admitted": metrics.admitted,
+                "processed": metrics.processed,
+                "dropped": metrics.dropped,
+                "shed": metrics.shed,
+                "delayed": metrics.delayed,
+                # 仍在队列中的事件还没有排队时长，按已取出处理的事件平均
+                "avg_delay": metrics.total_delay / metrics.processed if metrics.processed else 0.0,
+                "max_delay": metrics.max_delay
+            }
+            for priority, (name, metrics) in enumerate(zip(("high", "normal", "low"), self.metrics))
+        }
+
+    def close(self) -> None:
+        with self.__cond:
+            self.__closed = True
+            self.__cond.notify_all()
+        if self.wechat.admission is self:
+            self.wechat.admission = None
@@ -0,0 +1,217 @@
+import concurrent.futures
+import json
+import os
+import sqlite3
+import string
+import threading
+import time
+import typing
+
+from wechat.cdn import CDNTransferManager, FILE_TYPE_IMAGE, FILE_TYPE_VIDEO, FILE_TYPE_FILE
+from wechat.logger import logger
+from wechat.utils import TokenBucket
+
+PENDING = "pending"
+SENT = "sent"
+FAILED = "failed"
+
+# 接收人的整体状态：文字和媒体都已发送为sent，仍有未发送的部分时按是否有错误区分failed/pending
+RECIPIENT_STATUS = (
+    "CASE WHEN text_status = ? OR media_status = ? THEN (CASE WHEN error IS NULL THEN ? ELSE ? END) ELSE ? END"
+)
+
+
+class Broadcaster:
+
+    def __init__(
+            self,
+            wechat,
+            db_file: str = "broadcast.db",
+            cdn: typing.Optional[CDNTransferManager] = None,
+            snapshots=None,
+            rate: float = 2,
+            burst: float = 1,
+            max_workers: int = 4,
+            timeout: typing.Optional[int] = None
+    ):
+        self.wechat = wechat
+        self.cdn = cdn or CDNTransferManager(wechat)
+        self.snapshots = snapshots
+        self.rate = rate
+        self.burst = burst
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.buckets: typing.Dict[typing.Union[str, int], TokenBucket] = {}
+        self.__lock = threading.Lock()
+        self.__db = sqlite3.connect(db_file, check_same_thread=False)
+        self.__db.executescript(
+            "CREATE TABLE IF NOT EXISTS broadcast_job ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, account TEXT, client_id INTEGER, text TEXT, media_type TEXT, "
+            "media_path TEXT, status TEXT, create_time REAL);"
+            # 文字和媒体分别记录发送状态（不需要发送的部分为NULL），继续执行时只补发未成功的部分
+            "CREATE TABLE IF NOT EXISTS broadcast_recipient ("
+            "job_id INTEGER, wxid TEXT, text_status TEXT, media_status TEXT, error TEXT, update_time REAL, "
+            "PRIMARY KEY (job_id, wxid));"
+        )
+
+    def create(self, client_id: int, recipients: typing.Iterable[str], text: typing.Optional[str] = None,
+               media_type: typing.Optional[str] = None, media_path: typing.Optional[str] = None) -> int:
+        """创建群发任务，text支持$wxid、$nickname、$remark变量，media_type为image/video/file"""
+        if text is None and media_path is None:
+            raise ValueError("text or media_path is required.")
+        if media_path is not None and media_type not in ("image", "video", "file"):
+            raise ValueError("media_type must be one of image, video, file.")
+        # client_id在hook重启后会变化，保存账号wxid，执行时再换成当前的client_id
+        account = self.wechat.self_wxid(client_id)
+        now = time.time()
+        with self.__lock:
+            cursor = self.__db.execute(
+                "INSERT INTO broadcast_job (account, client_id, text, media_type, media_path, status, create_time) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (account, client_id, text, media_type, media_path and os.path.abspath(media_path), PENDING, now)
+            )
+            job_id = cursor.lastrowid
+            text_status = PENDING if text is not None else None
+            media_status = PENDING if media_path is not None else None
+            self.__db.executemany(
+                "INSERT OR IGNORE INTO broadcast_recipient (job_id, wxid, text_status, media_status, update_time) "
+                "VALUES (?, ?, ?, ?, ?)",
+                ((job_id, wxid, text_status, media_status, now) for wxid in recipients)
+            )
+            self.__db.commit()
+        return job_id
+
+    def __variables(self, client_id: int, wxid: str) -> dict:
+        variables = {"wxid": wxid, "nickname": wxid, "remark": ""}
+        snapshot = self.snapshots.get(client_id, "contacts") if self.snapshots is not None else None
+        row = snapshot.row(wxid) if snapshot is not None else None
+        if row:
+            variables["nickname"] = row.get("nickname") or wxid
+            variables["remark"] = row.get("remark") or ""
+        return variables
+
+    def __upload(self, client_id: int, media_type: str, media_path: str) -> dict:
+        file_type = {"image": FILE_TYPE_IMAGE, "video": FILE_TYPE_VIDEO, "file": FILE_TYPE_FILE}[media_type]
+        return self.cdn.upload(client_id, media_path, file_type).result()
+
+    def __send_media(self, client_id: int, wxid: str, media_type: str, media_path: str, media: dict) -> dict:
+        if media_type == "image":
+            return self.wechat.send_image_by_cdn(client_id, wxid, media["file_id"], media["file_md5"],
+                                                 media["file_size"], media["thumb_file_size"], media["crc32"],
+                                                 media["aes_key"], self.timeout)
+        if media_type == "video":
+            return self.wechat.send_video_by_cdn(client_id, wxid, media["file_id"], media["file_md5"],
+                                                 media["file_size"], media["thumb_file_size"], media["aes_key"],
+                                                 self.timeout)
+        return self.wechat.send_file_by_cdn(client_id, wxid, media["file_id"], media["file_md5"], media["file_size"],
+                                            os.path.basename(media_path), media["aes_key"], self.timeout)
+
+    def __send(self, job: dict, template: typing.Optional[string.Template], media: typing.Optional[dict],
+               wxid: str, text_status: typing.Optional[str], media_status: typing.Optional[str]) -> None:
+        client_id = job["client_id"]
+        bucket = self.buckets.setdefault(job["account"] or client_id, TokenBucket(self.rate, self.burst))
+        if template is not None and text_status != SENT:
+            bucket.acquire()
+            content = template.safe_substitute(self.__variables(client_id, wxid))
+            if self.wechat.send_text_by_cdn(client_id, wxid, content, self.timeout) is None:
+                raise Exception("send_text_by_cdn got no response")
+            self.__mark_part(job["id"], wxid, "text_status")
+        if job["media_path"] and media_status != SENT:
+            bucket.acquire()
+            if self.__send_media(client_id, wxid, job["media_type"], job["media_path"], media) is None:
+                raise Exception(f"send_{job['media_type']}_by_cdn got no response")
+            self.__mark_part(job["id"], wxid, "media_status")
+
+    def __mark_part(self, job_id: int, wxid: str, column: str) -> None:
+        with self.__lock:
+            self.__db.execute(
+                f"UPDATE broadcast_recipient SET {column} = ?, update_time = ? WHERE job_id = ? AND wxid = ?",
+                (SENT, time.time(), job_id, wxid)
+            )
+            self.__db.commit()
+
+    def __mark(self, job_id: int, wxid: str, error: typing.Optional[str] = None) -> None:
+        with self.__lock:
+            self.__db.execute(
+                "UPDATE broadcast_recipient SET error = ?, update_time = ? WHERE job_id = ? AND wxid = ?",
+                (error, time.time(), job_id, wxid)
+            )
+            self.__db.commit()
+
+    def run(self, job_id: int, progress: typing.Optional[typing.Callable[[int, int], None]] = None) -> dict:
+        """执行（或继续执行）群发任务，已发送成功的接收人会被跳过"""
+        with self.__lock:
+            row = self.__db.execute(
+                "SELECT account, client_id, text, media_type, media_path FROM broadcast_job WHERE id = ?", (job_id,)
+            ).fetchone()
+            if row is None:
+                raise ValueError(f"broadcast job {job_id} not found.")
+            job = dict(zip(["account", "client_id", "text", "media_type", "media_path"], row), id=job_id)
+            recipients = self.__db.execute(
+                "SELECT wxid, text_status, media_status FROM broadcast_recipient "
+                "WHERE job_id = ? AND (text_status = ? OR media_status = ?)",
+                (job_id, PENDING, PENDING)
+            ).fetchall()
+        if job["account"] is not None:
+            job["client_id"] = self.wechat.client_id_of(job["account"])
+            if job["client_id"] is None:
+                raise Exception(f"account {job['account']} of broadcast job {job_id} is not logged in.")
+
+        template = string.Template(job["text"]) if job["text"] is not None else None
+        media = None
+        if job["media_path"] and any(media_status == PENDING for _, _, media_status in recipients):
+            media = self.__upload(job["client_id"], job["media_type"], job["media_path"])
+        total, finished = len(recipients), 0
+        with concurrent.futures.ThreadPoolExecutor(self.max_workers) as executor:
+            futures = {
+                executor.submit(self.__send, job, template, media, wxid, text_status, media_status): wxid
+                for wxid, text_status, media_status in recipients
+            }
+            for future in concurrent.futures.as_completed(futures):
+                wxid = futures[future]
+                try:
+                    future.result()
+                    self.__mark(job_id, wxid)
+                except Exception as e:
+                    self.__mark(job_id, wxid, str(e))
+                finished += 1
+                if progress is not None:
+                    progress(finished, total)
+
+        report = self.report(job_id)
+        with self.__lock:
+            self.__db.execute("UPDATE broadcast_job SET status = ? WHERE id = ?",
+                              (SENT if not report[FAILED] else FAILED, job_id))
+            self.__db.commit()
+        logger.info(f"Broadcast {job_id} finished: {json.dumps(report)}")
+        return report
+
+    def resume(self, progress: typing.Optional[typing.Callable[[int, int], None]] = None) -> typing.Dict[int, dict]:
+        """继续执行所有未完成的群发任务（例如进程崩溃后）"""
+        with self.__lock:
+            jobs = self.__db.execute("SELECT id, account FROM broadcast_job WHERE status = ?", (PENDING,)).fetchall()
+        reports = {}
+        for job_id, account in jobs:
+            if account is not None and self.wechat.client_id_of(account) is None:
+                # 账号未登录，保留任务等待重新登录后再继续
+                logger.warning(f"Skip broadcast {job_id}: account {account} is not logged in")
+                continue
+            reports[job_id] = self.run(job_id, progress)
+        return reports
+
+    def report(self, job_id: int) -> dict:
+        """群发任务的发送统计"""
+        with self.__lock:
+            counts = dict(self.__db.execute(
+                f"SELECT {RECIPIENT_STATUS}, COUNT(*) FROM broadcast_recipient WHERE job_id = ? GROUP BY 1",
+                (PENDING, PENDING, PENDING, FAILED, SENT, job_id)
+            ).fetchall())
+        return {status: counts.get(status, 0) for status in (PENDING, SENT, FAILED)}
+
+    def failures(self, job_id: int) -> typing.Dict[str, str]:
+        """发送失败的接收人及原因"""
+        with self.__lock:
+            return dict(self.__db.execute(
+                "SELECT wxid, error FROM broadcast_recipient WHERE job_id = ? AND error IS NOT NULL "
+                "AND (text_status = ? OR media_status = ?)", (job_id, PENDING, PENDING)
+            ).fetchall())
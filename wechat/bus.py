@@ -0,0 +1,249 @@
+import concurrent.futures
+import itertools
+import json
+import queue
+import socket
+import socketserver
+import threading
+import traceback
+import typing
+
+from wechat.core import Event
+from wechat.logger import logger
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+
+def _encode_line(message: dict) -> bytes:
+    return json.dumps(message, ensure_ascii=False).encode("utf-8") + b"\n"
+
+
+def _write_line(sock: socket.socket, message: dict) -> None:
+    sock.sendall(_encode_line(message))
+
+
+class Subscriber:
+
+    def __init__(self, sock: socket.socket, max_queue: int):
+        self.sock = sock
+        self.types: typing.Optional[typing.Set[int]] = None
+        self.client_ids: typing.Optional[typing.Set[int]] = None
+        self.subscribed = False
+        self.dropped = 0
+        self.queue: "queue.Queue[typing.Optional[bytes]]" = queue.Queue(max_queue)
+        self.thread = threading.Thread(target=self.__write_loop, daemon=True)
+        self.thread.start()
+
+    def matches(self, event: Event) -> bool:
+        return self.subscribed and (self.types is None or event["type"] in self.types) and (
+                self.client_ids is None or event["client_id"] in self.client_ids)
+
+    def publish(self, line: bytes) -> None:
+        """发布已编码的事件行"""
+        try:
+            self.queue.put_nowait(line)
+        except queue.Full:
+            self.dropped += 1
+
+    def reply(self, message: dict) -> None:
+        self.queue.put(_encode_line(message))
+
+    def __write_loop(self) -> None:
+        while True:
+            line = self.queue.get()
+            if line is None:
+                return
+            try:
+                self.sock.sendall(line)
+            except OSError:
+                return
+
+    def close(self) -> None:
+        self.queue.put(None)
+
+
+class BusRequestHandler(socketserver.StreamRequestHandler):
+
+    def handle(self) -> None:
+        bridge: EventBusBridge = getattr(self.server, "bridge")
+        subscriber = Subscriber(self.request, bridge.max_queue)
+        bridge.add_subscriber(subscriber)
+        try:
+            for line in self.rfile:
+                try:
+                    bridge.on_command(subscriber, json.loads(line))
+                except Exception:
+                    logger.warning(traceback.format_exc())
+        finally:
+            bridge.remove_subscriber(subscriber)
+            subscriber.close()
+
+
+class BusServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class EventBusBridge:
+
+    def __init__(
+            self,
+            wechat,
+            host: str = "127.0.0.1",
+            port: int = 19099,
+            max_queue: int = 10000,
+            max_workers: int = 16,
+            redis_url: typing.Optional[str] = None,
+            redis_stream: str = "wechat:events",
+            redis_maxlen: int = 100000
+    ):
+        self.wechat = wechat
+        self.host = host
+        self.port = port
+        self.max_queue = max_queue
+        self.subscribers: typing.List[Subscriber] = []
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers, thread_name_prefix="bus")
+        self.redis_stream = redis_stream
+        self.redis_maxlen = redis_maxlen
+        self.redis = None
+        if redis_url is not None:
+            if redis is None:
+                raise ImportError("redis is required for redis_url, please install it with `pip install redis`.")
+            self.redis = redis.Redis.from_url(redis_url)
+        self.__lock = threading.Lock()
+        self.server = BusServer((host, port), BusRequestHandler)
+        self.server.bridge = self
+        self.server_thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.server_thread.start()
+        wechat.use(self)
+        logger.info(f"Event Bus at tcp://{host}:{port}")
+
+    def add_subscriber(self, subscriber: Subscriber) -> None:
+        with self.__lock:
+            self.subscribers = self.subscribers + [subscriber]
+
+    def remove_subscriber(self, subscriber: Subscriber) -> None:
+        with self.__lock:
+            self.subscribers = [item for item in self.subscribers if item is not subscriber]
+
+    def __call__(self, wechat, event: Event) -> Event:
+        subscribers = [subscriber for subscriber in self.subscribers if subscriber.matches(event)]
+        if not subscribers and self.redis is None:
+            return event
+        # 在中间件中立即编码（只编码一次），之后的中间件和处理函数修改事件不会影响已发布的内容
+        try:
+            message = json.dumps(event.to_dict(), ensure_ascii=False)
+        except (TypeError, ValueError) as e:
+            logger.warning(f"Event not published: {e}")
+            return event
+        if subscribers:
+            line = f'{{"op": "event", "event": {message}}}\n'.encode("utf-8")
+            for subscriber in subscribers:
+                subscriber.publish(line)
+        if self.redis is not None:
+            try:
+                self.redis.xadd(self.redis_stream, {"event": message},
+                                maxlen=self.redis_maxlen, approximate=True)
+            except Exception as e:
+                logger.warning(f"Publish to redis failed: {e}")
+        return event
+
+    def on_command(self, subscriber: Subscriber, command: dict) -> None:
+        op = command.get("op")
+        if op == "subscribe":
+            subscriber.types = set(command["types"]) if command.get("types") else None
+            subscriber.client_ids = set(command["client_ids"]) if command.get("client_ids") else None
+            subscriber.subscribed = True
+        elif op == "unsubscribe":
+            subscriber.subscribed = False
+        elif op in ("send", "send_sync"):
+            self.executor.submit(self.__execute, subscriber, command)
+        else:
+            subscriber.reply({"op": "result", "id": command.get("id"), "error": f"unknown op {op}"})
+
+    def __execute(self, subscriber: Subscriber, command: dict) -> None:
+        try:
+            if command["op"] == "send":
+                result = self.wechat.send(command["client_id"], command["data"])
+            else:
+                result = self.wechat.send_sync(command["client_id"], command["data"], command.get("timeout"))
+            subscriber.reply({"op": "result", "id": command.get("id"), "result": result})
+        except Exception as e:
+            subscriber.reply({"op": "result", "id": command.get("id"), "error": str(e)})
+
+    def stats(self) -> dict:
+        return {
+            "subscribers": len(self.subscribers),
+            "dropped": sum(subscriber.dropped for subscriber in self.subscribers)
+        }
+
+    def close(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+        self.executor.shutdown(wait=False)
+
+
+class EventBusClient:
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 19099,
+                 on_event: typing.Optional[typing.Callable[[dict], None]] = None):
+        self.on_event = on_event
+        self.events: "queue.Queue[dict]" = queue.Queue()
+        self.sock = socket.create_connection((host, port))
+        self.__ids = itertools.count(1)
+        self.__pending: typing.Dict[int, concurrent.futures.Future] = {}
+        self.__write_lock = threading.Lock()
+        self.__thread = threading.Thread(target=self.__read_loop, daemon=True)
+        self.__thread.start()
+
+    def __send(self, message: dict) -> None:
+        with self.__write_lock:
+            _write_line(self.sock, message)
+
+    def __read_loop(self) -> None:
+        for line in self.sock.makefile("rb"):
+            message = json.loads(line)
+            if message["op"] == "event":
+                if self.on_event is not None:
+                    self.on_event(message["event"])
+                else:
+                    self.events.put(message["event"])
+            elif message["op"] == "result":
+                future = self.__pending.pop(message.get("id"), None)
+                if future is None:
+                    continue
+                if message.get("error") is not None:
+                    future.set_exception(Exception(message["error"]))
+                else:
+                    future.set_result(message.get("result"))
+        for future in list(self.__pending.values()):
+            future.set_exception(ConnectionError("event bus closed"))
+
+    def subscribe(self, types: typing.Optional[typing.Iterable[int]] = None,
+                  client_ids: typing.Optional[typing.Iterable[int]] = None) -> None:
+        """订阅事件（按wechat.events中的事件类型和client_id过滤）"""
+        self.__send({
+            "op": "subscribe",
+            "types": list(types) if types else None,
+            "client_ids": list(client_ids) if client_ids else None
+        })
+
+    def __request(self, op: str, client_id: int, data: dict,
+                  timeout: typing.Optional[int] = None) -> concurrent.futures.Future:
+        request_id = next(self.__ids)
+        future = concurrent.futures.Future()
+        self.__pending[request_id] = future
+        self.__send({"op": op, "id": request_id, "client_id": client_id, "data": data, "timeout": timeout})
+        return future
+
+    def send(self, client_id: int, data: dict) -> concurrent.futures.Future:
+        return self.__request("send", client_id, data)
+
+    def send_sync(self, client_id: int, data: dict, timeout: typing.Optional[int] = None) -> concurrent.futures.Future:
+        return self.__request("send_sync", client_id, data, timeout)
+
+    def close(self) -> None:
+        self.sock.close()
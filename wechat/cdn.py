@@ -0,0 +1,271 @@
+import concurrent.futures
+import hashlib
+import json
+import os
+import pathlib
+import threading
+import time
+import typing
+
+from wechat.logger import logger
+
+# CDN文件类型
+FILE_TYPE_IMAGE = 2
+FILE_TYPE_VIDEO = 4
+FILE_TYPE_FILE = 5
+
+IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png", ".bmp", ".gif"}
+VIDEO_SUFFIXES = {".mp4", ".mov", ".avi", ".mkv"}
+
+
+def file_digest(file_path: str, chunk_size: int = 1024 * 1024) -> typing.Tuple[str, str, int]:
+    sha256 = hashlib.sha256()
+    md5 = hashlib.md5()
+    size = 0
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            sha256.update(chunk)
+            md5.update(chunk)
+            size += len(chunk)
+    return sha256.hexdigest(), md5.hexdigest(), size
+
+
+class UploadCache:
+
+    def __init__(self, cache_file: typing.Optional[str] = None, ttl: typing.Optional[int] = 7 * 24 * 3600):
+        self.cache_file = pathlib.Path(cache_file) if cache_file else None
+        self.ttl = ttl
+        self.__lock = threading.Lock()
+        self.__entries: typing.Dict[str, dict] = self.__load()
+
+    @staticmethod
+    def key(sha256: str, size: int, file_type: int) -> str:
+        # 同一文件按图片/视频/文件上传得到的file_id不能混用
+        return f"{sha256}:{size}:{file_type}"
+
+    def __load(self) -> typing.Dict[str, dict]:
+        if self.cache_file is None or not self.cache_file.exists():
+            return {}
+        try:
+            with open(self.cache_file, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except Exception:
+            logger.warning(f"Upload cache {self.cache_file} is corrupted, ignored")
+            return {}
+
+    def __save(self) -> None:
+        if self.cache_file is None:
+            return
+        tmp_file = self.cache_file.with_suffix(self.cache_file.suffix + ".tmp")
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump(self.__entries, f, ensure_ascii=False)
+        os.replace(tmp_file, self.cache_file)
+
+    def __expired(self, entry: dict, now: float) -> bool:
+        return entry.get("expire_time") is not None and entry["expire_time"] <= now
+
+    def get(self, key: str) -> typing.Optional[dict]:
+        with self.__lock:
+            entry = self.__entries.get(key)
+            if entry is None:
+                return None
+            if self.__expired(entry, time.time()):
+                del self.__entries[key]
+                return None
+            return entry["result"]
+
+    def set(self, key: str, result: dict) -> None:
+        now = time.time()
+        with self.__lock:
+            self.__entries[key] = {
+                "result": result,
+                "create_time": now,
+                "expire_time": now + self.ttl if self.ttl else None
+            }
+            self.__entries = {k: v for k, v in self.__entries.items() if not self.__expired(v, now)}
+            self.__save()
+
+    def delete(self, key: str) -> None:
+        with self.__lock:
+            if self.__entries.pop(key, None) is not None:
+                self.__save()
+
+    def __len__(self) -> int:
+        return len(self.__entries)
+
+
+class CDNTransferManager:
+
+    def __init__(
+            self,
+            wechat,
+            max_workers: int = 4,
+            max_pending: int = 64,
+            cache_file: typing.Optional[str] = None,
+            cache_ttl: typing.Optional[int] = 7 * 24 * 3600,
+            retries: int = 3,
+            backoff: float = 1.0,
+            base_timeout: int = 10,
+            max_timeout: int = 600,
+            bytes_per_second: int = 512 * 1024,
+            max_digests: int = 1024
+    ):
+        self.wechat = wechat
+        self.retries = retries
+        self.backoff = backoff
+        self.base_timeout = base_timeout
+        self.max_timeout = max_timeout
+        self.bytes_per_second = bytes_per_second
+        self.max_digests = max_digests
+        self.cache = UploadCache(cache_file, cache_ttl)
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers, thread_name_prefix="cdn")
+        self.__slots = threading.BoundedSemaphore(max_workers + max_pending)
+        self.__lock = threading.Lock()
+        self.__inflight: typing.Dict[str, concurrent.futures.Future] = {}
+        self.__initialized: typing.Set[int] = set()
+        # 文件路径 -> ((大小, 修改时间), 摘要)，文件未变化时不再重新读取计算
+        self.__digests: typing.Dict[str, typing.Tuple[typing.Tuple[int, int], typing.Tuple[str, str, int]]] = {}
+
+    def timeout_for(self, file_size: int) -> int:
+        """按文件大小计算超时时间"""
+        return min(self.max_timeout, self.base_timeout + file_size // self.bytes_per_second)
+
+    def __submit(self, func: typing.Callable, *args) -> concurrent.futures.Future:
+        self.__slots.acquire()
+        try:
+            future = self.executor.submit(func, *args)
+        except Exception:
+            self.__slots.release()
+            raise
+        future.add_done_callback(lambda _: self.__slots.release())
+        return future
+
+    def __call_with_retry(self, name: str, func: typing.Callable, *args, timeout: int) -> dict:
+        for attempt in range(self.retries + 1):
+            try:
+                result = func(*args, timeout=timeout)
+                if result is not None:
+                    return result
+                logger.warning(f"{name} got no response (attempt {attempt + 1})")
+            except Exception as e:
+                logger.warning(f"{name} failed (attempt {attempt + 1}): {e}")
+            if attempt < self.retries:
+                time.sleep(self.backoff * 2 ** attempt)
+        raise Exception(f"{name} failed after {self.retries + 1} attempts")
+
+    def __ensure_init(self, client_id: int) -> None:
+        if client_id in self.__initialized:
+            return
+        self.__call_with_retry("cdn_init", self.wechat.cdn_init, client_id, timeout=self.base_timeout)
+        self.__initialized.add(client_id)
+
+    def digest(self, file_path: str) -> typing.Tuple[str, str, int]:
+        """文件摘要(sha256, md5, size)，按(路径, 大小, 修改时间)缓存"""
+        path = os.path.abspath(file_path)
+        stat = os.stat(path)
+        version = (stat.st_size, stat.st_mtime_ns)
+        with self.__lock:
+            cached = self.__digests.get(path)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        digest = file_digest(path)
+        with self.__lock:
+            self.__digests.pop(path, None)
+            if len(self.__digests) >= self.max_digests:
+                del self.__digests[next(iter(self.__digests))]
+            self.__digests[path] = (version, digest)
+        return digest
+
+    def upload(self, client_id: int, file_path: str, file_type: int = FILE_TYPE_FILE) -> concurrent.futures.Future:
+        """CDN上传（相同文件只上传一次）"""
+        sha256, md5, file_size = self.digest(file_path)
+        key = UploadCache.key(sha256, file_size, file_type)
+        future = concurrent.futures.Future()
+        result = self.cache.get(key)
+        if result is not None:
+            future.set_result(result)
+            return future
+        with self.__lock:
+            if key in self.__inflight:
+                return self.__inflight[key]
+            self.__inflight[key] = future
+        try:
+            self.__submit(self.__upload, client_id, file_path, file_type, key, md5, file_size, future)
+        except Exception as e:
+            with self.__lock:
+                self.__inflight.pop(key, None)
+            future.set_exception(e)
+        return future
+
+    def __upload(self, client_id: int, file_path: str, file_type: int, key: str, md5: str, file_size: int,
+                 future: concurrent.futures.Future) -> None:
+        try:
+            self.__ensure_init(client_id)
+            result = self.__call_with_retry("cdn_upload", self.wechat.cdn_upload, client_id, file_type, file_path,
+                                            timeout=self.timeout_for(file_size))
+            result = {
+                "file_id": result["file_id"],
+                "aes_key": result["aes_key"],
+                "file_md5": result.get("file_md5") or md5,
+                "file_size": result.get("file_size") or file_size,
+                "thumb_file_size": result.get("thumb_file_size", 0),
+                "crc32": result.get("crc32", 0)
+            }
+            self.cache.set(key, result)
+            future.set_result(result)
+        except Exception as e:
+            future.set_exception(e)
+        finally:
+            with self.__lock:
+                self.__inflight.pop(key, None)
+
+    def download(self, client_id: int, file_id: str, aes_key: str, save_path: str, file_type: int,
+                 file_size: int = 0) -> concurrent.futures.Future:
+        """CDN下载（已下载的文件直接跳过）"""
+        return self.__submit(self.__download, client_id, save_path, file_size, "cdn_download",
+                             self.wechat.cdn_download, file_id, aes_key, save_path, file_type)
+
+    def download2(self, client_id: int, url: str, auth_key: str, aes_key: str, save_path: str,
+                  file_size: int = 0) -> concurrent.futures.Future:
+        """企业微信CDN下载（已下载的文件直接跳过）"""
+        return self.__submit(self.__download, client_id, save_path, file_size, "cdn_download2",
+                             self.wechat.cdn_download2, url, auth_key, aes_key, save_path)
+
+    def __download(self, client_id: int, save_path: str, file_size: int, name: str, func: typing.Callable,
+                   *args) -> dict:
+        if os.path.exists(save_path) and os.path.getsize(save_path) > 0 and (
+                not file_size or os.path.getsize(save_path) == file_size):
+            return {"save_path": save_path}
+        self.__ensure_init(client_id)
+        return self.__call_with_retry(name, func, client_id, *args, timeout=self.timeout_for(file_size))
+
+    def send_image(self, client_id: int, to_wxid: str, file_path: str) -> dict:
+        """发送图片消息（CDN，已上传过的图片不再上传）"""
+        result = self.upload(client_id, file_path, FILE_TYPE_IMAGE).result()
+        return self.wechat.send_image_by_cdn(client_id, to_wxid, result["file_id"], result["file_md5"],
+                                             result["file_size"], result["thumb_file_size"], result["crc32"],
+                                             result["aes_key"])
+
+    def send_video(self, client_id: int, to_wxid: str, file_path: str) -> dict:
+        """发送视频消息（CDN，已上传过的视频不再上传）"""
+        result = self.upload(client_id, file_path, FILE_TYPE_VIDEO).result()
+        return self.wechat.send_video_by_cdn(client_id, to_wxid, result["file_id"], result["file_md5"],
+                                             result["file_size"], result["thumb_file_size"], result["aes_key"])
+
+    def send_file(self, client_id: int, to_wxid: str, file_path: str) -> dict:
+        """发送文件消息（CDN，已上传过的文件不再上传）"""
+        result = self.upload(client_id, file_path, FILE_TYPE_FILE).result()
+        return self.wechat.send_file_by_cdn(client_id, to_wxid, result["file_id"], result["file_md5"],
+                                            result["file_size"], os.path.basename(file_path), result["aes_key"])
+
+    def send_media(self, client_id: int, to_wxid: str, file_path: str) -> dict:
+        """按文件后缀发送图片/视频/文件消息（CDN）"""
+        suffix = pathlib.Path(file_path).suffix.lower()
+        if suffix in IMAGE_SUFFIXES:
+            return self.send_image(client_id, to_wxid, file_path)
+        if suffix in VIDEO_SUFFIXES:
+            return self.send_video(client_id, to_wxid, file_path)
+        return self.send_file(client_id, to_wxid, file_path)
+
+    def shutdown(self, wait: bool = True) -> None:
+        self.executor.shutdown(wait=wait)
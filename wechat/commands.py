@@ -0,0 +1,309 @@
+import typing
+
+from typing import Optional, List
+
+_MISSING = object()
+
+
+class Field:
+    __slots__ = ("name", "annotation", "default", "key")
+
+    def __init__(self, name: str, annotation: typing.Any, default: typing.Any = _MISSING,
+                 key: typing.Optional[str] = None):
+        self.name = name
+        self.annotation = annotation
+        self.default = default
+        # 请求中的字段名（与参数名不同时）
+        self.key = key or name
+
+
+class Command:
+    __slots__ = ("name", "type", "doc", "fields", "sync", "timeout", "constants", "generate", "idempotent")
+
+    def __init__(
+            self,
+            name: str,
+            type: int,
+            doc: str,
+            sync: bool = True,
+            fields: typing.Iterable[typing.Union[Field, tuple]] = (),
+            constants: typing.Optional[dict] = None,
+            timeout: typing.Optional[float] = None,
+            generate: bool = True,
+            idempotent: bool = False
+    ):
+        self.name = name
+        self.type = type
+        self.doc = doc
+        self.sync = sync
+        self.fields = [field if isinstance(field, Field) else Field(*field) for field in fields]
+        self.constants = constants or {}
+        # 默认超时，None表示使用WeChat.timeout
+        self.timeout = timeout
+        # False表示方法在core.py中手写（请求体不是简单的字段映射）
+        self.generate = generate
+        # 只读查询命令，可以安全地重复发送（例如对冲请求）
+        self.idempotent = sync and idempotent
+
+    def __repr__(self) -> str:
+        return f"Command({self.name!r}, {self.type})"
+
+
+class CommandMetrics:
+    __slots__ = ("calls", "failures", "total_time", "max_time")
+
+    def __init__(self):
+        self.calls = 0
+        self.failures = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+
+    def record(self, elapsed: float, ok: bool) -> None:
+        self.calls += 1
+        if not ok:
+            self.failures += 1
+        self.total_time += elapsed
+        if elapsed > self.max_time:
+            self.max_time = elapsed
+
+    def to_dict(self) -> dict:
+        return {
+            "calls": self.calls,
+            "failures": self.failures,
+            "avg_time": self.total_time / self.calls if self.calls else 0.0,
+            "max_time": self.max_time
+        }
+
+
+# 允许多个命令共用同一个类型码（由请求字段区分），其余类型码重复视为定义错误
+SHARED_TYPES = {
+    # source_type区分名片(17)/群(14)
+    11062: {"add_friend_by_card", "add_friend_by_room"},
+    # 未核实：三个命令沿用了旧代码中的同一个类型码，其中至少两个可能是复制粘贴错误，需对照hook文档确认正确的类型码
+    11174: {"get_room_by_protocol", "get_contact_detail_by_protocol", "get_contacts_by_protocol"},
+}
+
+COMMANDS: typing.Dict[str, Command] = {}
+
+_SPECS = [
+    Command("send_text", 11036, "发送文本消息", sync=False, fields=[("to_wxid", str), ("content", str)]),
+    Command("send_room_at", 11037, "发送群at消息", sync=False, fields=[
+        ("to_wxid", str), ("content", str), ("at_list", List[str])]),
+    Command("send_card", 11038, "发送名片消息", sync=False, fields=[("to_wxid", str), ("card_wxid", str)]),
+    Command("send_link_card", 11039, "发送链接卡片消息", sync=False, fields=[
+        ("to_wxid", str), ("title", str), ("desc", str), ("url", str), ("image_url", str)]),
+    Command("send_image", 11040, "发送图片消息", sync=False, fields=[("to_wxid", str), ("file", str)]),
+    Command("send_video", 11042, "发送视频消息", sync=False, fields=[("to_wxid", str), ("file", str)]),
+    Command("send_file", 11041, "发送文件消息", sync=False, fields=[("to_wxid", str), ("file", str)]),
+    Command("send_emotion", 11043, "发送表情消息", sync=False, fields=[("to_wxid", str), ("file", str)]),
+    Command("send_pat", 11250, "发送拍一拍消息", sync=False, fields=[("room_wxid", str), ("patted_wxid", str)]),
+    Command("create_room", 11068, "创建群聊", sync=False, generate=False),
+    Command("create_room_by_protocol", 11246, "创建群聊（协议）", generate=False),
+    Command("get_invitation_relationship", 11134, "获取群成员邀请关系", fields=[("room_wxid", str)], idempotent=True),
+    Command("add_room_member", 11069, "添加群成员", fields=[("room_wxid", str), ("member_list", List[str])]),
+    Command("invite_room_member", 11070, "邀请群成员", fields=[("room_wxid", str), ("member_list", List[str])]),
+    Command("remove_room_member", 11071, "移出群成员", fields=[("room_wxid", str), Field("wxid", str, key="name")]),
+    Command("modify_room_name", 11072, "修改群名称", fields=[("room_wxid", str), ("name", str)]),
+    Command("modify_room_notice", 11073, "修改群公告", fields=[("room_wxid", str), ("notice", str)]),
+    Command("modify_room_member_nickname", 11074, "修改我在本群的昵称", fields=[("room_id", str), ("nickname", str)]),
+    Command("display_room_member_nickname", 11075, "是否显示群成员昵称", fields=[("room_id", str), ("status", int, 1)]),
+    Command("get_room_by_protocol", 11174, "获取群信息（协议）", fields=[("wxid", str)], idempotent=True),
+    Command("exit_room", 11077, "退出群聊", fields=[("room_id", str)]),
+    Command("confirm_receipt", 11066, "确认收款", sync=False, fields=[Field("transfer_id", str, key="transferid")]),
+    Command("pin_chat", 11079, "置顶/取消置顶聊天", fields=[("wxid", str), ("status", int)]),
+    Command("set_disturb", 11078, "开启/关闭消息免打扰", fields=[("wxid", str), ("status", int)]),
+    Command("clear_chat_history", 11108, "清除聊天记录", sync=False),
+    Command("decode_image", 10085, "解密图片", sync=False, fields=[("src_file", str), ("dest_file", str)]),
+    Command("get_self_info", 11028, "获取当前账号信息", idempotent=True),
+    Command("get_contacts", 11030, "获取好友列表", timeout=60, idempotent=True),
+    Command("get_contact", 11029, "获取好友信息", fields=[("wxid", str)], idempotent=True),
+    Command("get_rooms", 11031, "获取群列表", fields=[("detail", int, 1)], timeout=60, idempotent=True),
+    Command("get_room", 11125, "获取群信息", fields=[("room_wxid", str)], idempotent=True),
+    Command("get_room_members", 11032, "获取群成员列表", fields=[("room_wxid", str)], timeout=30, idempotent=True),
+    Command("get_public", 11033, "获取公众号列表", timeout=60, idempotent=True),
+    Command("get_contact_by_protocol", 11034, "获取好友简要信息（协议）", fields=[("wxid", str)], idempotent=True),
+    Command("get_room_member_by_net", 11035, "获取群成员信息", fields=[
+        ("room_wxid", str), ("wxid", str)], idempotent=True),
+    Command("get_contact_detail_by_protocol", 11174, "获取好友详细信息（协议）", fields=[
+        ("wxid", str)], idempotent=True),
+    Command("get_contacts_by_protocol", 11174, "获取多个好友信息（协议）", fields=[
+        Field("wxids", List[str], key="username_list")], idempotent=True),
+    Command("modify_contact_remark", 11063, "修改好友备注", fields=[("wxid", str), ("remark", str)]),
+    Command("delete_friend", 11064, "删除好友", fields=[("wxid", str)]),
+    Command("accept_friend_request", 11065, "同意好友请求", fields=[
+        Field("encrypt_username", str, key="encryptusername"), ("ticket", str), ("scene", int, 17)]),
+    Command("search_friend", 11096, "搜索微信好友", fields=[("search", str)]),
+    Command("add_friend", 11097, "添加好友", fields=[("v1", str), ("v2", str), ("remark", str)]),
+    Command("add_friend_by_card", 11062, "添加好友分享的名片", fields=[
+        ("wxid", str), ("ticket", str), ("remark", str)], constants={"source_type": 17}),
+    Command("add_friend_by_room", 11062, "添加群成员为好友", fields=[
+        ("room_wxid", str), ("wxid", str), ("remark", str)], constants={"source_type": 14}),
+    Command("check_friend_status", 11080, "检查好友状态", fields=[("wxid", str)]),
+    Command("edit_address_book", 11076, "保存/移除通讯录", fields=[("room_id", str), ("status", int, 1)]),
+    Command("get_corporate_contacts", 11132, "获取企业联系人", timeout=60, idempotent=True),
+    Command("get_corporate_rooms", 11129, "获取企业群", timeout=60, idempotent=True),
+    Command("get_corporate_room_members", 11130, "获取企业微信群成员", fields=[
+        ("room_id", str)], timeout=30, idempotent=True),
+    Command("cdn_init", 11228, "初始化CDN"),
+    Command("cdn_upload", 11229, "CDN上传", fields=[("file_type", int), ("file_path", str)], timeout=120),
+    Command("cdn_download", 11230, "CDN下载", fields=[
+        ("file_id", str), ("aes_key", str), ("save_path", str), ("file_type", int)], timeout=120),
+    Command("cdn_download2", 11253, "企业微信CDN下载", fields=[
+        ("url", str), ("auth_key", str), ("aes_key", str), ("save_path", str)], timeout=120),
+    Command("send_text_by_cdn", 11237, "发送文本消息（CDN）", fields=[("to_wxid", str), ("content", str)]),
+    Command("send_room_at_by_cdn", 11240, "发送群at消息（CDN）", generate=False),
+    Command("send_card_by_cdn", 11239, "发送名片消息（CDN）", fields=[
+        ("to_wxid", str), ("username", str), ("nickname", str), ("avatar", str)]),
+    Command("send_link_card_by_cdn", 11236, "发送链接卡片消息（CDN）", fields=[
+        ("to_wxid", str), ("title", str), ("desc", str), ("url", str), ("image_url", str)]),
+    Command("send_image_by_cdn", 11231, "发送图片消息（CDN）", fields=[
+        ("to_wxid", str), ("file_id", str), ("file_md5", str), ("file_size", int), ("thumb_file_size", int),
+        ("crc32", int), ("aes_key", str)]),
+    Command("send_video_by_cdn", 11233, "发送视频消息（CDN）", fields=[
+        ("to_wxid", str), ("file_id", str), ("file_md5", str), ("file_size", int), ("thumb_file_size", int),
+        ("aes_key", str)]),
+    Command("send_file_by_cdn", 11235, "发送文件消息（CDN）", fields=[
+        ("to_wxid", str), ("file_id", str), ("file_md5", str), ("file_size", int), ("file_name", str),
+        ("aes_key", str)]),
+    Command("send_emotion_by_cdn", 11241, "发送表情消息（CDN）", fields=[
+        ("aes_key", str), ("file_id", str), ("file_md5", str), ("file_size", int), ("to_wxid", str)]),
+    Command("send_emotion2_by_cdn", 11254, "发送表情消息2（CDN）", fields=[("to_wxid", str), ("path", str)]),
+    Command("send_mini_program_by_cdn", 11242, "发送小程序消息（CDN）", fields=[
+        ("to_wxid", str), ("username", str), ("appid", str), ("appname", str), ("appicon", str), ("title", str),
+        ("page_path", str), ("aes_key", str), ("file_id", str), ("file_md5", str), ("file_size", int)]),
+    Command("send_video_card_by_cdn", 11243, "发送视频号消息（CDN）", fields=[
+        ("to_wxid", str), ("object_id", str), ("object_nonce_id", str), ("nickname", str), ("username", str),
+        ("avatar", str), ("desc", str), ("thumb_url", str), ("url", str)]),
+    Command("send_location_by_cdn", 11238, "发送位置消息（CDN）", fields=[
+        ("to_wxid", str), ("address", str), ("latitude", float), ("longitude", float), ("title", str)]),
+    Command("revoke_msg_by_cdn", 11244, "撤回消息（CDN）", fields=[
+        ("to_wxid", str), Field("new_msg_id", str, key="new_msgid"), Field("client_msg_id", int, key="client_msgid"),
+        ("create_time", int)]),
+    Command("get_tags", 11142, "获取标签列表", idempotent=True),
+    Command("add_tag", 11137, "添加标签", fields=[("label_name", str)]),
+    Command("modify_tag", 11139, "修改标签", sync=False, fields=[("label_id", int), ("label_name", str)]),
+    Command("delete_tag", 11138, "删除标签", fields=[("label_id", int)]),
+    Command("add_tags_to_contact", 11140, "批量给用户加标签", fields=[
+        ("wxid", str), Field("label_id_list", str, key="labelid_list")]),
+    Command("get_contact_tags", 11141, "获取联系人所有标签", fields=[("wxid", str)], idempotent=True),
+    Command("get_collections", 11109, "获取收藏列表", idempotent=True),
+    Command("get_mini_program_code", 11136, "获取小程序授权code", fields=[("appid", str)]),
+    Command("get_moments", 11145, "获取朋友圈", fields=[("max_id", str, "0")], idempotent=True),
+    Command("get_friend_moments", 11150, "获取好友朋友圈", fields=[
+        ("username", str), ("first_page_md5", str, ""), ("max_id", str, "0")], idempotent=True),
+    Command("comment_moment", 11146, "评论", fields=[("object_id", str), ("content", str)]),
+    Command("like_moment", 11147, "点赞", fields=[("object_id", str)]),
+    Command("post_moment", 11148, "发朋友圈", fields=[("object_desc", str)]),
+    Command("upload_image", 11149, "上传图片", fields=[Field("image_path", str, key="path")]),
+    Command("create_virtual_nickname", 11194, "创建虚拟昵称", sync=False, fields=[
+        ("nickname", str), Field("head_img_url", str, key="headimg_url")]),
+    Command("switch_virtual_nickname", 11195, "切换虚拟昵称", sync=False, fields=[("role_type", int)]),
+    Command("delete_virtual_nickname", 11197, "删除虚拟昵称", sync=False),
+    Command("init_video_account", 11160, "视频号初始化"),
+    Command("search_video_account", 11161, "视频号搜索", fields=[
+        ("query", str), ("scene", int), ("last_buff", str, "")], idempotent=True),
+    Command("get_video_account_user_page", 11170, "视频号用户主页", fields=[
+        ("username", str), ("last_buff", str, "")], idempotent=True),
+    Command("view_video_details", 11169, "查看视频详细信息(包含评论)", fields=[
+        ("object_id", str), ("object_nonce_id", str), ("last_buff", str, "")]),
+    Command("follow_video_blogger", 11167, "关注博主", fields=[("username", str)]),
+    Command("like_video", 11168, "视频号点赞", fields=[("object_id", str), ("object_nonce_id", str)]),
+    Command("get_message_session_id", 11202, "获取私信sessionId", fields=[
+        ("to_username", str), Field("role_type", int, key="roleType")]),
+    Command("send_private_message", 11203, "发送私信", fields=[
+        ("to_username", str), ("session_id", str), ("content", str)]),
+    Command("enter_live_room", 11162, "进入直播间", fields=[
+        ("object_id", str), ("live_id", str), ("object_nonce_id", str)]),
+    Command("get_live_room_online_users", 11172, "获取直播间在线人员", fields=[
+        ("object_id", str), ("live_id", str), ("object_nonce_id", str)], constants={"last_buff": ""}, idempotent=True),
+    Command("get_live_room_updates", 11163, "获取直播间变动信息(人气，实时发言等)"),
+    Command("speak_in_live_room", 11164, "直播间发言", fields=[("content", str)]),
+    Command("like_in_live_room", 11185, "直播间点赞", fields=[("count", int)]),
+    Command("get_live_room_shelves", 11186, "获取直播间货架", fields=[
+        ("live_username", str), ("request_id", str)], idempotent=True),
+    Command("get_shelf_product_detail", 11187, "获取货架商品详细信息", fields=[
+        ("appid", str), ("request_id", str), ("product_id", str), ("real_appid", str),
+        ("live_username", str)], idempotent=True),
+    Command("get_a8key", 11135, "A8Key接口", fields=[("url", str), ("scene", int)]),
+    Command("exec_sql", 11027, "执行SQL命令", fields=[("sql", str), ("db", int)], timeout=30),
+]
+
+
+def register(command: Command) -> Command:
+    """注册命令，检查名称和类型码是否重复"""
+    if command.name in COMMANDS:
+        raise ValueError(f"command {command.name} already registered.")
+    for other in COMMANDS.values():
+        if other.type == command.type and command.name not in SHARED_TYPES.get(command.type, ()):
+            raise ValueError(f"command {command.name} reuses type {command.type} of {other.name}.")
+    COMMANDS[command.name] = command
+    return command
+
+
+for _command in _SPECS:
+    register(_command)
+
+
+def _runtime_types(annotation: typing.Any) -> typing.Optional[tuple]:
+    """参数注解对应的isinstance检查类型，无法检查时返回None（List[str]只检查list，float也接受int）"""
+    if annotation is typing.Any:
+        return None
+    if annotation is float:
+        return int, float
+    origin = typing.get_origin(annotation)
+    if origin is typing.Union:
+        types = [_runtime_types(arg) for arg in typing.get_args(annotation)]
+        return None if None in types else tuple(t for arg_types in types for t in arg_types)
+    if origin is not None:
+        return (origin,) if isinstance(origin, type) else None
+    if annotation is None:
+        return type(None),
+    return (annotation,) if isinstance(annotation, type) else None
+
+
+def make_method(command: Command) -> typing.Callable:
+    """根据命令定义生成WeChat方法（与手写的字典构建等价，参数个数由函数签名检查，参数类型按注解检查）"""
+    namespace = {"_command": command}
+    params = ["self", "client_id: _client_id_annotation"]
+    namespace["_client_id_annotation"] = int
+    items = []
+    checks = []
+    for i, field in enumerate(command.fields):
+        namespace[f"_annotation_{i}"] = field.annotation
+        param = f"{field.name}: _annotation_{i}"
+        if field.default is not _MISSING:
+            namespace[f"_default_{i}"] = field.default
+            param += f" = _default_{i}"
+        params.append(param)
+        items.append(f"{field.key!r}: {field.name}")
+        types = _runtime_types(field.annotation)
+        if types is not None:
+            namespace[f"_types_{i}"] = types
+            type_names = "/".join(t.__name__ for t in types)
+            checks.append(
+                f"    if not isinstance({field.name}, _types_{i}):\n"
+                f"        raise TypeError(f\"{command.name}() argument {field.name!r} must be {type_names}, "
+                f"not {{type({field.name}).__name__}}\")\n"
+            )
+    items.extend(f"{key!r}: {value!r}" for key, value in command.constants.items())
+    if command.sync:
+        namespace["_timeout_annotation"] = Optional[int]
+        params.append("timeout: _timeout_annotation = None")
+        call = f"self.execute(_command, client_id, {{'type': {command.type}, 'data': {{{', '.join(items)}}}}}, timeout)"
+    else:
+        call = f"self.execute(_command, client_id, {{'type': {command.type}, 'data': {{{', '.join(items)}}}}})"
+    source = f"def {command.name}({', '.join(params)}) -> dict:\n{''.join(checks)}    return {call}\n"
+    exec(source, namespace)
+    method = namespace[command.name]
+    method.__doc__ = command.doc
+    method.__module__ = "wechat.core"
+    method.__qualname__ = f"WeChat.{command.name}"
+    return method
+
+
+def install(cls: type) -> type:
+    """将注册表中的命令生成为cls的方法"""
+    for command in COMMANDS.values():
+        if command.generate:
+            setattr(cls, command.name, make_method(command))
+    return cls
@@ -0,0 +1,165 @@
+import collections
+import json
+import sqlite3
+import sys
+import threading
+import time
+import typing
+
+from wechat.core import Event
+from wechat.events import TEXT_MESSAGE
+
+# 每条消息除内容外的估算开销（字节）
+MESSAGE_OVERHEAD = 200
+
+
+class Conversation:
+    __slots__ = ("messages", "size", "last_active")
+
+    def __init__(self, max_messages: int, messages: typing.Iterable[dict] = (), last_active: float = 0):
+        self.messages: typing.Deque[dict] = collections.deque(maxlen=max_messages)
+        self.size = 0
+        self.last_active = last_active
+        for message in messages:
+            self.append(message)
+
+    @staticmethod
+    def message_size(message: dict) -> int:
+        return MESSAGE_OVERHEAD + sum(len(value) for value in message.values() if isinstance(value, str))
+
+    def append(self, message: dict) -> int:
+        """追加消息，返回占用字节数的变化"""
+        delta = self.message_size(message)
+        if len(self.messages) == self.messages.maxlen:
+            delta -= self.message_size(self.messages[0])
+        self.messages.append(message)
+        self.size += delta
+        return delta
+
+
+class ContextStore:
+
+    def __init__(
+            self,
+            wechat=None,
+            max_messages: int = 20,
+            max_conversations: int = 100000,
+            max_bytes: int = 64 * 1024 * 1024,
+            ttl: typing.Optional[float] = 24 * 3600,
+            spill_file: typing.Optional[str] = None
+    ):
+        self.max_messages = max_messages
+        self.max_conversations = max_conversations
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.size = 0
+        self.conversations: typing.OrderedDict[typing.Tuple[int, str], Conversation] = collections.OrderedDict()
+        self.__lock = threading.RLock()
+        self.__db = None
+        if spill_file is not None:
+            self.__db = sqlite3.connect(spill_file, check_same_thread=False)
+            self.__db.execute(
+                "CREATE TABLE IF NOT EXISTS context (client_id INTEGER, conversation TEXT, messages TEXT, "
+                "last_active REAL, PRIMARY KEY (client_id, conversation))"
+            )
+            self.__db.commit()
+        if wechat is not None:
+            wechat.handle(TEXT_MESSAGE)(self.on_text_message)
+
+    def on_text_message(self, wechat, event: Event) -> None:
+        data = event["data"]
+        conversation = data.get("room_wxid")
+        if not conversation:
+            # 自己发出的私聊消息from_wxid是自己，按接收人归入会话
+            conversation = data.get("from_wxid")
+            if conversation and conversation == wechat.self_wxid(event["client_id"]):
+                conversation = data.get("to_wxid")
+        if not conversation:
+            return
+        self.add(event["client_id"], conversation, {
+            "from_wxid": data.get("from_wxid", ""),
+            "content": data.get("msg", data.get("content", "")),
+            "timestamp": data.get("timestamp", int(time.time()))
+        })
+
+    def add(self, client_id: int, conversation: str, message: dict) -> None:
+        """追加一条消息到会话上下文"""
+        key = (client_id, sys.intern(conversation))
+        now = time.time()
+        with self.__lock:
+            item = self.conversations.get(key)
+            if item is None:
+                item = self.__load(key) or Conversation(self.max_messages)
+                self.conversations[key] = item
+                self.size += item.size
+            else:
+                self.conversations.move_to_end(key)
+            item.last_active = now
+            self.size += item.append(message)
+            self.__evict(now)
+
+    def get(self, client_id: int, conversation: str) -> typing.List[dict]:
+        """获取会话最近的消息"""
+        key = (client_id, conversation)
+        with self.__lock:
+            item = self.conversations.get(key)
+            if item is None:
+                item = self.__load(key)
+                if item is None:
+                    return []
+                self.conversations[key] = item
+                self.size += item.size
+                self.__evict(time.time())
+            else:
+                self.conversations.move_to_end(key)
+            return list(item.messages)
+
+    def clear(self, client_id: int, conversation: str) -> None:
+        key = (client_id, conversation)
+        with self.__lock:
+            item = self.conversations.pop(key, None)
+            if item is not None:
+                self.size -= item.size
+            if self.__db is not None:
+                self.__db.execute("DELETE FROM context WHERE client_id = ? AND conversation = ?", key)
+                self.__db.commit()
+
+    def __evict(self, now: float) -> None:
+        expire_before = now - self.ttl if self.ttl else None
+        while self.conversations:
+            key, item = next(iter(self.conversations.items()))
+            expired = expire_before is not None and item.last_active < expire_before
+            if not expired and len(self.conversations) <= self.max_conversations and self.size <= self.max_bytes:
+                break
+            self.conversations.popitem(last=False)
+            self.size -= item.size
+            if not expired:
+                self.__spill(key, item)
+
+    def __spill(self, key: typing.Tuple[int, str], item: Conversation) -> None:
+        if self.__db is None:
+            return
+        self.__db.execute(
+            "INSERT OR REPLACE INTO context (client_id, conversation, messages, last_active) VALUES (?, ?, ?, ?)",
+            (key[0], key[1], json.dumps(list(item.messages), ensure_ascii=False), item.last_active)
+        )
+        self.__db.commit()
+
+    def __load(self, key: typing.Tuple[int, str]) -> typing.Optional[Conversation]:
+        if self.__db is None:
+            return None
+        row = self.__db.execute(
+            "SELECT messages, last_active FROM context WHERE client_id = ? AND conversation = ?", key
+        ).fetchone()
+        if row is None:
+            return None
+        self.__db.execute("DELETE FROM context WHERE client_id = ? AND conversation = ?", key)
+        self.__db.commit()
+        if self.ttl and row[1] < time.time() - self.ttl:
+            return None
+        return Conversation(self.max_messages, json.loads(row[0]), row[1])
+
+    def stats(self) -> dict:
+        with self.__lock:
+            spilled = self.__db.execute("SELECT COUNT(*) FROM context").fetchone()[0] if self.__db else 0
+            return {"conversations": len(self.conversations), "bytes": self.size, "spilled": spilled}
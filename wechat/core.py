@@ -1,7 +1,12 @@
 import binascii
+import collections.abc
+import concurrent.futures
 import datetime
+import functools
 import json
+import os
 import socketserver
+import sys
 import threading
 import time
 import traceback
@@ -14,28 +19,110 @@ from typing import Optional, Union, List
 
 from pyee.executor import EventEmitter
 
-from wechat.events import ALL_MESSAGE, WECHAT_CONNECT_MESSAGE
-from wechat.utils import hook
+from wechat.commands import COMMANDS, Command, CommandMetrics, install
+from wechat.template import CommandTemplate
+from wechat.events import ALL_MESSAGE, WECHAT_CONNECT_MESSAGE, USER_LOGIN_MESSAGE, USER_LOGOUT_MESSAGE
+from wechat.utils import hook, wait_for_port
 from wechat.logger import logger
 
 
+class Event(collections.abc.Mapping):
+    """事件（只读视图与to_dict()的结果一致，trace为None时不包含trace键）"""
+    __slots__ = ("type", "client_id", "data", "trace", "extra")
+    FIELDS = ("type", "client_id", "data", "trace")
+    INTERN_FIELDS = ("from_wxid", "to_wxid", "room_wxid")
+
+    def __init__(self, type: typing.Optional[int] = None, client_id: int = 0, data: typing.Any = None,
+                 trace: typing.Optional[str] = None, extra: typing.Optional[dict] = None):
+        self.type = type
+        self.client_id = client_id
+        self.data = data
+        self.trace = trace
+        self.extra = extra
+
+    @classmethod
+    def from_dict(cls, message: dict, client_id: int = 0) -> "Event":
+        data = message.pop("data", None)
+        if isinstance(data, dict):
+            for field in cls.INTERN_FIELDS:
+                value = data.get(field)
+                if value.__class__ is str:
+                    data[field] = sys.intern(value)
+        return cls(message.pop("type", None), client_id, data, message.pop("trace", None), message or None)
+
+    def to_dict(self) -> dict:
+        message = {"type": self.type, "client_id": self.client_id, "data": self.data}
+        if self.trace is not None:
+            message["trace"] = self.trace
+        if self.extra:
+            message.update(self.extra)
+        return message
+
+    def copy(self) -> "Event":
+        return Event(self.type, self.client_id, self.data, self.trace, self.extra)
+
+    def get(self, key: str, default: typing.Any = None) -> typing.Any:
+        if key in self.FIELDS:
+            if key == "trace" and self.trace is None:
+                return default
+            return getattr(self, key)
+        return self.extra.get(key, default) if self.extra else default
+
+    def __getitem__(self, key: str) -> typing.Any:
+        if key in self.FIELDS and (key != "trace" or self.trace is not None):
+            return getattr(self, key)
+        if self.extra and key in self.extra:
+            return self.extra[key]
+        raise KeyError(key)
+
+    def __setitem__(self, key: str, value: typing.Any) -> None:
+        if key in self.FIELDS:
+            setattr(self, key, value)
+        else:
+            if self.extra is None:
+                self.extra = {}
+            self.extra[key] = value
+
+    def __contains__(self, key: typing.Any) -> bool:
+        if key in self.FIELDS:
+            return key != "trace" or self.trace is not None
+        return bool(self.extra) and key in self.extra
+
+    def __iter__(self) -> typing.Iterator[str]:
+        yield "type"
+        yield "client_id"
+        yield "data"
+        if self.trace is not None:
+            yield "trace"
+        if self.extra:
+            yield from self.extra
+
+    def __len__(self) -> int:
+        return 3 + (self.trace is not None) + (len(self.extra) if self.extra else 0)
+
+    def __repr__(self) -> str:
+        return repr(self.to_dict())
+
+
 class ReqData:
-    __response_message: typing.Optional[dict] = None
-    msg_type: int = 0
-    request_data: typing.Optional[dict] = None
+    __slots__ = ("msg_type", "request_data", "__response_message", "__wait_lock")
 
     def __init__(self, msg_type: int, data: dict):
         self.msg_type = msg_type
         self.request_data = data
-        self.__wait_event = threading.Event()
+        self.__response_message = None
+        self.__wait_lock = threading.Lock()
+        self.__wait_lock.acquire()
 
     def wait_response(self, timeout: typing.Optional[int] = None) -> dict:
-        self.__wait_event.wait(timeout)
+        if self.__wait_lock.acquire(timeout=-1 if timeout is None else timeout):
+            self.__wait_lock.release()
         return self.get_response_data()
 
-    def on_response(self, message: dict) -> None:
-        self.__response_message = message
-        self.__wait_event.set()
+    def on_response(self, message: typing.Union[Event, dict]) -> None:
+        if self.__response_message is None:
+            self.__response_message = message
+            self.__wait_lock.release()
 
     def get_response_data(self) -> typing.Union[dict, None]:
         if self.__response_message is None:
@@ -54,9 +141,6 @@ class RequestHandler(socketserver.BaseRequestHandler):
                 if len(chunk) == 0 or chunk[-2:] == b"0A":
                     break
 
-            self.request.sendall("HTTP/1.1 200 OK".encode("utf-8"))
-            self.request.close()
-
             header_str = data.split(b"\r\n\r\n")[0].decode("utf-8")
             headers = {}
             for line in header_str.splitlines():
@@ -67,13 +151,36 @@ class RequestHandler(socketserver.BaseRequestHandler):
             hex_data = data.split(b"\r\n\r\n")[-1]
             hex_data_bytes = binascii.unhexlify(hex_data)
             raw_data = hex_data_bytes.decode("utf-8", "backslashreplace").rstrip("\n")
-            event = json.loads(raw_data)
-            event["client_id"] = int(headers["Client-Id"])
-            wechat = getattr(self.server, "wechat")
+            event = Event.from_dict(json.loads(raw_data), int(headers["Client-Id"]))
+        except Exception:
+            logger.warning(traceback.format_exc())
+            self.reply("HTTP/1.1 400 Bad Request")
+            return
+
+        wechat = getattr(self.server, "wechat")
+        if not wechat.accepts(event):
+            # 返回非2xx让hook重试，事件由重启后（或handoff的新进程）的事件服务接收
+            self.reply("HTTP/1.1 503 Service Unavailable")
+            return
+        self.reply("HTTP/1.1 200 OK")
+        try:
             wechat.on_recv(event)
         except Exception:
             logger.warning(traceback.format_exc())
 
+    def reply(self, status: str) -> None:
+        try:
+            self.request.sendall(status.encode("utf-8"))
+        finally:
+            self.request.close()
+
+
+class EventServer(socketserver.ThreadingTCPServer):
+    # Windows下SO_REUSEADDR允许端口被抢占，只在其他平台开启
+    allow_reuse_address = os.name != "nt"
+    daemon_threads = True
+    block_on_close = False
+
 
 class WeChat:
 
@@ -85,7 +192,11 @@ class WeChat:
             port: int = 19088,
             server_host: str = "127.0.0.1",
             server_port: int = 18999,
-            timeout: int = 10
+            timeout: typing.Optional[int] = None,
+            request_timeout: float = 10,
+            ready_timeout: int = 10,
+            spawn_hook: bool = True,
+            autostart: bool = True
     ):
         self.smart = smart
         self.pid = 0 if self.smart else pid
@@ -93,45 +204,292 @@ class WeChat:
         self.port = port
         self.server_host = server_host
         self.server_port = server_port
-        self.timeout = timeout
+        # 显式指定的timeout优先于命令注册表中的默认超时
+        self.timeout = timeout if timeout is not None else 10
+        self.__explicit_timeout = timeout is not None
+        self.request_timeout = request_timeout
+        self.ready_timeout = ready_timeout
+        self.spawn_hook = spawn_hook
+        self.startup_timings: typing.Dict[str, float] = {}
         self.base_url = f"http://{self.host}:{self.port}"
         self.server_base_url = f"http://{self.server_host}:{self.server_port}"
         self.event_emitter = EventEmitter()
         self.clients = []
+        # 客户端登录的账号wxid（USER_LOGIN_MESSAGE或get_self_info）
+        self.self_wxids: typing.Dict[int, str] = {}
+        # get_self_info失败后间隔多久再重试（秒），期间直接返回None
+        self.self_info_retry = 60
+        self.__self_info_failed: typing.Dict[int, float] = {}
+        self.middlewares: typing.List[typing.Callable[["WeChat", Event], typing.Optional[Event]]] = []
+        self.command_metrics: typing.Dict[str, CommandMetrics] = {}
+        # 按命令名覆盖默认超时
+        self.command_timeouts: typing.Dict[str, float] = {}
+        # hook(wechat, command, client_id, elapsed, response, error)，error为命令抛出的异常
+        self.command_hooks: typing.List[typing.Callable[
+            ["WeChat", Command, int, float, typing.Any, typing.Optional[BaseException]], None]] = []
+        # stop开始时调用（在排空之前），用于停止后台轮询等产生新请求的组件
+        self.stop_hooks: typing.List[typing.Callable[["WeChat"], None]] = []
+        # 可选：替代send_sync执行只读命令（例如对冲重试）
+        self.read_sender: typing.Optional[typing.Callable[["WeChat", Command, int, dict, int], typing.Any]] = None
+        # 可选：熔断器，需提供before(client_id)和record(client_id, ok, elapsed)
+        self.breaker = None
+        # 可选：准入控制，需提供submit(event)和drain(timeout)
+        self.admission = None
+        # 可选：事件去重，需提供accept(event)，在on_recv中先于准入控制和on_event执行
+        self.deduplicator = None
+        # 可选：处理函数计时，需提供run(func, wechat, event, delay)，handle注册的处理函数经过它调用
+        self.profiler = None
+        self.__executor: typing.Optional[concurrent.futures.ThreadPoolExecutor] = None
         self.__req_data_cache = {}
+        self.__handling = 0
+        self.__handling_cond = threading.Condition()
+        # stop排空期间只接受处理函数线程中发起的请求
+        self.__draining = False
+        self.__local = threading.local()
         self.login_event = threading.Event()
+        self.server_ready = threading.Event()
+        self.stopped = threading.Event()
+        self.running = False
+        self.server = None
+        self.server_thread = None
+        self.process = None
+        if autostart:
+            self.start()
+
+    def start(self) -> "WeChat":
+        """启动事件服务和hook进程"""
+        if self.running:
+            return self
+        self.running = True
+        self.__draining = False
+        self.stopped.clear()
+        self.server_ready.clear()
+        self.__started_at = time.perf_counter()
         self.server_thread = threading.Thread(target=self.start_server, daemon=True)
         self.server_thread.start()
-        self.process = hook(self.pid, self.host, self.port, f"http://{self.server_host}:{self.server_port}")
+        if self.spawn_hook:
+            self.process = hook(self.pid, self.host, self.port, f"http://{self.server_host}:{self.server_port}")
+            self.startup_timings["spawn"] = time.perf_counter() - self.__started_at
         logger.info(f"API Server at {self.base_url}")
-        if smart:
+        self.wait_ready(self.ready_timeout)
+        if self.smart and self.spawn_hook:
             self.open()
+            self.startup_timings["open"] = time.perf_counter() - self.__started_at
+        logger.info("Startup timings: " + ", ".join(f"{k}={v * 1000:.1f}ms" for k, v in self.startup_timings.items()))
+        return self
+
+    def stop(self, drain_timeout: float = 10, handoff: bool = False) -> None:
+        """停止服务：等待未完成的请求和事件处理，然后关闭hook进程（handoff模式下保留hook进程）"""
+        if not self.running or self.__draining:
+            return
+        for stop_hook in self.stop_hooks:
+            try:
+                stop_hook(self)
+            except Exception:
+                logger.error(traceback.format_exc())
+        # 先拒绝新的事件（返回503让hook重试）和外部请求，事件服务保持运行，排空期间处理函数的同步调用仍能收到回调
+        self.__draining = True
+        deadline = time.monotonic() + drain_timeout
+
+        if self.admission is not None:
+            self.admission.drain(max(0.0, deadline - time.monotonic()))
+
+        with self.__handling_cond:
+            self.__handling_cond.wait_for(lambda: self.__handling == 0, max(0.0, deadline - time.monotonic()))
+            if self.__handling:
+                logger.warning(f"{self.__handling} event handlers still running after {drain_timeout}s")
+
+        while self.__req_data_cache and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        self.running = False
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+
+        for trace in list(self.__req_data_cache):
+            req_data = self.__req_data_cache.pop(trace, None)
+            if req_data is not None:
+                req_data.on_response({"data": None})
+
+        if self.process is not None and not handoff:
+            self.process.terminate()
+            try:
+                self.process.wait(max(1.0, deadline - time.monotonic()))
+            except Exception:
+                self.process.kill()
+        self.stopped.set()
+        logger.info("WeChat stopped" + (" (hook kept for handoff)" if handoff else ""))
+
+    def __enter__(self) -> "WeChat":
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.stop()
+
+    def wait_ready(self, timeout: int = 10) -> bool:
+        """等待事件服务和API服务就绪"""
+        deadline = time.monotonic() + timeout
+        # 事件服务在自己的线程中启动，这里依次等待两项检查，总耗时取决于较慢的一项
+        api_ready = wait_for_port(self.host, self.port, timeout)
+        self.startup_timings["api"] = time.perf_counter() - self.__started_at
+        server_ready = self.server_ready.wait(max(0.0, deadline - time.monotonic()))
+        if not api_ready:
+            logger.warning(f"API Server at {self.base_url} is not ready after {timeout}s")
+        if not server_ready:
+            logger.warning(f"Event Server at {self.server_base_url} is not ready after {timeout}s")
+        return api_ready and server_ready
+
+    def restart_hook(self) -> None:
+        """重启hook进程，并重新打开（smart模式）或注入之前连接的微信"""
+        pids = [client["pid"] for client in self.clients]
+        if self.process is not None and self.process.poll() is None:
+            self.process.kill()
+        self.clients = []
+        self.self_wxids = {}
+        self.__self_info_failed = {}
+        self.process = hook(self.pid, self.host, self.port, f"http://{self.server_host}:{self.server_port}")
+        if not wait_for_port(self.host, self.port, self.ready_timeout):
+            logger.warning(f"API Server at {self.base_url} is not ready after restart")
+            return
+        if self.smart:
+            self.open()
+        else:
+            for pid in pids:
+                if pid != self.pid:
+                    self.inject(pid)
+        logger.info("Hook restarted")
 
     def open(self) -> dict:
-        return requests.post(url=f"{self.base_url}/api/open").json()
+        return requests.post(url=f"{self.base_url}/api/open", timeout=self.request_timeout).json()
 
     def inject(self, pid: int) -> dict:
-        return requests.post(url=f"{self.base_url}/api/inject/{pid}").json()
+        return requests.post(url=f"{self.base_url}/api/inject/{pid}", timeout=self.request_timeout).json()
 
     def send(self, client_id: int = 0, data: dict = None) -> dict:
-        return requests.post(url=f"{self.base_url}/api/client/{client_id}",
-                             data=binascii.hexlify(json.dumps(data, ensure_ascii=False).encode("utf-8"))).json()
+        return self.send_raw(client_id, binascii.hexlify(json.dumps(data, ensure_ascii=False).encode("utf-8")))
+
+    def send_raw(self, client_id: int, body: bytes) -> dict:
+        """发送已编码（hex）的消息"""
+        if self.breaker is None:
+            return requests.post(url=f"{self.base_url}/api/client/{client_id}", data=body,
+                                 timeout=self.request_timeout).json()
+        self.breaker.before(client_id)
+        started = time.perf_counter()
+        try:
+            response = requests.post(url=f"{self.base_url}/api/client/{client_id}", data=body,
+                                     timeout=self.request_timeout).json()
+        except Exception:
+            self.breaker.record(client_id, False, time.perf_counter() - started)
+            raise
+        if not getattr(self.__local, "sending_sync", False):
+            # 同步命令等到回调后由send_sync记录结果
+            self.breaker.record(client_id, True, time.perf_counter() - started)
+        return response
+
+    def send_template(self, client_id: int, template: "CommandTemplate", **values) -> dict:
+        """使用预编码的消息模板发送"""
+        return self.send_raw(client_id, template.render(**values))
 
     def destory(self) -> dict:
-        return requests.post(url=f"{self.base_url}/api/destory").json()
+        return requests.post(url=f"{self.base_url}/api/destory", timeout=self.request_timeout).json()
 
     def send_sync(self, client_id: int, data: dict, timeout: int = None) -> typing.Union[dict, None]:
         field_name = "trace"
         if data.get(field_name) is None:
             data[field_name] = str(uuid.uuid4())
 
+        if not self.running:
+            raise Exception("WeChat is not running")
+        if self.__draining and not getattr(self.__local, "handling", False):
+            raise Exception("WeChat is stopping")
+
         req_data = ReqData(data["type"], data)
         self.__req_data_cache[data[field_name]] = req_data
-
-        self.send(client_id, data)
-        return req_data.wait_response(timeout or self.timeout)
-
-    def on_event(self, data: dict) -> None:
+        started = time.perf_counter()
+        try:
+            self.__local.sending_sync = True
+            try:
+                self.send(client_id, data)
+            finally:
+                self.__local.sending_sync = False
+            response = req_data.wait_response(timeout or self.timeout)
+            if self.breaker is not None:
+                # 每个同步命令只记录一次结果：HTTP请求成功但没有等到回调（hook卡住）也计为失败
+                self.breaker.record(client_id, response is not None, time.perf_counter() - started)
+            return response
+        finally:
+            self.__req_data_cache.pop(data[field_name], None)
+
+    def timeout_for(self, command: Command) -> float:
+        """命令的超时：command_timeouts > WeChat(timeout=...) > 命令默认超时 > 10秒"""
+        timeout = self.command_timeouts.get(command.name)
+        if timeout:
+            return timeout
+        if self.__explicit_timeout or not command.timeout:
+            return self.timeout
+        return command.timeout
+
+    def execute(self, command: Command, client_id: int, data: dict, timeout: Optional[int] = None) -> dict:
+        """执行命令并记录耗时（所有命令方法的公共入口）"""
+        started = time.perf_counter()
+        response = None
+        error = None
+        try:
+            if command.sync:
+                timeout = timeout or self.timeout_for(command)
+                if self.read_sender is not None and command.idempotent:
+                    response = self.read_sender(self, command, client_id, data, timeout)
+                else:
+                    response = self.send_sync(client_id, data, timeout)
+            else:
+                response = self.send(client_id, data)
+            return response
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            metrics = self.command_metrics.get(command.name)
+            if metrics is None:
+                metrics = self.command_metrics.setdefault(command.name, CommandMetrics())
+            metrics.record(elapsed, response is not None)
+            for command_hook in self.command_hooks:
+                command_hook(self, command, client_id, elapsed, response, error)
+
+    def submit(self, name: str, *args, **kwargs) -> concurrent.futures.Future:
+        """在线程池中异步执行命令"""
+        if name not in COMMANDS:
+            raise ValueError(f"unknown command {name}.")
+        if self.__draining and not getattr(self.__local, "handling", False):
+            raise Exception("WeChat is stopping")
+        if self.__executor is None:
+            self.__executor = concurrent.futures.ThreadPoolExecutor(16, thread_name_prefix="command")
+        if getattr(self.__local, "handling", False):
+            # 处理函数提交的命令在排空期间同样允许执行
+            return self.__executor.submit(self.__run_as_handler, getattr(self, name), *args, **kwargs)
+        return self.__executor.submit(getattr(self, name), *args, **kwargs)
+
+    def __run_as_handler(self, func: typing.Callable, *args, **kwargs) -> typing.Any:
+        handling = getattr(self.__local, "handling", False)
+        self.__local.handling = True
+        try:
+            return func(*args, **kwargs)
+        finally:
+            self.__local.handling = handling
+
+    def batch(self, calls: typing.Iterable[typing.Tuple[str, tuple, dict]]) -> typing.List[typing.Any]:
+        """并发执行一批命令(name, args, kwargs)，按顺序返回结果（异常作为结果返回）"""
+        futures = [self.submit(name, *args, **kwargs) for name, args, kwargs in calls]
+        results = []
+        for future in futures:
+            try:
+                results.append(future.result())
+            except Exception as e:
+                results.append(e)
+        return results
+
+    def on_event(self, data: Event) -> None:
         try:
             if data.get("type") is not None:
                 if data["type"] == WECHAT_CONNECT_MESSAGE:
@@ -140,8 +498,16 @@ class WeChat:
                         "pid": data["data"]["pid"],
                         "create_time": datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
                     })
-                self.event_emitter.emit(str(ALL_MESSAGE), self, data)
-                self.event_emitter.emit(str(data["type"]), self, data)
+                elif data["type"] == USER_LOGIN_MESSAGE and data["data"].get("wxid"):
+                    self.self_wxids[data["client_id"]] = data["data"]["wxid"]
+                    self.__self_info_failed.pop(data["client_id"], None)
+                elif data["type"] == USER_LOGOUT_MESSAGE:
+                    self.self_wxids.pop(data["client_id"], None)
+                for middleware in self.middlewares:
+                    data = middleware(self, data)
+                    if data is None:
+                        return
+                self.emit(data)
             else:
                 if data.get("event") == "disconnected":
                     clients = []
@@ -149,120 +515,83 @@ class WeChat:
                         if client["id"] != data["client_id"]:
                             clients.append(client)
                     self.clients = clients
+                    self.self_wxids.pop(data["client_id"], None)
         except Exception:
             logger.error(traceback.format_exc())
 
-    def on_recv(self, data: dict) -> None:
+    def self_wxid(self, client_id: int, timeout: Optional[int] = None) -> typing.Optional[str]:
+        """客户端登录的账号wxid，未记录时通过get_self_info获取（失败后self_info_retry秒内直接返回None）"""
+        wxid = self.self_wxids.get(client_id)
+        if wxid is not None:
+            return wxid
+        failed_at = self.__self_info_failed.get(client_id)
+        if failed_at is not None and time.monotonic() - failed_at < self.self_info_retry:
+            return None
+        try:
+            response = self.get_self_info(client_id, timeout)
+        except Exception as e:
+            logger.warning(f"get_self_info of client {client_id} failed: {e}")
+            response = None
+        if not response or not response.get("wxid"):
+            self.__self_info_failed[client_id] = time.monotonic()
+            return None
+        self.__self_info_failed.pop(client_id, None)
+        self.self_wxids[client_id] = response["wxid"]
+        return response["wxid"]
+
+    def client_id_of(self, wxid: str) -> typing.Optional[int]:
+        """账号wxid当前对应的client_id（client_id在hook重启后会变化，持久化的任务应保存wxid）"""
+        for client_id, self_wxid in list(self.self_wxids.items()):
+            if self_wxid == wxid:
+                return client_id
+        for client in list(self.clients):
+            if self.self_wxid(client["id"]) == wxid:
+                return client["id"]
+        return None
+
+    def emit(self, data: Event) -> None:
+        """将事件分发给处理函数（不经过中间件）"""
+        self.event_emitter.emit(str(ALL_MESSAGE), self, data)
+        self.event_emitter.emit(str(data["type"]), self, data)
+
+    def accepts(self, data: Event) -> bool:
+        """事件服务是否确认接收该事件：排空期间只接收同步调用的回调"""
+        return not self.__draining or data.get("trace") is not None
+
+    def on_recv(self, data: Event) -> None:
         logger.debug(data)
         if data.get("trace") is not None:
-            req_data = self.__req_data_cache[data["trace"]]
-            req_data.on_response(data)
-            del self.__req_data_cache[data["trace"]]
-        else:
+            req_data = self.__req_data_cache.pop(data["trace"], None)
+            if req_data is not None:
+                req_data.on_response(data)
+            return
+
+        if self.__draining:
+            logger.warning(f"WeChat is stopping, event dropped: {data}")
+            return
+        if self.deduplicator is not None and not self.deduplicator.accept(data):
+            return
+        if self.admission is not None:
+            self.admission.submit(data)
+            return
+        self.process_event(data)
+
+    def process_event(self, data: Event) -> None:
+        """处理事件（计入进行中的处理数，stop时等待其完成）"""
+        with self.__handling_cond:
+            self.__handling += 1
+        handling = getattr(self.__local, "handling", False)
+        started = getattr(self.__local, "started", None)
+        self.__local.handling = True
+        self.__local.started = time.perf_counter()
+        try:
             self.on_event(data)
-
-    def send_text(self, client_id: int, to_wxid: str, content: str) -> dict:
-        """发送文本消息"""
-        data = {
-            "type": 11036,
-            "data": {
-                "to_wxid": to_wxid,
-                "content": content
-            }
-        }
-        return self.send(client_id, data)
-
-    def send_room_at(self, client_id: int, to_wxid: str, content: str, at_list: List[str]) -> dict:
-        """发送群at消息"""
-        data = {
-            "type": 11037,
-            "data": {
-                "to_wxid": to_wxid,
-                "content": content,
-                "at_list": at_list
-            }
-        }
-        return self.send(client_id, data)
-
-    def send_card(self, client_id: int, to_wxid: str, card_wxid: str) -> dict:
-        """发送名片消息"""
-        data = {
-            "type": 11038,
-            "data": {
-                "to_wxid": to_wxid,
-                "card_wxid": card_wxid
-            }
-        }
-        return self.send(client_id, data)
-
-    def send_link_card(self, client_id: int, to_wxid: str, title: str, desc: str, url: str, image_url: str) -> dict:
-        """发送链接卡片消息"""
-        data = {
-            "type": 11039,
-            "data": {
-                "to_wxid": to_wxid,
-                "title": title,
-                "desc": desc,
-                "url": url,
-                "image_url": image_url
-            }
-        }
-        return self.send(client_id, data)
-
-    def send_image(self, client_id: int, to_wxid: str, file: str) -> dict:
-        """发送图片消息"""
-        data = {
-            "type": 11040,
-            "data": {
-                "to_wxid": to_wxid,
-                "file": file
-            }
-        }
-        return self.send(client_id, data)
-
-    def send_video(self, client_id: int, to_wxid: str, file: str) -> dict:
-        """发送视频消息"""
-        data = {
-            "type": 11042,
-            "data": {
-                "to_wxid": to_wxid,
-                "file": file
-            }
-        }
-        return self.send(client_id, data)
-
-    def send_file(self, client_id: int, to_wxid: str, file: str) -> dict:
-        """发送文件消息"""
-        data = {
-            "type": 11041,
-            "data": {
-                "to_wxid": to_wxid,
-                "file": file
-            }
-        }
-        return self.send(client_id, data)
-
-    def send_emotion(self, client_id: int, to_wxid: str, file: str) -> dict:
-        """发送表情消息"""
-        data = {
-            "type": 11043,
-            "data": {
-                "to_wxid": to_wxid,
-                "file": file
-            }
-        }
-        return self.send(client_id, data)
-
-    def send_pat(self, client_id: int, room_wxid: str, patted_wxid: str) -> dict:
-        """发送拍一拍消息"""
-        data = {
-            "type": 11250,
-            "data": {
-                "room_wxid": room_wxid,
-                "patted_wxid": patted_wxid
-            }
-        }
-        return self.send(client_id, data)
+        finally:
+            self.__local.handling = handling
+            self.__local.started = started
+            with self.__handling_cond:
+                self.__handling -= 1
+                self.__handling_cond.notify_all()
 
     def create_room(self, client_id: int, member_list: List[str]) -> dict:
         """创建群聊"""
@@ -270,7 +599,7 @@ class WeChat:
             "type": 11068,
             "data": member_list
         }
-        return self.send(client_id, data)
+        return self.execute(COMMANDS["create_room"], client_id, data)
 
     def create_room_by_protocol(self, client_id: int, member_list: List[str], timeout: Optional[int] = None) -> dict:
         """创建群聊（协议）"""
@@ -278,463 +607,7 @@ class WeChat:
             "type": 11246,
             "data": member_list
         }
-        return self.send_sync(client_id, data, timeout)
-
-    def get_invitation_relationship(self, client_id: int, room_wxid: str, timeout: Optional[int] = None) -> dict:
-        """获取群成员邀请关系"""
-        data = {
-            "type": 11134,
-            "data": {
-                "room_wxid": room_wxid
-            }
-        }
-        return self.send_sync(client_id, data, timeout)
-
-    def add_room_member(self, client_id: int, room_wxid: str, member_list: List[str],
-                        timeout: Optional[int] = None) -> dict:
-        """添加群成员"""
-        data = {
-            "type": 11069,
-            "data": {
-                "room_wxid": room_wxid,
-                "member_list": member_list
-            }
-        }
-        return self.send_sync(client_id, data, timeout)
-
-    def invite_room_member(self, client_id: int, room_wxid: str, member_list: List[str],
-                           timeout: Optional[int] = None) -> dict:
-        """邀请群成员"""
-        data = {
-            "type": 11070,
-            "data": {
-                "room_wxid": room_wxid,
-                "member_list": member_list
-            }
-        }
-        return self.send_sync(client_id, data, timeout)
-
-    def remove_room_member(self, client_id: int, room_wxid: str, wxid: str, timeout: Optional[int] = None) -> dict:
-        """移出群成员"""
-        data = {
-            "type": 11071,
-            "data": {
-                "room_wxid": room_wxid,
-                "name": wxid
-            }
-        }
-        return self.send_sync(client_id, data, timeout)
-
-    def modify_room_name(self, client_id: int, room_wxid: str, name: str, timeout: Optional[int] = None) -> dict:
-        """修改群名称"""
-        data = {
-            "type": 11072,
-            "data": {
-                "room_wxid": room_wxid,
-                "name": name
-            }
-        }
-        return self.send_sync(client_id, data, timeout)
-
-    def modify_room_notice(self, client_id: int, room_wxid: str, notice: str, timeout: Optional[int] = None) -> dict:
-        """修改群公告"""
-        data = {
-            "type": 11073,
-            "data": {
-                "room_wxid": room_wxid,
-                "notice": notice
-            }
-        }
-        return self.send_sync(client_id, data, timeout)
-
-    def modify_room_member_nickname(self, client_id: int, room_id: str, nickname: int,
-                                    timeout: Optional[int] = None) -> dict:
-        """修改我在本群的昵称"""
-        data = {
-            "type": 11074,
-            "data": {
-                "room_id": room_id,
-                "nickname": nickname
-            }
-        }
-        return self.send_sync(client_id, data, timeout)
-
-    def display_room_member_nickname(self, client_id: int, room_id: str, status: int = 1,
-                                     timeout: Optional[int] = None) -> dict:
-        """是否显示群成员昵称"""
-        data = {
-            "type": 11075,
-            "data": {
-                "room_id": room_id,
-                "status": status
-            }
-        }
-        return self.send_sync(client_id, data, timeout)
-
-    def get_room_by_protocol(self, client_id: int, wxid: str, timeout: Optional[int] = None) -> dict:
-        """获取群信息（协议）"""
-        data = {
-            "type": 11174,
-            "data": {
-                "wxid": wxid
-            }
-        }
-        return self.send_sync(client_id, data, timeout)
-
-    def exit_room(self, client_id: int, room_id: str, timeout: Optional[int] = None) -> dict:
-        """退出群聊"""
-        data = {
-            "type": 11077,
-            "data": {
-                "room_id": room_id
-            }
-        }
-        return self.send_sync(client_id, data, timeout)
-
-    def confirm_receipt(self, client_id: int, transfer_id: str) -> dict:
-        """确认收款"""
-        data = {
-            "type": 11066,
-            "data": {
-                "transferid": transfer_id
-            }
-        }
-        return self.send(client_id, data)
-
-    def pin_chat(self, client_id: int, wxid: str, status: int, timeout: Optional[int] = None) -> dict:
-        """置顶/取消置顶聊天"""
-        data = {
-            "type": 11079,
-            "data": {
-                "wxid": wxid,
-                "status": status
-            }
-        }
-        return self.send_sync(client_id, data, timeout)
-
-    def set_disturb(self, client_id: int, wxid: str, status: int, timeout: Optional[int] = None) -> dict:
-        """开启/关闭消息免打扰"""
-        data = {
-            "type": 11078,
-            "data": {
-                "wxid": wxid,
-                "status": status
-            }
-        }
-        return self.send_sync(client_id, data, timeout)
-
-    def clear_chat_history(self, client_id: int) -> dict:
-        """清除聊天记录"""
-        data = {
-            "type": 11108,
-            "data": {}
-        }
-        return self.send(client_id, data)
-
-    def decode_image(self, client_id: int, src_file: str, dest_file: str) -> dict:
-        """解密图片"""
-        data = {
-            "type": 10085,
-            "data": {
-                "src_file": src_file,
-                "dest_file": dest_file
-            }
-        }
-        return self.send(client_id, data)
-
-    def get_self_info(self, client_id: int, timeout: Optional[int] = None) -> dict:
-        """获取当前账号信息"""
-        data = {
-            "type": 11028,
-            "data": {}
-        }
-        return self.send_sync(client_id, data, timeout)
-
-    def get_contacts(self, client_id: int, timeout: Optional[int] = None) -> dict:
-        """获取好友列表"""
-        data = {
-            "type": 11030,
-            "data": {}
-        }
-        return self.send_sync(client_id, data, timeout)
-
-    def get_contact(self, client_id: int, wxid: str, timeout: Optional[int] = None) -> dict:
-        """获取好友信息"""
-        data = {
-            "type": 11029,
-            "data": {
-                "wxid": wxid
-            }
-        }
-        return self.send_sync(client_id, data, timeout)
-
-    def get_rooms(self, client_id: int, detail: int = 1, timeout: Optional[int] = None) -> dict:
-        """获取群列表"""
-        data = {
-            "type": 11031,
-            "data": {
-                "detail": detail
-            }
-        }
-        return self.send_sync(client_id, data, timeout)
-
-    def get_room(self, client_id: int, room_wxid: str, timeout: Optional[int] = None) -> dict:
-        """获取群信息"""
-        data = {
-            "type": 11125,
-            "data": {
-                "room_wxid": room_wxid
-            }
-        }
-        return self.send_sync(client_id, data, timeout)
-
-    def get_room_members(self, client_id: int, room_wxid: str, timeout: Optional[int] = None) -> dict:
-        """获取群成员列表"""
-        data = {
-            "type": 11032,
-            "data": {
-                "room_wxid": room_wxid
-            }
-        }
-        return self.send_sync(client_id, data, timeout)
-
-    def get_public(self, client_id: int, timeout: Optional[int] = None) -> dict:
-        """获取公众号列表"""
-        data = {
-            "type": 11033,
-            "data": {}
-        }
-        return self.send_sync(client_id, data, timeout)
-
-    def get_contact_by_protocol(self, client_id: int, wxid: str, timeout: Optional[int] = None) -> dict:
-        """获取好友简要信息（协议）"""
-        data = {
-            "type": 11034,
-            "data": {
-                "wxid": wxid
-            }
-        }
-        return self.send_sync(client_id, data, timeout)
-
-    def get_room_member_by_net(self, client_id: int, room_wxid: str, wxid: str, timeout: Optional[int] = None) -> dict:
-        """获取群成员信息"""
-        data = {
-            "type": 111035,
-            "data": {
-                "room_wxid": room_wxid,
-                "wxid": wxid
-            }
-        }
-        return self.send_sync(client_id, data, timeout)
-
-    def get_contact_detail_by_protocol(self, client_id: int, wxid: str, timeout: Optional[int] = None) -> dict:
-        """获取好友详细信息（协议）"""
-        data = {
-            "type": 11174,
-            "data": {
-                "wxid": wxid
-            }
-        }
-        return self.send_sync(client_id, data, timeout)
-
-    def get_contacts_by_protocol(self, client_id: int, wxids: List[str], timeout: Optional[int] = None) -> dict:
-        """获取多个好友信息（协议）"""
-        data = {
-            "type": 11174,
-            "data": {
-                "username_list": wxids
-            }
-        }
-        return self.send_sync(client_id, data, timeout)
-
-    def modify_contact_remark(self, client_id: int, wxid: str, remark: str, timeout: Optional[int] = None) -> dict:
-        """修改好友备注"""
-        data = {
-            "type": 11063,
-            "data": {
-                "wxid": wxid,
-                "remark": remark
-            }
-        }
-        return self.send_sync(client_id, data, timeout)
-
-    def delete_friend(self, client_id: int, wxid: str, timeout: Optional[int] = None) -> dict:
-        """删除好友"""
-        data = {
-            "type": 11064,
-            "data": {
-                "wxid": wxid
-            }
-        }
-        return self.send_sync(client_id, data, timeout)
-
-    def accept_friend_request(self, client_id: int, encrypt_username: str, ticket: str, scene: int = 17,
-                              timeout: Optional[int] = None) -> dict:
-        """同意好友请求"""
-        data = {
-            "type": 11065,
-            "data": {
-                "encryptusername": encrypt_username,
-                "ticket": ticket,
-                "scene": scene
-            }
-        }
-        return self.send_sync(client_id, data, timeout)
-
-    def search_friend(self, client_id: int, search: str, timeout: Optional[int] = None) -> dict:
-        """搜索微信好友"""
-        data = {
-            "type": 11096,
-            "data": {
-                "search": search
-            }
-        }
-        return self.send_sync(client_id, data, timeout)
-
-    def add_friend(self, client_id: int, v1: str, v2: str, remark: str, timeout: Optional[int] = None) -> dict:
-        """添加好友"""
-        data = {
-            "type": 11097,
-            "data": {
-                "v1": v1,
-                "v2": v2,
-                "remark": remark
-            }
-        }
-        return self.send_sync(client_id, data, timeout)
-
-    def add_friend_by_card(self, client_id: int, wxid: str, ticket: str, remark: str,
-                           timeout: Optional[int] = None) -> dict:
-        """添加好友分享的名片"""
-        data = {
-            "type": 11062,
-            "data": {
-                "remark": remark,
-                "source_type": 17,
-                "wxid": wxid,
-                "ticket": ticket
-            }
-        }
-        return self.send_sync(client_id, data, timeout)
-
-    def add_friend_by_room(self, client_id: int, room_wxid: str, wxid: str, remark: str,
-                           timeout: Optional[int] = None) -> dict:
-        """添加群成员为好友"""
-        data = {
-            "type": 11062,
-            "data": {
-                "remark": remark,
-                "source_type": 14,
-                "wxid": wxid,
-                "room_wxid": room_wxid
-            }
-        }
-        return self.send_sync(client_id, data, timeout)
-
-    def check_friend_status(self, client_id: int, wxid: str, timeout: Optional[int] = None) -> dict:
-        """检查好友状态"""
-        data = {
-            "type": 11080,
-            "data": {
-                "wxid": wxid
-            }
-        }
-        return self.send_sync(client_id, data, timeout)
-
-    def edit_address_book(self, client_id: int, room_id: str, status: int = 1, timeout: Optional[int] = None) -> dict:
-        """保存/移除通讯录"""
-        data = {
-            "type": 11076,
-            "data": {
-                "room_id": room_id,
-                "status": status
-            }
-        }
-        return self.send_sync(client_id, data, timeout)
-
-    def get_corporate_contacts(self, client_id: int, timeout: Optional[int] = None) -> dict:
-        """获取企业联系人"""
-        data = {
-            "type": 11132,
-            "data": {}
-        }
-        return self.send_sync(client_id, data, timeout)
-
-    def get_corporate_rooms(self, client_id: int, timeout: Optional[int] = None) -> dict:
-        """获取企业群"""
-        data = {
-            "type": 11129,
-            "data": {}
-        }
-        return self.send_sync(client_id, data, timeout)
-
-    def get_corporate_room_members(self, client_id: int, room_id: str, timeout: Optional[int] = None) -> dict:
-        """获取企业微信群成员"""
-        data = {
-            "type": 11130,
-            "data": {
-                "room_id": room_id
-            }
-        }
-        return self.send_sync(client_id, data, timeout)
-
-    def cdn_init(self, client_id: int, timeout: Optional[int] = None) -> dict:
-        """初始化CDN"""
-        data = {
-            "type": 11228,
-            "data": {}
-        }
-        return self.send_sync(client_id, data, timeout)
-
-    def cdn_upload(self, client_id: int, file_type: int, file_path: str, timeout: Optional[int] = None) -> dict:
-        """CDN上传"""
-        data = {
-            "type": 11229,
-            "data": {
-                "file_type": file_type,
-                "file_path": file_path
-            }
-        }
-        return self.send_sync(client_id, data, timeout)
-
-    def cdn_download(self, client_id: int, file_id: str, aes_key: str, save_path: str, file_type: int,
-                     timeout: Optional[int] = None) -> dict:
-        """CDN下载"""
-        data = {
-            "type": 11230,
-            "data": {
-                "file_id": file_id,
-                "file_type": file_type,
-                "aes_key": aes_key,
-                "save_path": save_path
-            }
-        }
-        return self.send_sync(client_id, data, timeout)
-
-    def cdn_download2(self, client_id: int, url: str, auth_key: str, aes_key: str, save_path: str,
-                      timeout: Optional[int] = None) -> dict:
-        """企业微信CDN下载"""
-        data = {
-            "type": 11253,
-            "data": {
-                "url": url,
-                "auth_key": auth_key,
-                "aes_key": aes_key,
-                "save_path": save_path
-            }
-        }
-        return self.send_sync(client_id, data, timeout)
-
-    def send_text_by_cdn(self, client_id: int, to_wxid: str, content: str, timeout: Optional[int] = None) -> dict:
-        """发送文本消息（CDN）"""
-        data = {
-            "type": 11237,
-            "data": {
-                "to_wxid": to_wxid,
-                "content": content
-            }
-        }
-        return self.send_sync(client_id, data, timeout)
+        return self.execute(COMMANDS["create_room_by_protocol"], client_id, data, timeout)
 
     def send_room_at_by_cdn(self, client_id: int, to_wxid: str, content: str, at_list: Union[List[str], None] = None,
                             at_all: int = 0, timeout: Optional[int] = None) -> dict:
@@ -759,568 +632,65 @@ class WeChat:
                     "at_all": 1
                 }
             }
-        return self.send_sync(client_id, data, timeout)
-
-    def send_card_by_cdn(self, client_id: int, to_wxid: str, username: str, nickname: str, avatar: str,
-                         timeout: Optional[int] = None) -> dict:
-        """发送名片消息（CDN）"""
-        data = {
-            "type": 11239,
-            "data": {
-                "to_wxid": to_wxid,
-                "username": username,
-                "nickname": nickname,
-                "avatar": avatar
-            }
-        }
-        return self.send_sync(client_id, data, timeout)
-
-    def send_link_card_by_cdn(self, client_id: int, to_wxid: str, title: str, desc: str, url: str, image_url: str,
-                              timeout: Optional[int] = None) -> dict:
-        """发送链接卡片消息（CDN）"""
-        data = {
-            "type": 11236,
-            "data": {
-                "to_wxid": to_wxid,
-                "title": title,
-                "desc": desc,
-                "url": url,
-                "image_url": image_url
-            }
-        }
-        return self.send_sync(client_id, data, timeout)
-
-    def send_image_by_cdn(self, client_id: int, to_wxid: str, file_id: str, file_md5: str, file_size: int,
-                          thumb_file_size: int, crc32: int, aes_key: str, timeout: Optional[int] = None) -> dict:
-        """发送图片消息（CDN）"""
-        data = {
-            "type": 11231,
-            "data": {
-                "aes_key": aes_key,
-                "file_id": file_id,
-                "file_md5": file_md5,
-                "file_size": file_size,
-                "thumb_file_size": thumb_file_size,
-                "crc32": crc32,
-                "to_wxid": to_wxid
-            }
-        }
-        return self.send_sync(client_id, data, timeout)
-
-    def send_video_by_cdn(self, client_id: int, to_wxid: str, file_id: str, file_md5: str, file_size: int,
-                          thumb_file_size: int, aes_key: str, timeout: Optional[int] = None) -> dict:
-        """发送视频消息（CDN）"""
-        data = {
-            "type": 11233,
-            "data": {
-                "aes_key": aes_key,
-                "file_id": file_id,
-                "file_md5": file_md5,
-                "file_size": file_size,
-                "thumb_file_size": thumb_file_size,
-                "to_wxid": to_wxid
-            }
-        }
-        return self.send_sync(client_id, data, timeout)
-
-    def send_file_by_cdn(self, client_id: int, to_wxid: str, file_id: str, file_md5: str, file_size: int,
-                         file_name: str, aes_key: str, timeout: Optional[int] = None) -> dict:
-        """发送文件消息（CDN）"""
-        data = {
-            "type": 11235,
-            "data": {
-                "aes_key": aes_key,
-                "file_id": file_id,
-                "file_md5": file_md5,
-                "file_name": file_name,
-                "file_size": file_size,
-                "to_wxid": to_wxid
-            }
-        }
-        return self.send_sync(client_id, data, timeout)
-
-    def send_emotion_by_cdn(self, client_id: int, aes_key: str, file_id: str, file_md5: str, file_size: int,
-                            to_wxid: str, timeout: Optional[int] = None) -> dict:
-        """发送表情消息（CDN）"""
-        data = {
-            "type": 11241,
-            "data": {
-                "aes_key": aes_key,
-                "file_id": file_id,
-                "file_md5": file_md5,
-                "file_size": file_size,
-                "to_wxid": to_wxid
-            }
-        }
-        return self.send_sync(client_id, data, timeout)
-
-    def send_emotion2_by_cdn(self, client_id: int, to_wxid: str, path: str, timeout: Optional[int] = None) -> dict:
-        """发送表情消息2（CDN）"""
-        data = {
-            "type": 11254,
-            "data": {
-                "to_wxid": to_wxid,
-                "path": path
-            }
-        }
-        return self.send_sync(client_id, data, timeout)
-
-    def send_mini_program_by_cdn(self, client_id: int, to_wxid: str, username: str, appid: str, appname: str,
-                                 appicon: str, title: str, page_path: str, aes_key: str, file_id: str, file_md5: str,
-                                 file_size: int, timeout: Optional[int] = None) -> dict:
-        """发送小程序消息（CDN）"""
-        data = {
-            "type": 11242,
-            "data": {
-                "to_wxid": to_wxid,
-                "username": username,
-                "appid": appid,
-                "appname": appname,
-                "appicon": appicon,
-                "title": title,
-                "page_path": page_path,
-                "file_id": file_id,
-                "aes_key": aes_key,
-                "file_md5": file_md5,
-                "file_size": file_size
-            }
-        }
-        return self.send_sync(client_id, data, timeout)
-
-    def send_video_card_by_cdn(self, client_id: int, to_wxid: str, object_id: str, object_nonce_id: str, nickname: str,
-                               username: str, avatar: str, desc: str, thumb_url: str, url: str,
-                               timeout: Optional[int] = None) -> dict:
-        """发送视频号消息（CDN）"""
-        data = {
-            "type": 11243,
-            "data": {
-                "to_wxid": to_wxid,
-                "object_id": object_id,
-                "object_nonce_id": object_nonce_id,
-                "nickname": nickname,
-                "username": username,
-                "avatar": avatar,
-                "desc": desc,
-                "thumb_url": thumb_url,
-                "url": url
-            }
-        }
-        return self.send_sync(client_id, data, timeout)
-
-    def send_location_by_cdn(self, client_id: int, to_wxid: str, address: str, latitude: float, longitude: float,
-                             title: str, timeout: Optional[int] = None) -> dict:
-        """发送位置消息（CDN）"""
-        data = {
-            "type": 11238,
-            "data": {
-                "to_wxid": to_wxid,
-                "address": address,
-                "latitude": latitude,
-                "longitude": longitude,
-                "title": title
-            }
-        }
-        return self.send_sync(client_id, data, timeout)
-
-    def revoke_msg_by_cdn(self, client_id: int, to_wxid: str, new_msg_id: str, client_msg_id: int, create_time: int,
-                          timeout: Optional[int] = None) -> dict:
-        """撤回消息（CDN）"""
-        data = {
-            "type": 11244,
-            "data": {
-                "to_wxid": to_wxid,
-                "client_msgid": client_msg_id,
-                "create_time": create_time,
-                "new_msgid": new_msg_id
-            }
-        }
-        return self.send_sync(client_id, data, timeout)
-
-    def get_tags(self, client_id: int, timeout: Optional[int] = None) -> dict:
-        """获取标签列表"""
-        data = {
-            "type": 11142,
-            "data": {}
-        }
-        return self.send_sync(client_id, data, timeout)
-
-    def add_tag(self, client_id: int, label_name: str, timeout: Optional[int] = None) -> dict:
-        """添加标签"""
-        data = {
-            "type": 11137,
-            "data": {
-                "label_name": label_name
-            }
-        }
-        return self.send_sync(client_id, data, timeout)
-
-    def modify_tag(self, client_id: int, label_id: int, label_name: str) -> dict:
-        """修改标签"""
-        data = {
-            "type": 11139,
-            "data": {
-                "label_id": label_id,
-                "label_name": label_name
-            }
-        }
-        return self.send(client_id, data)
-
-    def delete_tag(self, client_id: int, label_id: int, timeout: Optional[int] = None) -> dict:
-        """删除标签"""
-        data = {
-            "type": 11138,
-            "data": {
-                "label_id": label_id
-            }
-        }
-        return self.send_sync(client_id, data, timeout)
-
-    def add_tags_to_contact(self, client_id: int, wxid: str, label_id_list: str, timeout: Optional[int] = None) -> dict:
-        """批量给用户加标签"""
-        data = {
-            "type": 11140,
-            "data": {
-                "wxid": wxid,
-                "labelid_list": label_id_list
-            }
-        }
-        return self.send_sync(client_id, data, timeout)
-
-    def get_contact_tags(self, client_id: int, wxid: str, timeout: Optional[int] = None) -> dict:
-        """获取联系人所有标签"""
-        data = {
-            "type": 11141,
-            "data": {
-                "wxid": wxid
-            }
-        }
-        return self.send_sync(client_id, data, timeout)
-
-    def get_collections(self, client_id: int, timeout: Optional[int] = None) -> dict:
-        """获取收藏列表"""
-        data = {
-            "type": 11109,
-            "data": {}
-        }
-        return self.send_sync(client_id, data, timeout)
-
-    def get_mini_program_code(self, client_id: int, appid: str, timeout: Optional[int] = None) -> dict:
-        """获取小程序授权code"""
-        data = {
-            "type": 11136,
-            "data": {
-                "appid": appid
-            }
-        }
-        return self.send_sync(client_id, data, timeout)
-
-    def get_moments(self, client_id: int, max_id: str = "0", timeout: Optional[int] = None) -> dict:
-        """获取朋友圈"""
-        data = {
-            "type": 11145,
-            "data": {
-                "max_id": max_id
-            }
-        }
-        return self.send_sync(client_id, data, timeout)
-
-    def get_friend_moments(self, client_id: int, username: str, first_page_md5: str = "", max_id: str = "0",
-                           timeout: Optional[int] = None) -> dict:
-        """获取好友朋友圈"""
-        data = {
-            "type": 11150,
-            "data": {
-                "username": username,
-                "first_page_md5": first_page_md5,
-                "max_id": max_id
-            }
-        }
-        return self.send_sync(client_id, data, timeout)
-
-    def comment_moment(self, client_id: int, object_id: str, content: str, timeout: Optional[int] = None) -> dict:
-        """评论"""
-        data = {
-            "type": 11146,
-            "data": {
-                "object_id": object_id,
-                "content": content
-            }
-        }
-        return self.send_sync(client_id, data, timeout)
+        return self.execute(COMMANDS["send_room_at_by_cdn"], client_id, data, timeout)
 
-    def like_moment(self, client_id: int, object_id: str, timeout: Optional[int] = None) -> dict:
-        """点赞"""
-        data = {
-            "type": 11147,
-            "data": {
-                "object_id": object_id
-            }
-        }
-        return self.send_sync(client_id, data, timeout)
-
-    def post_moment(self, client_id: int, object_desc: str, timeout: Optional[int] = None) -> dict:
-        """发朋友圈"""
-        data = {
-            "type": 11148,
-            "data": {
-                "object_desc": object_desc
-            }
-        }
-        return self.send_sync(client_id, data, timeout)
-
-    def upload_image(self, client_id: int, image_path: str, timeout: Optional[int] = None) -> dict:
-        """上传图片"""
-        data = {
-            "type": 11149,
-            "data": {
-                "path": image_path
-            }
-        }
-        return self.send_sync(client_id, data, timeout)
-
-    def create_virtual_nickname(self, client_id: int, nickname: str, head_img_url: str) -> dict:
-        """创建虚拟昵称"""
-        data = {
-            "type": 11194,
-            "data": {
-                "nickname": nickname,
-                "headimg_url": head_img_url
-            }
-        }
-        return self.send(client_id, data)
-
-    def switch_virtual_nickname(self, client_id: int, role_type: int) -> dict:
-        """切换虚拟昵称"""
-        data = {
-            "type": 11195,
-            "data": {
-                "role_type": role_type
-            }
-        }
-        return self.send(client_id, data)
-
-    def delete_virtual_nickname(self, client_id: int) -> dict:
-        """删除虚拟昵称"""
-        data = {
-            "type": 11197,
-            "data": {}
-        }
-        return self.send(client_id, data)
-
-    def init_video_account(self, client_id: int, timeout: Optional[int] = None) -> dict:
-        """视频号初始化"""
-        data = {
-            "type": 11160,
-            "data": {}
-        }
-        return self.send_sync(client_id, data, timeout)
-
-    def search_video_account(self, client_id: int, query: str, scene: int, last_buff: str = "",
-                             timeout: Optional[int] = None) -> dict:
-        """视频号搜索"""
-        data = {
-            "type": 11161,
-            "data": {
-                "query": query,
-                "last_buff": last_buff,
-                "scene": scene
-            }
-        }
-        return self.send_sync(client_id, data, timeout)
-
-    def get_video_account_user_page(self, client_id: int, username: str, last_buff: str = "",
-                                    timeout: Optional[int] = None) -> dict:
-        """视频号用户主页"""
-        data = {
-            "type": 11170,
-            "data": {
-                "username": username,
-                "last_buff": last_buff
-            }
-        }
-        return self.send_sync(client_id, data, timeout)
-
-    def view_video_details(self, client_id: int, object_id: str, object_nonce_id: str, last_buff: str = "",
-                           timeout: Optional[int] = None) -> dict:
-        """查看视频详细信息(包含评论)"""
-        data = {
-            "type": 11169,
-            "data": {
-                "object_id": object_id,
-                "object_nonce_id": object_nonce_id,
-                "last_buff": last_buff
-            }
-        }
-        return self.send_sync(client_id, data, timeout)
-
-    def follow_video_blogger(self, client_id: int, username: str, timeout: Optional[int] = None) -> dict:
-        """关注博主"""
-        data = {
-            "type": 11167,
-            "data": {
-                "username": username
-            }
-        }
-        return self.send_sync(client_id, data, timeout)
-
-    def like_video(self, client_id: int, object_id: str, object_nonce_id: str, timeout: Optional[int] = None) -> dict:
-        """视频号点赞"""
-        data = {
-            "type": 11168,
-            "data": {
-                "object_id": object_id,
-                "object_nonce_id": object_nonce_id
-            }
-        }
-        return self.send_sync(client_id, data, timeout)
-
-    def get_message_session_id(self, client_id: int, to_username: str, role_type: int,
-                               timeout: Optional[int] = None) -> dict:
-        """获取私信sessionId"""
-        data = {
-            "type": 11202,
-            "data": {
-                "to_username": to_username,
-                "roleType": role_type
-            }
-        }
-        return self.send_sync(client_id, data, timeout)
-
-    def send_private_message(self, client_id: int, to_username: str, session_id: str, content: str,
-                             timeout: Optional[int] = None) -> dict:
-        """发送私信"""
-        data = {
-            "type": 11203,
-            "data": {
-                "to_username": to_username,
-                "session_id": session_id,
-                "content": content
-            }
-        }
-        return self.send_sync(client_id, data, timeout)
-
-    def enter_live_room(self, client_id: int, object_id: str, live_id: str, object_nonce_id: str,
-                        timeout: Optional[int] = None) -> dict:
-        """进入直播间"""
-        data = {
-            "type": 11162,
-            "data": {
-                "object_id": object_id,
-                "live_id": live_id,
-                "object_nonce_id": object_nonce_id
-            }
-        }
-        return self.send_sync(client_id, data, timeout)
-
-    def get_live_room_online_users(self, client_id: int, object_id: str, live_id: str, object_nonce_id: str,
-                                   timeout: Optional[int] = None) -> dict:
-        """获取直播间在线人员"""
-        data = {
-            "type": 11172,
-            "data": {
-                "object_id": object_id,
-                "live_id": live_id,
-                "object_nonce_id": object_nonce_id,
-                "last_buff": ""
-            }
-        }
-        return self.send_sync(client_id, data, timeout)
-
-    def get_live_room_updates(self, client_id: int, timeout: Optional[int] = None) -> dict:
-        """获取直播间变动信息(人气，实时发言等)"""
-        data = {
-            "type": 11163,
-            "data": {}
-        }
-        return self.send_sync(client_id, data, timeout)
-
-    def speak_in_live_room(self, client_id: int, content: str, timeout: Optional[int] = None) -> dict:
-        """直播间发言"""
-        data = {
-            "type": 11164,
-            "data": {
-                "content": content
-            }
-        }
-        return self.send_sync(client_id, data, timeout)
-
-    def like_in_live_room(self, client_id: int, count: int, timeout: Optional[int] = None) -> dict:
-        """直播间点赞"""
-        data = {
-            "type": 11185,
-            "data": {
-                "count": count
-            }
-        }
-        return self.send_sync(client_id, data, timeout)
-
-    def get_live_room_shelves(self, client_id: int, live_username: str, request_id: str,
-                              timeout: Optional[int] = None) -> dict:
-        """获取直播间货架"""
-        data = {
-            "type": 11186,
-            "data": {
-                "live_username": live_username,
-                "request_id": request_id
-            }
-        }
-        return self.send_sync(client_id, data, timeout)
-
-    def get_shelf_product_detail(self, client_id: int, appid: str, request_id: str, product_id: str, real_appid: str,
-                                 live_username: str, timeout: Optional[int] = None) -> dict:
-        """获取货架商品详细信息"""
-        data = {
-            "type": 11187,
-            "data": {
-                "appid": appid,
-                "request_id": request_id,
-                "product_id": product_id,
-                "live_username": live_username,
-                "real_appid": real_appid
-            }
-        }
-        return self.send_sync(client_id, data, timeout)
-
-    def get_a8key(self, client_id: int, url: str, scene: int, timeout: Optional[int] = None) -> dict:
-        """A8Key接口"""
-        data = {
-            "type": 11135,
-            "data": {
-                "url": url,
-                "scene": scene
-            }
-        }
-        return self.send_sync(client_id, data, timeout)
-
-    def exec_sql(self, client_id: int, sql: str, db: int, timeout: Optional[int] = None) -> dict:
-        """执行SQL命令"""
-        data = {
-            "type": 11027,
-            "data": {
-                "sql": sql,
-                "db": db
-            }
-        }
-        return self.send_sync(client_id, data, timeout)
+    def use(self, middleware: typing.Callable[["WeChat", Event], typing.Optional[Event]], first: bool = False) -> None:
+        """注册事件中间件（在处理函数之前执行，返回None则丢弃事件）"""
+        if first:
+            self.middlewares.insert(0, middleware)
+        else:
+            self.middlewares.append(middleware)
 
     def handle(self, events: typing.Union[typing.List[str], str, None] = None, once: bool = False) -> typing.Callable[
         [typing.Callable], None]:
         def wrapper(func):
             listen = self.event_emitter.on if not once else self.event_emitter.once
+            handler = self.__handler(func)
             if not events:
-                listen(str(ALL_MESSAGE), func)
+                listen(str(ALL_MESSAGE), handler)
             else:
                 for event in events if isinstance(events, list) else [events]:
-                    listen(str(event), func)
+                    listen(str(event), handler)
 
         return wrapper
 
-    def start_server(self) -> typing.NoReturn:
+    def __handler(self, func: typing.Callable) -> typing.Callable:
+        # 设置了profiler时由其计时调用，delay为事件开始处理（process_event）到该处理函数开始执行的时间
+        @functools.wraps(func)
+        def handler(wechat: "WeChat", data: Event) -> typing.Any:
+            profiler = self.profiler
+            if profiler is None:
+                return func(wechat, data)
+            started = getattr(self.__local, "started", None)
+            delay = time.perf_counter() - started if started is not None else 0.0
+            return profiler.run(func, wechat, data, delay)
+
+        return handler
+
+    def start_server(self) -> None:
         logger.info(f"Event Server at {self.server_base_url}")
-        self.server = socketserver.ThreadingTCPServer((self.server_host, self.server_port), RequestHandler)
+        deadline = time.monotonic() + self.ready_timeout
+        while True:
+            try:
+                self.server = EventServer((self.server_host, self.server_port), RequestHandler)
+                break
+            except OSError as e:
+                # handoff模式下等待旧进程释放端口
+                if time.monotonic() >= deadline:
+                    logger.error(f"Event Server bind failed: {e}")
+                    return
+                time.sleep(0.05)
         self.server.wechat = self
+        self.startup_timings["server"] = time.perf_counter() - self.__started_at
+        self.server_ready.set()
         self.server.serve_forever()
 
-    def run(self) -> typing.NoReturn:
-        while True:
-            time.sleep(4_0_3_2_2)
+    def run(self) -> None:
+        try:
+            while not self.stopped.wait(4_0_3_2_2):
+                pass
+        except KeyboardInterrupt:
+            self.stop()
+
+
+install(WeChat)
@@ -0,0 +1,959 @@
+# 由wechat/stubgen.py生成，请勿手动修改（修改core.py或命令注册表后执行python -m wechat.stubgen）
+import binascii
+import collections.abc
+import concurrent.futures
+import datetime
+import functools
+import json
+import os
+import socketserver
+import sys
+import threading
+import time
+import traceback
+import typing
+import uuid
+import requests
+from typing import Optional, Union, List
+from pyee.executor import EventEmitter
+from wechat.commands import COMMANDS, Command, CommandMetrics, install
+from wechat.template import CommandTemplate
+from wechat.events import ALL_MESSAGE, WECHAT_CONNECT_MESSAGE, USER_LOGIN_MESSAGE, USER_LOGOUT_MESSAGE
+from wechat.utils import hook, wait_for_port
+from wechat.logger import logger
+
+
+class Event(collections.abc.Mapping):
+    """事件（只读视图与to_dict()的结果一致，trace为None时不包含trace键）"""
+    __slots__ = ('type', 'client_id', 'data', 'trace', 'extra')
+    FIELDS = ('type', 'client_id', 'data', 'trace')
+    INTERN_FIELDS = ('from_wxid', 'to_wxid', 'room_wxid')
+    type: typing.Optional[int]
+    client_id: int
+    data: typing.Any
+    trace: typing.Optional[str]
+    extra: typing.Optional[dict]
+
+    def __init__(
+            self,
+            type: typing.Optional[int] = ...,
+            client_id: int = ...,
+            data: typing.Any = ...,
+            trace: typing.Optional[str] = ...,
+            extra: typing.Optional[dict] = ...
+    ):
+        ...
+
+    @classmethod
+    def from_dict(cls, message: dict, client_id: int = ...) -> 'Event':
+        ...
+
+    def to_dict(self) -> dict:
+        ...
+
+    def copy(self) -> 'Event':
+        ...
+
+    def get(self, key: str, default: typing.Any = ...) -> typing.Any:
+        ...
+
+    def __getitem__(self, key: str) -> typing.Any:
+        ...
+
+    def __setitem__(self, key: str, value: typing.Any) -> None:
+        ...
+
+    def __contains__(self, key: typing.Any) -> bool:
+        ...
+
+    def __iter__(self) -> typing.Iterator[str]:
+        ...
+
+    def __len__(self) -> int:
+        ...
+
+    def __repr__(self) -> str:
+        ...
+
+
+class ReqData:
+    __slots__ = ('msg_type', 'request_data', '__response_message', '__wait_lock')
+    msg_type: int
+    request_data: dict
+
+    def __init__(self, msg_type: int, data: dict):
+        ...
+
+    def wait_response(self, timeout: typing.Optional[int] = ...) -> dict:
+        ...
+
+    def on_response(self, message: typing.Union[Event, dict]) -> None:
+        ...
+
+    def get_response_data(self) -> typing.Union[dict, None]:
+        ...
+
+
+class RequestHandler(socketserver.BaseRequestHandler):
+
+    def handle(self) -> None:
+        ...
+
+    def reply(self, status: str) -> None:
+        ...
+
+
+class EventServer(socketserver.ThreadingTCPServer):
+    allow_reuse_address = os.name != 'nt'
+    daemon_threads = True
+    block_on_close = False
+
+
+class WeChat:
+    smart: bool
+    pid: typing.Any
+    host: str
+    port: int
+    server_host: str
+    server_port: int
+    timeout: typing.Any
+    request_timeout: float
+    ready_timeout: int
+    spawn_hook: bool
+    startup_timings: typing.Dict[str, float]
+    base_url: str
+    server_base_url: str
+    event_emitter: EventEmitter
+    clients: typing.Any
+    self_wxids: typing.Dict[int, str]
+    self_info_retry: int
+    middlewares: typing.List[typing.Callable[['WeChat', Event], typing.Optional[Event]]]
+    command_metrics: typing.Dict[str, CommandMetrics]
+    command_timeouts: typing.Dict[str, float]
+    command_hooks: typing.List[typing.Callable[['WeChat', Command, int, float, typing.Any, typing.Optional[BaseException]], None]]
+    stop_hooks: typing.List[typing.Callable[['WeChat'], None]]
+    read_sender: typing.Optional[typing.Callable[['WeChat', Command, int, dict, int], typing.Any]]
+    breaker: typing.Any
+    admission: typing.Any
+    deduplicator: typing.Any
+    profiler: typing.Any
+    login_event: threading.Event
+    server_ready: threading.Event
+    stopped: threading.Event
+    running: bool
+    server: typing.Any
+    server_thread: typing.Any
+    process: typing.Any
+
+    def __init__(
+            self,
+            smart: bool = ...,
+            pid: int = ...,
+            host: str = ...,
+            port: int = ...,
+            server_host: str = ...,
+            server_port: int = ...,
+            timeout: typing.Optional[int] = ...,
+            request_timeout: float = ...,
+            ready_timeout: int = ...,
+            spawn_hook: bool = ...,
+            autostart: bool = ...
+    ):
+        ...
+
+    def start(self) -> 'WeChat':
+        """启动事件服务和hook进程"""
+        ...
+
+    def stop(self, drain_timeout: float = ..., handoff: bool = ...) -> None:
+        """停止服务：等待未完成的请求和事件处理，然后关闭hook进程（handoff模式下保留hook进程）"""
+        ...
+
+    def __enter__(self) -> 'WeChat':
+        ...
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        ...
+
+    def wait_ready(self, timeout: int = ...) -> bool:
+        """等待事件服务和API服务就绪"""
+        ...
+
+    def restart_hook(self) -> None:
+        """重启hook进程，并重新打开（smart模式）或注入之前连接的微信"""
+        ...
+
+    def open(self) -> dict:
+        ...
+
+    def inject(self, pid: int) -> dict:
+        ...
+
+    def send(self, client_id: int = ..., data: dict = ...) -> dict:
+        ...
+
+    def send_raw(self, client_id: int, body: bytes) -> dict:
+        """发送已编码（hex）的消息"""
+        ...
+
+    def send_template(self, client_id: int, template: 'CommandTemplate', **values) -> dict:
+        """使用预编码的消息模板发送"""
+        ...
+
+    def destory(self) -> dict:
+        ...
+
+    def send_sync(self, client_id: int, data: dict, timeout: int = ...) -> typing.Union[dict, None]:
+        ...
+
+    def timeout_for(self, command: Command) -> float:
+        """命令的超时：command_timeouts > WeChat(timeout=...) > 命令默认超时 > 10秒"""
+        ...
+
+    def execute(self, command: Command, client_id: int, data: dict, timeout: Optional[int] = ...) -> dict:
+        """执行命令并记录耗时（所有命令方法的公共入口）"""
+        ...
+
+    def submit(self, name: str, *args, **kwargs) -> concurrent.futures.Future:
+        """在线程池中异步执行命令"""
+        ...
+
+    def batch(self, calls: typing.Iterable[typing.Tuple[str, tuple, dict]]) -> typing.List[typing.Any]:
+        """并发执行一批命令(name, args, kwargs)，按顺序返回结果（异常作为结果返回）"""
+        ...
+
+    def on_event(self, data: Event) -> None:
+        ...
+
+    def self_wxid(self, client_id: int, timeout: Optional[int] = ...) -> typing.Optional[str]:
+        """客户端登录的账号wxid，未记录时通过get_self_info获取（失败后self_info_retry秒内直接返回None）"""
+        ...
+
+    def client_id_of(self, wxid: str) -> typing.Optional[int]:
+        """账号wxid当前对应的client_id（client_id在hook重启后会变化，持久化的任务应保存wxid）"""
+        ...
+
+    def emit(self, data: Event) -> None:
+        """将事件分发给处理函数（不经过中间件）"""
+        ...
+
+    def accepts(self, data: Event) -> bool:
+        """事件服务是否确认接收该事件：排空期间只接收同步调用的回调"""
+        ...
+
+    def on_recv(self, data: Event) -> None:
+        ...
+
+    def process_event(self, data: Event) -> None:
+        """处理事件（计入进行中的处理数，stop时等待其完成）"""
+        ...
+
+    def create_room(self, client_id: int, member_list: List[str]) -> dict:
+        """创建群聊"""
+        ...
+
+    def create_room_by_protocol(self, client_id: int, member_list: List[str], timeout: Optional[int] = ...) -> dict:
+        """创建群聊（协议）"""
+        ...
+
+    def send_room_at_by_cdn(
+            self,
+            client_id: int,
+            to_wxid: str,
+            content: str,
+            at_list: Union[List[str], None] = ...,
+            at_all: int = ...,
+            timeout: Optional[int] = ...
+    ) -> dict:
+        """发送群at消息（CDN）"""
+        ...
+
+    def use(self, middleware: typing.Callable[['WeChat', Event], typing.Optional[Event]], first: bool = ...) -> None:
+        """注册事件中间件（在处理函数之前执行，返回None则丢弃事件）"""
+        ...
+
+    def handle(
+            self,
+            events: typing.Union[typing.List[str], str, None] = ...,
+            once: bool = ...
+    ) -> typing.Callable[[typing.Callable], None]:
+        ...
+
+    def start_server(self) -> None:
+        ...
+
+    def run(self) -> None:
+        ...
+
+    def send_text(self, client_id: int, to_wxid: str, content: str) -> dict:
+        """发送文本消息"""
+        ...
+
+    def send_room_at(self, client_id: int, to_wxid: str, content: str, at_list: typing.List[str]) -> dict:
+        """发送群at消息"""
+        ...
+
+    def send_card(self, client_id: int, to_wxid: str, card_wxid: str) -> dict:
+        """发送名片消息"""
+        ...
+
+    def send_link_card(self, client_id: int, to_wxid: str, title: str, desc: str, url: str, image_url: str) -> dict:
+        """发送链接卡片消息"""
+        ...
+
+    def send_image(self, client_id: int, to_wxid: str, file: str) -> dict:
+        """发送图片消息"""
+        ...
+
+    def send_video(self, client_id: int, to_wxid: str, file: str) -> dict:
+        """发送视频消息"""
+        ...
+
+    def send_file(self, client_id: int, to_wxid: str, file: str) -> dict:
+        """发送文件消息"""
+        ...
+
+    def send_emotion(self, client_id: int, to_wxid: str, file: str) -> dict:
+        """发送表情消息"""
+        ...
+
+    def send_pat(self, client_id: int, room_wxid: str, patted_wxid: str) -> dict:
+        """发送拍一拍消息"""
+        ...
+
+    def get_invitation_relationship(self, client_id: int, room_wxid: str, timeout: typing.Optional[int] = ...) -> dict:
+        """获取群成员邀请关系"""
+        ...
+
+    def add_room_member(
+            self,
+            client_id: int,
+            room_wxid: str,
+            member_list: typing.List[str],
+            timeout: typing.Optional[int] = ...
+    ) -> dict:
+        """添加群成员"""
+        ...
+
+    def invite_room_member(
+            self,
+            client_id: int,
+            room_wxid: str,
+            member_list: typing.List[str],
+            timeout: typing.Optional[int] = ...
+    ) -> dict:
+        """邀请群成员"""
+        ...
+
+    def remove_room_member(
+            self,
+            client_id: int,
+            room_wxid: str,
+            wxid: str,
+            timeout: typing.Optional[int] = ...
+    ) -> dict:
+        """移出群成员"""
+        ...
+
+    def modify_room_name(self, client_id: int, room_wxid: str, name: str, timeout: typing.Optional[int] = ...) -> dict:
+        """修改群名称"""
+        ...
+
+    def modify_room_notice(
+            self,
+            client_id: int,
+            room_wxid: str,
+            notice: str,
+            timeout: typing.Optional[int] = ...
+    ) -> dict:
+        """修改群公告"""
+        ...
+
+    def modify_room_member_nickname(
+            self,
+            client_id: int,
+            room_id: str,
+            nickname: str,
+            timeout: typing.Optional[int] = ...
+    ) -> dict:
+        """修改我在本群的昵称"""
+        ...
+
+    def display_room_member_nickname(
+            self,
+            client_id: int,
+            room_id: str,
+            status: int = ...,
+            timeout: typing.Optional[int] = ...
+    ) -> dict:
+        """是否显示群成员昵称"""
+        ...
+
+    def get_room_by_protocol(self, client_id: int, wxid: str, timeout: typing.Optional[int] = ...) -> dict:
+        """获取群信息（协议）"""
+        ...
+
+    def exit_room(self, client_id: int, room_id: str, timeout: typing.Optional[int] = ...) -> dict:
+        """退出群聊"""
+        ...
+
+    def confirm_receipt(self, client_id: int, transfer_id: str) -> dict:
+        """确认收款"""
+        ...
+
+    def pin_chat(self, client_id: int, wxid: str, status: int, timeout: typing.Optional[int] = ...) -> dict:
+        """置顶/取消置顶聊天"""
+        ...
+
+    def set_disturb(self, client_id: int, wxid: str, status: int, timeout: typing.Optional[int] = ...) -> dict:
+        """开启/关闭消息免打扰"""
+        ...
+
+    def clear_chat_history(self, client_id: int) -> dict:
+        """清除聊天记录"""
+        ...
+
+    def decode_image(self, client_id: int, src_file: str, dest_file: str) -> dict:
+        """解密图片"""
+        ...
+
+    def get_self_info(self, client_id: int, timeout: typing.Optional[int] = ...) -> dict:
+        """获取当前账号信息"""
+        ...
+
+    def get_contacts(self, client_id: int, timeout: typing.Optional[int] = ...) -> dict:
+        """获取好友列表"""
+        ...
+
+    def get_contact(self, client_id: int, wxid: str, timeout: typing.Optional[int] = ...) -> dict:
+        """获取好友信息"""
+        ...
+
+    def get_rooms(self, client_id: int, detail: int = ..., timeout: typing.Optional[int] = ...) -> dict:
+        """获取群列表"""
+        ...
+
+    def get_room(self, client_id: int, room_wxid: str, timeout: typing.Optional[int] = ...) -> dict:
+        """获取群信息"""
+        ...
+
+    def get_room_members(self, client_id: int, room_wxid: str, timeout: typing.Optional[int] = ...) -> dict:
+        """获取群成员列表"""
+        ...
+
+    def get_public(self, client_id: int, timeout: typing.Optional[int] = ...) -> dict:
+        """获取公众号列表"""
+        ...
+
+    def get_contact_by_protocol(self, client_id: int, wxid: str, timeout: typing.Optional[int] = ...) -> dict:
+        """获取好友简要信息（协议）"""
+        ...
+
+    def get_room_member_by_net(
+            self,
+            client_id: int,
+            room_wxid: str,
+            wxid: str,
+            timeout: typing.Optional[int] = ...
+    ) -> dict:
+        """获取群成员信息"""
+        ...
+
+    def get_contact_detail_by_protocol(self, client_id: int, wxid: str, timeout: typing.Optional[int] = ...) -> dict:
+        """获取好友详细信息（协议）"""
+        ...
+
+    def get_contacts_by_protocol(
+            self,
+            client_id: int,
+            wxids: typing.List[str],
+            timeout: typing.Optional[int] = ...
+    ) -> dict:
+        """获取多个好友信息（协议）"""
+        ...
+
+    def modify_contact_remark(
+            self,
+            client_id: int,
+            wxid: str,
+            remark: str,
+            timeout: typing.Optional[int] = ...
+    ) -> dict:
+        """修改好友备注"""
+        ...
+
+    def delete_friend(self, client_id: int, wxid: str, timeout: typing.Optional[int] = ...) -> dict:
+        """删除好友"""
+        ...
+
+    def accept_friend_request(
+            self,
+            client_id: int,
+            encrypt_username: str,
+            ticket: str,
+            scene: int = ...,
+            timeout: typing.Optional[int] = ...
+    ) -> dict:
+        """同意好友请求"""
+        ...
+
+    def search_friend(self, client_id: int, search: str, timeout: typing.Optional[int] = ...) -> dict:
+        """搜索微信好友"""
+        ...
+
+    def add_friend(self, client_id: int, v1: str, v2: str, remark: str, timeout: typing.Optional[int] = ...) -> dict:
+        """添加好友"""
+        ...
+
+    def add_friend_by_card(
+            self,
+            client_id: int,
+            wxid: str,
+            ticket: str,
+            remark: str,
+            timeout: typing.Optional[int] = ...
+    ) -> dict:
+        """添加好友分享的名片"""
+        ...
+
+    def add_friend_by_room(
+            self,
+            client_id: int,
+            room_wxid: str,
+            wxid: str,
+            remark: str,
+            timeout: typing.Optional[int] = ...
+    ) -> dict:
+        """添加群成员为好友"""
+        ...
+
+    def check_friend_status(self, client_id: int, wxid: str, timeout: typing.Optional[int] = ...) -> dict:
+        """检查好友状态"""
+        ...
+
+    def edit_address_book(
+            self,
+            client_id: int,
+            room_id: str,
+            status: int = ...,
+            timeout: typing.Optional[int] = ...
+    ) -> dict:
+        """保存/移除通讯录"""
+        ...
+
+    def get_corporate_contacts(self, client_id: int, timeout: typing.Optional[int] = ...) -> dict:
+        """获取企业联系人"""
+        ...
+
+    def get_corporate_rooms(self, client_id: int, timeout: typing.Optional[int] = ...) -> dict:
+        """获取企业群"""
+        ...
+
+    def get_corporate_room_members(self, client_id: int, room_id: str, timeout: typing.Optional[int] = ...) -> dict:
+        """获取企业微信群成员"""
+        ...
+
+    def cdn_init(self, client_id: int, timeout: typing.Optional[int] = ...) -> dict:
+        """初始化CDN"""
+        ...
+
+    def cdn_upload(self, client_id: int, file_type: int, file_path: str, timeout: typing.Optional[int] = ...) -> dict:
+        """CDN上传"""
+        ...
+
+    def cdn_download(
+            self,
+            client_id: int,
+            file_id: str,
+            aes_key: str,
+            save_path: str,
+            file_type: int,
+            timeout: typing.Optional[int] = ...
+    ) -> dict:
+        """CDN下载"""
+        ...
+
+    def cdn_download2(
+            self,
+            client_id: int,
+            url: str,
+            auth_key: str,
+            aes_key: str,
+            save_path: str,
+            timeout: typing.Optional[int] = ...
+    ) -> dict:
+        """企业微信CDN下载"""
+        ...
+
+    def send_text_by_cdn(self, client_id: int, to_wxid: str, content: str, timeout: typing.Optional[int] = ...) -> dict:
+        """发送文本消息（CDN）"""
+        ...
+
+    def send_card_by_cdn(
+            self,
+            client_id: int,
+            to_wxid: str,
+            username: str,
+            nickname: str,
+            avatar: str,
+            timeout: typing.Optional[int] = ...
+    ) -> dict:
+        """发送名片消息（CDN）"""
+        ...
+
+    def send_link_card_by_cdn(
+            self,
+            client_id: int,
+            to_wxid: str,
+            title: str,
+            desc: str,
+            url: str,
+            image_url: str,
+            timeout: typing.Optional[int] = ...
+    ) -> dict:
+        """发送链接卡片消息（CDN）"""
+        ...
+
+    def send_image_by_cdn(
+            self,
+            client_id: int,
+            to_wxid: str,
+            file_id: str,
+            file_md5: str,
+            file_size: int,
+            thumb_file_size: int,
+            crc32: int,
+            aes_key: str,
+            timeout: typing.Optional[int] = ...
+    ) -> dict:
+        """发送图片消息（CDN）"""
+        ...
+
+    def send_video_by_cdn(
+            self,
+            client_id: int,
+            to_wxid: str,
+            file_id: str,
+            file_md5: str,
+            file_size: int,
+            thumb_file_size: int,
+            aes_key: str,
+            timeout: typing.Optional[int] = ...
+    ) -> dict:
+        """发送视频消息（CDN）"""
+        ...
+
+    def send_file_by_cdn(
+            self,
+            client_id: int,
+            to_wxid: str,
+            file_id: str,
+            file_md5: str,
+            file_size: int,
+            file_name: str,
+            aes_key: str,
+            timeout: typing.Optional[int] = ...
+    ) -> dict:
+        """发送文件消息（CDN）"""
+        ...
+
+    def send_emotion_by_cdn(
+            self,
+            client_id: int,
+            aes_key: str,
+            file_id: str,
+            file_md5: str,
+            file_size: int,
+            to_wxid: str,
+            timeout: typing.Optional[int] = ...
+    ) -> dict:
+        """发送表情消息（CDN）"""
+        ...
+
+    def send_emotion2_by_cdn(
+            self,
+            client_id: int,
+            to_wxid: str,
+            path: str,
+            timeout: typing.Optional[int] = ...
+    ) -> dict:
+        """发送表情消息2（CDN）"""
+        ...
+
+    def send_mini_program_by_cdn(
+            self,
+            client_id: int,
+            to_wxid: str,
+            username: str,
+            appid: str,
+            appname: str,
+            appicon: str,
+            title: str,
+            page_path: str,
+            aes_key: str,
+            file_id: str,
+            file_md5: str,
+            file_size: int,
+            timeout: typing.Optional[int] = ...
+    ) -> dict:
+        """发送小程序消息（CDN）"""
+        ...
+
+    def send_video_card_by_cdn(
+            self,
+            client_id: int,
+            to_wxid: str,
+            object_id: str,
+            object_nonce_id: str,
+            nickname: str,
+            username: str,
+            avatar: str,
+            desc: str,
+            thumb_url: str,
+            url: str,
+            timeout: typing.Optional[int] = ...
+    ) -> dict:
+        """发送视频号消息（CDN）"""
+        ...
+
+    def send_location_by_cdn(
+            self,
+            client_id: int,
+            to_wxid: str,
+            address: str,
+            latitude: float,
+            longitude: float,
+            title: str,
+            timeout: typing.Optional[int] = ...
+    ) -> dict:
+        """发送位置消息（CDN）"""
+        ...
+
+    def revoke_msg_by_cdn(
+            self,
+            client_id: int,
+            to_wxid: str,
+            new_msg_id: str,
+            client_msg_id: int,
+            create_time: int,
+            timeout: typing.Optional[int] = ...
+    ) -> dict:
+        """撤回消息（CDN）"""
+        ...
+
+    def get_tags(self, client_id: int, timeout: typing.Optional[int] = ...) -> dict:
+        """获取标签列表"""
+        ...
+
+    def add_tag(self, client_id: int, label_name: str, timeout: typing.Optional[int] = ...) -> dict:
+        """添加标签"""
+        ...
+
+    def modify_tag(self, client_id: int, label_id: int, label_name: str) -> dict:
+        """修改标签"""
+        ...
+
+    def delete_tag(self, client_id: int, label_id: int, timeout: typing.Optional[int] = ...) -> dict:
+        """删除标签"""
+        ...
+
+    def add_tags_to_contact(
+            self,
+            client_id: int,
+            wxid: str,
+            label_id_list: str,
+            timeout: typing.Optional[int] = ...
+    ) -> dict:
+        """批量给用户加标签"""
+        ...
+
+    def get_contact_tags(self, client_id: int, wxid: str, timeout: typing.Optional[int] = ...) -> dict:
+        """获取联系人所有标签"""
+        ...
+
+    def get_collections(self, client_id: int, timeout: typing.Optional[int] = ...) -> dict:
+        """获取收藏列表"""
+        ...
+
+    def get_mini_program_code(self, client_id: int, appid: str, timeout: typing.Optional[int] = ...) -> dict:
+        """获取小程序授权code"""
+        ...
+
+    def get_moments(self, client_id: int, max_id: str = ..., timeout: typing.Optional[int] = ...) -> dict:
+        """获取朋友圈"""
+        ...
+
+    def get_friend_moments(
+            self,
+            client_id: int,
+            username: str,
+            first_page_md5: str = ...,
+            max_id: str = ...,
+            timeout: typing.Optional[int] = ...
+    ) -> dict:
+        """获取好友朋友圈"""
+        ...
+
+    def comment_moment(self, client_id: int, object_id: str, content: str, timeout: typing.Optional[int] = ...) -> dict:
+        """评论"""
+        ...
+
+    def like_moment(self, client_id: int, object_id: str, timeout: typing.Optional[int] = ...) -> dict:
+        """点赞"""
+        ...
+
+    def post_moment(self, client_id: int, object_desc: str, timeout: typing.Optional[int] = ...) -> dict:
+        """发朋友圈"""
+        ...
+
+    def upload_image(self, client_id: int, image_path: str, timeout: typing.Optional[int] = ...) -> dict:
+        """上传图片"""
+        ...
+
+    def create_virtual_nickname(self, client_id: int, nickname: str, head_img_url: str) -> dict:
+        """创建虚拟昵称"""
+        ...
+
+    def switch_virtual_nickname(self, client_id: int, role_type: int) -> dict:
+        """切换虚拟昵称"""
+        ...
+
+    def delete_virtual_nickname(self, client_id: int) -> dict:
+        """删除虚拟昵称"""
+        ...
+
+    def init_video_account(self, client_id: int, timeout: typing.Optional[int] = ...) -> dict:
+        """视频号初始化"""
+        ...
+
+    def search_video_account(
+            self,
+            client_id: int,
+            query: str,
+            scene: int,
+            last_buff: str = ...,
+            timeout: typing.Optional[int] = ...
+    ) -> dict:
+        """视频号搜索"""
+        ...
+
+    def get_video_account_user_page(
+            self,
+            client_id: int,
+            username: str,
+            last_buff: str = ...,
+            timeout: typing.Optional[int] = ...
+    ) -> dict:
+        """视频号用户主页"""
+        ...
+
+    def view_video_details(
+            self,
+            client_id: int,
+            object_id: str,
+            object_nonce_id: str,
+            last_buff: str = ...,
+            timeout: typing.Optional[int] = ...
+    ) -> dict:
+        """查看视频详细信息(包含评论)"""
+        ...
+
+    def follow_video_blogger(self, client_id: int, username: str, timeout: typing.Optional[int] = ...) -> dict:
+        """关注博主"""
+        ...
+
+    def like_video(
+            self,
+            client_id: int,
+            object_id: str,
+            object_nonce_id: str,
+            timeout: typing.Optional[int] = ...
+    ) -> dict:
+        """视频号点赞"""
+        ...
+
+    def get_message_session_id(
+            self,
+            client_id: int,
+            to_username: str,
+            role_type: int,
+            timeout: typing.Optional[int] = ...
+    ) -> dict:
+        """获取私信sessionId"""
+        ...
+
+    def send_private_message(
+            self,
+            client_id: int,
+            to_username: str,
+            session_id: str,
+            content: str,
+            timeout: typing.Optional[int] = ...
+    ) -> dict:
+        """发送私信"""
+        ...
+
+    def enter_live_room(
+            self,
+            client_id: int,
+            object_id: str,
+            live_id: str,
+            object_nonce_id: str,
+            timeout: typing.Optional[int] = ...
+    ) -> dict:
+        """进入直播间"""
+        ...
+
+    def get_live_room_online_users(
+            self,
+            client_id: int,
+            object_id: str,
+            live_id: str,
+            object_nonce_id: str,
+            timeout: typing.Optional[int] = ...
+    ) -> dict:
+        """获取直播间在线人员"""
+        ...
+
+    def get_live_room_updates(self, client_id: int, timeout: typing.Optional[int] = ...) -> dict:
+        """获取直播间变动信息(人气，实时发言等)"""
+        ...
+
+    def speak_in_live_room(self, client_id: int, content: str, timeout: typing.Optional[int] = ...) -> dict:
+        """直播间发言"""
+        ...
+
+    def like_in_live_room(self, client_id: int, count: int, timeout: typing.Optional[int] = ...) -> dict:
+        """直播间点赞"""
+        ...
+
+    def get_live_room_shelves(
+            self,
+            client_id: int,
+            live_username: str,
+            request_id: str,
+            timeout: typing.Optional[int] = ...
+    ) -> dict:
+        """获取直播间货架"""
+        ...
+
+    def get_shelf_product_detail(
+            self,
+            client_id: int,
+            appid: str,
+            request_id: str,
+            product_id: str,
+            real_appid: str,
+            live_username: str,
+            timeout: typing.Optional[int] = ...
+    ) -> dict:
+        """获取货架商品详细信息"""
+        ...
+
+    def get_a8key(self, client_id: int, url: str, scene: int, timeout: typing.Optional[int] = ...) -> dict:
+        """A8Key接口"""
+        ...
+
+    def exec_sql(self, client_id: int, sql: str, db: int, timeout: typing.Optional[int] = ...) -> dict:
+        """执行SQL命令"""
+        ...
@@ -0,0 +1,121 @@
+import collections
+import hashlib
+import json
+import math
+import threading
+import time
+import typing
+
+from wechat.core import Event
+from wechat.events import WECHAT_CONNECT_MESSAGE, USER_LOGIN_MESSAGE, USER_LOGOUT_MESSAGE
+
+ID_FIELDS = ["msgid", "new_msgid", "msg_id", "new_msg_id"]
+# 这些事件会正常重复出现，不按内容去重
+REPEATABLE_TYPES = {WECHAT_CONNECT_MESSAGE, USER_LOGIN_MESSAGE, USER_LOGOUT_MESSAGE}
+# 9xxxx为本地合成事件（直播间、快照、媒体），不会被hook重复投递
+SYNTHETIC_TYPE_MIN = 90000
+
+
+class BloomFilter:
+
+    def __init__(self, capacity: int, error_rate: float):
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def __positions(self, key: bytes) -> typing.Iterator[int]:
+        digest = hashlib.blake2b(key, digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        for i in range(self.hash_count):
+            yield (h1 + i * h2) % self.size
+
+    def add(self, key: bytes) -> None:
+        for position in self.__positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key: bytes) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self.__positions(key))
+
+    @property
+    def memory(self) -> int:
+        return len(self.bits)
+
+
+class EventDeduplicator:
+
+    def __init__(
+            self,
+            wechat=None,
+            window: float = 600,
+            capacity: int = 100000,
+            error_rate: float = 0.001,
+            exact_size: int = 20000,
+            trust_bloom: bool = False
+    ):
+        self.window = window
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.exact_size = exact_size
+        self.trust_bloom = trust_bloom
+        self.passed = 0
+        self.dropped = 0
+        self.__current = BloomFilter(capacity, error_rate)
+        self.__previous = BloomFilter(capacity, error_rate)
+        self.__rotated_at = time.monotonic()
+        self.__exact: typing.OrderedDict[bytes, None] = collections.OrderedDict()
+        self.__lock = threading.Lock()
+        if wechat is not None:
+            # 在on_recv中、进入on_event之前去重
+            wechat.deduplicator = self
+
+    @staticmethod
+    def key(event: Event) -> typing.Optional[bytes]:
+        if event.get("type") is None or event["type"] >= SYNTHETIC_TYPE_MIN:
+            return None
+        data = event["data"]
+        if isinstance(data, dict):
+            for field in ID_FIELDS:
+                if data.get(field):
+                    return f"{event['client_id']}:{data[field]}".encode("utf-8")
+        if event["type"] in REPEATABLE_TYPES:
+            return None
+        payload = json.dumps([event["client_id"], event["type"], data], sort_keys=True, ensure_ascii=False)
+        return hashlib.blake2b(payload.encode("utf-8"), digest_size=16).digest()
+
+    def seen(self, key: bytes) -> bool:
+        """判断是否为重复事件（同时记录该事件）"""
+        with self.__lock:
+            now = time.monotonic()
+            if now - self.__rotated_at >= self.window:
+                self.__previous, self.__current = self.__current, BloomFilter(self.capacity, self.error_rate)
+                self.__rotated_at = now
+
+            maybe = key in self.__current or key in self.__previous
+            if maybe and (key in self.__exact or self.trust_bloom):
+                return True
+            self.__current.add(key)
+            self.__exact[key] = None
+            if len(self.__exact) > self.exact_size:
+                self.__exact.popitem(last=False)
+            return False
+
+    def accept(self, event: Event) -> bool:
+        """事件是否应该被处理（重复事件返回False）"""
+        key = self.key(event)
+        if key is not None and self.seen(key):
+            self.dropped += 1
+            return False
+        self.passed += 1
+        return True
+
+    def __call__(self, wechat, event: Event) -> typing.Optional[Event]:
+        return event if self.accept(event) else None
+
+    def stats(self) -> dict:
+        return {
+            "passed": self.passed,
+            "dropped": self.dropped,
+            "bloom_bytes": self.__current.memory * 2,
+            "exact_keys": len(self.__exact)
+        }
@@ -0,0 +1,234 @@
+import json
+import os
+import pathlib
+import queue
+import struct
+import threading
+import time
+import traceback
+import typing
+import zlib
+
+from wechat.core import Event
+from wechat.logger import logger
+
+# 帧头: 负载长度, 是否压缩, 记录数
+FRAME_HEADER = struct.Struct("<IBI")
+SEGMENT_SUFFIX = ".log"
+
+
+class EventLog:
+
+    def __init__(
+            self,
+            directory: str,
+            segment_bytes: int = 64 * 1024 * 1024,
+            retention_segments: typing.Optional[int] = 100,
+            retention_seconds: typing.Optional[float] = None,
+            compress: bool = False,
+            batch_size: int = 512,
+            flush_interval: float = 0.2,
+            max_queue: int = 100000
+    ):
+        self.directory = pathlib.Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.segment_bytes = segment_bytes
+        self.retention_segments = retention_segments
+        self.retention_seconds = retention_seconds
+        self.compress = compress
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.offsets_file = self.directory / "offsets.json"
+        self.dropped = 0
+        # 队列中保存入队时已序列化的事件，之后的中间件和处理函数修改事件不会影响日志
+        self.__queue: "queue.Queue[typing.Optional[typing.Tuple[float, str]]]" = queue.Queue(max_queue)
+        self.__segment: typing.Optional[typing.BinaryIO] = None
+        self.__next_offset = self.__recover()
+        self.__offsets_lock = threading.Lock()
+        self.__thread = threading.Thread(target=self.__write_loop, daemon=True)
+        self.__thread.start()
+
+    def segments(self) -> typing.List[pathlib.Path]:
+        return sorted(self.directory.glob(f"*{SEGMENT_SUFFIX}"))
+
+    @staticmethod
+    def __scan_frames(segment: pathlib.Path) -> typing.Iterator[typing.Tuple[typing.List[list], int]]:
+        """逐帧读取，返回(记录, 帧结束位置)，遇到不完整或损坏的帧时停止"""
+        with open(segment, "rb") as f:
+            while True:
+                header = f.read(FRAME_HEADER.size)
+                if not header:
+                    return
+                if len(header) < FRAME_HEADER.size:
+                    logger.warning(f"Truncated frame at the end of {segment}")
+                    return
+                length, compressed, _ = FRAME_HEADER.unpack(header)
+                payload = f.read(length)
+                if len(payload) < length:
+                    logger.warning(f"Truncated frame at the end of {segment}")
+                    return
+                try:
+                    if compressed:
+                        payload = zlib.decompress(payload)
+                    records = [json.loads(line) for line in payload.splitlines()]
+                except (zlib.error, ValueError):
+                    logger.warning(f"Corrupted frame at {f.tell() - length - FRAME_HEADER.size} of {segment}")
+                    return
+                yield records, f.tell()
+
+    @classmethod
+    def __read_frames(cls, segment: pathlib.Path) -> typing.Iterator[typing.List[list]]:
+        for records, _ in cls.__scan_frames(segment):
+            yield records
+
+    def __recover(self) -> int:
+        segments = self.segments()
+        if not segments:
+            return 0
+        next_offset, end = int(segments[-1].stem), 0
+        for records, end in self.__scan_frames(segments[-1]):
+            next_offset = records[-1][0] + 1
+        if os.path.getsize(segments[-1]) > end:
+            # 崩溃时写了一半的帧，截断到最后一个完整的帧，之后的写入才能被正常读取
+            logger.warning(f"Truncate {segments[-1]} from {os.path.getsize(segments[-1])} to {end} bytes")
+            with open(segments[-1], "r+b") as f:
+                f.truncate(end)
+        return next_offset
+
+    @staticmethod
+    def __serialize(event: typing.Union[Event, dict]) -> str:
+        return json.dumps(event.to_dict() if isinstance(event, Event) else event, ensure_ascii=False)
+
+    def __call__(self, wechat, event: Event) -> Event:
+        try:
+            self.__queue.put_nowait((time.time(), self.__serialize(event)))
+        except queue.Full:
+            self.dropped += 1
+        except (TypeError, ValueError) as e:
+            self.dropped += 1
+            logger.warning(f"Event not logged: {e}")
+        return event
+
+    def append(self, event: typing.Union[Event, dict]) -> None:
+        self.__queue.put((time.time(), self.__serialize(event)))
+
+    def __write_loop(self) -> None:
+        while True:
+            item = self.__queue.get()
+            if item is None:
+                break
+            batch = [item]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    item = self.__queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if item is None:
+                    self.__write(batch)
+                    return self.__close_segment()
+                batch.append(item)
+            try:
+                self.__write(batch)
+            except Exception:
+                logger.error(traceback.format_exc())
+        self.__close_segment()
+
+    def __write(self, batch: typing.List[typing.Tuple[float, str]]) -> None:
+        first_offset = self.__next_offset
+        payload = "\n".join(
+            f"[{offset}, {json.dumps(create_time)}, {event}]"
+            for offset, (create_time, event) in enumerate(batch, first_offset)
+        ).encode("utf-8")
+        if self.compress:
+            payload = zlib.compress(payload)
+        segment = self.__current_segment(first_offset)
+        segment.write(FRAME_HEADER.pack(len(payload), int(self.compress), len(batch)) + payload)
+        segment.flush()
+        # 写入成功后才推进偏移量，写入失败不会在偏移量中留下空洞
+        self.__next_offset = first_offset + len(batch)
+
+    def __current_segment(self, first_offset: int) -> typing.BinaryIO:
+        if self.__segment is not None and self.__segment.tell() >= self.segment_bytes:
+            self.__close_segment()
+        if self.__segment is None:
+            segments = self.segments()
+            if segments and os.path.getsize(segments[-1]) < self.segment_bytes:
+                path = segments[-1]
+            else:
+                path = self.directory / f"{first_offset:020d}{SEGMENT_SUFFIX}"
+            self.__segment = open(path, "ab")
+            self.__apply_retention()
+        return self.__segment
+
+    def __close_segment(self) -> None:
+        if self.__segment is not None:
+            self.__segment.close()
+            self.__segment = None
+
+    def __apply_retention(self) -> None:
+        segments = self.segments()[:-1]
+        if self.retention_segments is not None and len(segments) >= self.retention_segments:
+            for segment in segments[:len(segments) - self.retention_segments + 1]:
+                segment.unlink()
+            segments = segments[len(segments) - self.retention_segments + 1:]
+        if self.retention_seconds is not None:
+            expire_before = time.time() - self.retention_seconds
+            for segment in segments:
+                if segment.stat().st_mtime < expire_before:
+                    segment.unlink()
+
+    def read(self, from_offset: int = 0,
+             from_time: typing.Optional[float] = None) -> typing.Iterator[typing.Tuple[int, float, dict]]:
+        """按偏移量或时间读取事件"""
+        segments = self.segments()
+        for i, segment in enumerate(segments):
+            if i + 1 < len(segments) and int(segments[i + 1].stem) <= from_offset:
+                continue
+            for records in self.__read_frames(segment):
+                if records[-1][0] < from_offset or (from_time is not None and records[-1][1] < from_time):
+                    continue
+                for offset, create_time, event in records:
+                    if offset >= from_offset and (from_time is None or create_time >= from_time):
+                        yield offset, create_time, event
+
+    def get_offset(self, consumer: str) -> int:
+        with self.__offsets_lock:
+            if not self.offsets_file.exists():
+                return 0
+            with open(self.offsets_file, "r", encoding="utf-8") as f:
+                return json.load(f).get(consumer, 0)
+
+    def commit(self, consumer: str, offset: int) -> None:
+        """保存消费者的偏移量（下一条待消费事件的偏移量）"""
+        with self.__offsets_lock:
+            offsets = {}
+            if self.offsets_file.exists():
+                with open(self.offsets_file, "r", encoding="utf-8") as f:
+                    offsets = json.load(f)
+            offsets[consumer] = offset
+            tmp_file = self.offsets_file.with_suffix(".tmp")
+            with open(tmp_file, "w", encoding="utf-8") as f:
+                json.dump(offsets, f)
+            os.replace(tmp_file, self.offsets_file)
+
+    def replay(self, wechat, consumer: typing.Optional[str] = None, from_offset: typing.Optional[int] = None,
+               from_time: typing.Optional[float] = None, commit_every: int = 1000) -> int:
+        """将日志中的事件重放给WeChat.handle注册的处理函数，返回重放的事件数"""
+        if from_offset is None:
+            from_offset = self.get_offset(consumer) if consumer is not None else 0
+        count, next_offset = 0, from_offset
+        for offset, _, message in self.read(from_offset, from_time):
+            client_id = message.pop("client_id", 0)
+            wechat.emit(Event.from_dict(message, client_id))
+            count += 1
+            next_offset = offset + 1
+            if consumer is not None and count % commit_every == 0:
+                self.commit(consumer, next_offset)
+        if consumer is not None:
+            self.commit(consumer, next_offset)
+        return count
+
+    def close(self) -> None:
+        self.__queue.put(None)
+        self.__thread.join()
@@ -58,3 +58,21 @@ GROUP_MEMBER_INCREASE_MESSAGE = 11098
 GROUP_MEMBER_DECREASE_MESSAGE = 11099
 # 群增加消息
 GROUP_INCREASE_MESSAGE = 11100
+
+# 以下为本地合成事件，由SDK在本地生成，不来自hook
+# 直播间用户进入消息
+LIVE_ROOM_USER_ENTER_MESSAGE = 90001
+# 直播间用户离开消息
+LIVE_ROOM_USER_LEAVE_MESSAGE = 90002
+# 直播间发言消息
+LIVE_ROOM_COMMENT_MESSAGE = 90003
+# 直播间变动消息
+LIVE_ROOM_UPDATE_MESSAGE = 90004
+# 好友列表变动消息
+CONTACT_CHANGE_MESSAGE = 90005
+# 群列表变动消息
+ROOM_CHANGE_MESSAGE = 90006
+# 标签列表变动消息
+TAG_CHANGE_MESSAGE = 90007
+# 媒体文件就绪消息
+MEDIA_READY_MESSAGE = 90008
@@ -0,0 +1,221 @@
+import html
+import re
+import sqlite3
+import threading
+import time
+import traceback
+import typing
+
+from wechat.core import Event
+from wechat.events import FRIEND_REQUEST_MESSAGE
+from wechat.logger import logger
+from wechat.utils import TokenBucket
+
+MSG_TAG_PATTERN = re.compile(r"<msg\s([^>]*)>", re.S)
+ATTRIBUTE_PATTERN = re.compile(r'(\w+)="([^"]*)"')
+
+PENDING = "pending"
+ACCEPTED = "accepted"
+FAILED = "failed"
+
+
+def parse_friend_request(raw_msg: str) -> typing.Optional[dict]:
+    """解析好友请求xml中的关键字段（只解析msg标签的属性）"""
+    if not raw_msg:
+        return None
+    match = MSG_TAG_PATTERN.search(raw_msg)
+    if match is None:
+        return None
+    attributes = {key: html.unescape(value) for key, value in ATTRIBUTE_PATTERN.findall(match.group(1))}
+    if not attributes.get("encryptusername") or not attributes.get("ticket"):
+        return None
+    return {
+        "wxid": attributes.get("fromusername", ""),
+        "nickname": attributes.get("fromnickname", ""),
+        "content": attributes.get("content", ""),
+        "encryptusername": attributes["encryptusername"],
+        "ticket": attributes["ticket"],
+        "scene": int(attributes.get("scene") or 17)
+    }
+
+
+class FriendRequestPipeline:
+
+    def __init__(
+            self,
+            wechat,
+            db_file: str = "friend_requests.db",
+            rate: float = 1 / 30,
+            burst: float = 1,
+            max_attempts: int = 3,
+            remark: typing.Optional[typing.Callable[[dict], str]] = None,
+            label_id_list: typing.Optional[str] = None,
+            welcome: typing.Optional[typing.Callable[[dict], str]] = None,
+            timeout: typing.Optional[int] = None
+    ):
+        self.wechat = wechat
+        self.rate = rate
+        self.burst = burst
+        self.max_attempts = max_attempts
+        self.remark = remark
+        self.label_id_list = label_id_list
+        self.welcome = welcome
+        self.timeout = timeout
+        self.buckets: typing.Dict[typing.Union[str, int], TokenBucket] = {}
+        self.accepted = 0
+        self.failed = 0
+        self.__db = sqlite3.connect(db_file, check_same_thread=False)
+        self.__db.execute(
+            "CREATE TABLE IF NOT EXISTS friend_request ("
+            "encryptusername TEXT PRIMARY KEY, account TEXT, client_id INTEGER, wxid TEXT, nickname TEXT, "
+            "content TEXT, ticket TEXT, scene INTEGER, status TEXT, attempts INTEGER DEFAULT 0, error TEXT, "
+            "create_time REAL, update_time REAL)"
+        )
+        self.__db.execute("CREATE INDEX IF NOT EXISTS idx_status ON friend_request (status, create_time)")
+        self.__db.commit()
+        self.__lock = threading.Lock()
+        self.__wakeup = threading.Event()
+        self.__running = True
+        wechat.handle(FRIEND_REQUEST_MESSAGE)(self.on_friend_request)
+        self.__thread = threading.Thread(target=self.__loop, daemon=True)
+        self.__thread.start()
+
+    def on_friend_request(self, wechat, event: Event) -> None:
+        request = parse_friend_request(event["data"].get("raw_msg"))
+        if request is None:
+            logger.warning(f"Unrecognized friend request: {event}")
+            return
+        self.enqueue(event["client_id"], request)
+
+    def enqueue(self, client_id: int, request: dict) -> None:
+        """好友请求入队（待处理的请求只更新ticket，已处理过的用户再次申请时重新入队）"""
+        # client_id在hook重启后会变化，保存账号wxid，处理时再换成当前的client_id
+        account = self.wechat.self_wxid(client_id)
+        now = time.time()
+        with self.__lock:
+            self.__db.execute(
+                "INSERT INTO friend_request (encryptusername, account, client_id, wxid, nickname, content, ticket, "
+                "scene, status, create_time, update_time) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (encryptusername) DO UPDATE SET account = excluded.account, "
+                "client_id = excluded.client_id, wxid = excluded.wxid, "
+                "nickname = excluded.nickname, content = excluded.content, ticket = excluded.ticket, "
+                "scene = excluded.scene, update_time = excluded.update_time, "
+                "attempts = CASE WHEN status = excluded.status THEN attempts ELSE 0 END, "
+                "error = CASE WHEN status = excluded.status THEN error ELSE NULL END, "
+                "create_time = CASE WHEN status = excluded.status THEN create_time ELSE excluded.create_time END, "
+                "status = excluded.status",
+                (request["encryptusername"], account, client_id, request["wxid"], request["nickname"],
+                 request["content"], request["ticket"], request["scene"], PENDING, now, now)
+            )
+            self.__db.commit()
+        self.__wakeup.set()
+
+    def __pending_accounts(self) -> typing.List[typing.Tuple[typing.Optional[str], typing.Optional[int]]]:
+        # 已知账号的按账号分组，入队时没有取到账号的按client_id分组
+        with self.__lock:
+            cursor = self.__db.execute(
+                "SELECT DISTINCT account, CASE WHEN account IS NULL THEN client_id END "
+                "FROM friend_request WHERE status = ?", (PENDING,)
+            )
+            return cursor.fetchall()
+
+    def __next(self, account: typing.Optional[str], client_id: typing.Optional[int]) -> typing.Optional[dict]:
+        with self.__lock:
+            cursor = self.__db.execute(
+                "SELECT encryptusername, wxid, nickname, content, ticket, scene, attempts FROM friend_request "
+                "WHERE status = ? AND (account = ? OR (account IS NULL AND client_id = ?)) "
+                "ORDER BY create_time LIMIT 1",
+                (PENDING, account, client_id)
+            )
+            row = cursor.fetchone()
+        if row is None:
+            return None
+        keys = ["encryptusername", "wxid", "nickname", "content", "ticket", "scene", "attempts"]
+        return dict(zip(keys, row))
+
+    def __update(self, request: dict, status: str, error: typing.Optional[str] = None) -> None:
+        with self.__lock:
+            self.__db.execute(
+                "UPDATE friend_request SET status = ?, attempts = ?, error = ?, update_time = ? "
+                "WHERE encryptusername = ?",
+                (status, request["attempts"], error, time.time(), request["encryptusername"])
+            )
+            self.__db.commit()
+
+    def __loop(self) -> None:
+        while self.__running:
+            # 每个客户端独立限速，只处理令牌已就绪的客户端，一个客户端限速时不阻塞其他客户端
+            wait = 1.0
+            for account, client_id in self.__pending_accounts():
+                live_client_id = self.wechat.client_id_of(account) if account is not None else client_id
+                if live_client_id is None:
+                    # 账号未登录，保留请求等待重新登录
+                    continue
+                bucket = self.buckets.setdefault(account or client_id, TokenBucket(self.rate, self.burst))
+                client_wait = bucket.try_acquire()
+                if client_wait:
+                    wait = min(wait, client_wait)
+                    continue
+                request = self.__next(account, client_id)
+                if request is not None:
+                    request["client_id"] = live_client_id
+                    self.__accept(request)
+                wait = 0
+            if wait:
+                self.__wakeup.wait(wait)
+                self.__wakeup.clear()
+
+    def __accept(self, request: dict) -> None:
+        client_id = request["client_id"]
+        request["attempts"] += 1
+        try:
+            response = self.wechat.accept_friend_request(client_id, request["encryptusername"], request["ticket"],
+                                                         request["scene"], self.timeout)
+            if response is None:
+                raise Exception("accept_friend_request got no response")
+        except Exception as e:
+            if request["attempts"] >= self.max_attempts:
+                self.failed += 1
+                self.__update(request, FAILED, str(e))
+                logger.error(f"Accept friend request from {request['nickname']} failed: {e}")
+            else:
+                self.__update(request, PENDING, str(e))
+            return
+
+        self.accepted += 1
+        self.__update(request, ACCEPTED)
+        self.__follow_up(client_id, request)
+
+    def __follow_up(self, client_id: int, request: dict) -> None:
+        wxid = request["wxid"]
+        if not wxid:
+            return
+        try:
+            if self.remark is not None:
+                self.wechat.modify_contact_remark(client_id, wxid, self.remark(request), self.timeout)
+            if self.label_id_list:
+                self.wechat.add_tags_to_contact(client_id, wxid, self.label_id_list, self.timeout)
+            if self.welcome is not None:
+                self.wechat.send_text(client_id, wxid, self.welcome(request))
+        except Exception:
+            logger.warning(traceback.format_exc())
+
+    def metrics(self) -> dict:
+        """队列积压等指标"""
+        with self.__lock:
+            backlog, oldest = self.__db.execute(
+                "SELECT COUNT(*), MIN(create_time) FROM friend_request WHERE status = ?", (PENDING,)
+            ).fetchone()
+        return {
+            "backlog": backlog,
+            "oldest_age": time.time() - oldest if oldest else 0,
+            "accepted": self.accepted,
+            "failed": self.failed,
+            "rate": self.rate
+        }
+
+    def stop(self) -> None:
+        self.__running = False
+        self.__wakeup.set()
+        self.__thread.join()
+        self.__db.close()
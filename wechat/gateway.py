@@ -0,0 +1,186 @@
+import concurrent.futures
+import http.server
+import inspect
+import json
+import threading
+import time
+import traceback
+import typing
+
+from wechat.commands import COMMANDS
+from wechat.logger import logger
+
+# 命令注册表之外通过网关暴露的方法
+EXTRA_METHODS = ("send", "send_sync")
+
+
+def build_method_table(wechat) -> typing.Dict[str, typing.Callable]:
+    """根据命令注册表生成RPC方法表"""
+    methods = {name: getattr(wechat, name) for name in COMMANDS}
+    for name in EXTRA_METHODS:
+        methods[name] = getattr(wechat, name)
+    return methods
+
+
+class RPCError(Exception):
+
+    def __init__(self, code: int, message: str):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+
+
+class RPCRequestHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format: str, *args) -> None:
+        logger.debug(f"{self.address_string()} {format % args}")
+
+    def __reply(self, status: int, body: typing.Any) -> None:
+        payload = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self) -> None:
+        gateway: RPCGateway = getattr(self.server, "gateway")
+        if self.path == "/methods":
+            self.__reply(200, gateway.describe())
+        else:
+            self.__reply(404, {"error": {"code": 404, "message": "not found"}})
+
+    def do_POST(self) -> None:
+        gateway: RPCGateway = getattr(self.server, "gateway")
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.path != "/rpc":
+            return self.__reply(404, {"error": {"code": 404, "message": "not found"}})
+        try:
+            request = json.loads(body)
+        except ValueError:
+            return self.__reply(400, {"error": {"code": 400, "message": "invalid json"}})
+        # 按对端地址限额，客户端自带的请求头可以随意更换，不能用来区分调用方
+        caller = self.client_address[0]
+        if isinstance(request, list):
+            self.__reply(200, gateway.call_batch(caller, request))
+        else:
+            response = gateway.call(caller, request)
+            self.__reply(response["error"]["code"] if "error" in response else 200, response)
+
+
+class RPCServer(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class RPCGateway:
+
+    def __init__(
+            self,
+            wechat,
+            host: str = "127.0.0.1",
+            port: int = 19100,
+            max_concurrency: int = 8,
+            quota_wait: float = 5,
+            max_batch: int = 100,
+            max_workers: int = 32,
+            quota_idle: float = 300
+    ):
+        self.wechat = wechat
+        self.host = host
+        self.port = port
+        self.max_concurrency = max_concurrency
+        self.quota_wait = quota_wait
+        self.max_batch = max_batch
+        self.quota_idle = quota_idle
+        self.methods = build_method_table(wechat)
+        self.signatures = {name: inspect.signature(method) for name, method in self.methods.items()}
+        # 调用方 -> [并发配额, 进行中的调用数, 最后使用时间]，空闲超过quota_idle秒的配额会被清理
+        self.quotas: typing.Dict[str, list] = {}
+        self.__swept = time.monotonic()
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers, thread_name_prefix="rpc")
+        self.__lock = threading.Lock()
+        self.server = RPCServer((host, port), RPCRequestHandler)
+        self.server.gateway = self
+        self.server_thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.server_thread.start()
+        logger.info(f"RPC Gateway at http://{host}:{port}/rpc")
+
+    def describe(self) -> typing.Dict[str, dict]:
+        """方法列表：参数签名和说明"""
+        return {
+            name: {"signature": str(self.signatures[name]), "doc": inspect.getdoc(method) or ""}
+            for name, method in self.methods.items()
+        }
+
+    def __quota(self, caller: str) -> list:
+        now = time.monotonic()
+        with self.__lock:
+            if now - self.__swept >= self.quota_idle:
+                self.__swept = now
+                self.quotas = {
+                    key: entry for key, entry in self.quotas.items()
+                    if entry[1] or now - entry[2] < self.quota_idle
+                }
+            entry = self.quotas.get(caller)
+            if entry is None:
+                entry = self.quotas[caller] = [threading.BoundedSemaphore(self.max_concurrency), 0, now]
+            entry[1] += 1
+            entry[2] = now
+            return entry
+
+    def __release(self, entry: list) -> None:
+        with self.__lock:
+            entry[1] -= 1
+            entry[2] = time.monotonic()
+
+    def __invoke(self, caller: str, request: typing.Any) -> typing.Any:
+        if not isinstance(request, dict) or not isinstance(request.get("method"), str):
+            raise RPCError(400, "invalid request")
+        method = self.methods.get(request["method"])
+        if method is None:
+            raise RPCError(404, f"method {request['method']} not found")
+        params = request.get("params") or {}
+        try:
+            if isinstance(params, list):
+                self.signatures[request["method"]].bind(*params)
+            else:
+                self.signatures[request["method"]].bind(**params)
+        except TypeError as e:
+            raise RPCError(400, str(e))
+
+        entry = self.__quota(caller)
+        try:
+            if not entry[0].acquire(timeout=self.quota_wait):
+                raise RPCError(429, f"caller {caller} exceeded {self.max_concurrency} concurrent requests")
+            try:
+                return method(*params) if isinstance(params, list) else method(**params)
+            finally:
+                entry[0].release()
+        finally:
+            self.__release(entry)
+
+    def call(self, caller: str, request: typing.Any) -> dict:
+        """执行单个调用"""
+        response = {"id": request.get("id") if isinstance(request, dict) else None}
+        try:
+            response["result"] = self.__invoke(caller, request)
+        except RPCError as e:
+            response["error"] = {"code": e.code, "message": e.message}
+        except Exception as e:
+            logger.error(traceback.format_exc())
+            response["error"] = {"code": 500, "message": str(e)}
+        return response
+
+    def call_batch(self, caller: str, requests: typing.List[typing.Any]) -> typing.List[dict]:
+        """并发执行一批调用，按请求顺序返回结果（受调用方并发配额限制）"""
+        if len(requests) > self.max_batch:
+            return [{"id": None, "error": {"code": 413, "message": f"batch larger than {self.max_batch}"}}]
+        futures = [self.executor.submit(self.call, caller, request) for request in requests]
+        return [future.result() for future in futures]
+
+    def close(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+        self.executor.shutdown(wait=False)
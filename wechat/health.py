@@ -0,0 +1,152 @@
+import collections
+import threading
+import time
+import typing
+
+from wechat.logger import logger
+from wechat.utils import wait_for_port
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+class Circuit:
+    __slots__ = ("state", "outcomes", "latencies", "open_until", "reset_timeout", "trial", "opened")
+
+    def __init__(self, window: int, reset_timeout: float):
+        self.state = CLOSED
+        self.outcomes: typing.Deque[bool] = collections.deque(maxlen=window)
+        self.latencies: typing.Deque[float] = collections.deque(maxlen=window)
+        self.open_until = 0.0
+        self.reset_timeout = reset_timeout
+        self.trial = False
+        self.opened = 0
+
+
+class HealthMonitor:
+
+    def __init__(
+            self,
+            wechat,
+            window: int = 20,
+            min_calls: int = 5,
+            failure_rate: float = 0.5,
+            slow_call: float = 5,
+            reset_timeout: float = 5,
+            max_reset_timeout: float = 60,
+            probe_interval: float = 2,
+            probe_timeout: int = 3,
+            restart: bool = True
+    ):
+        self.wechat = wechat
+        self.window = window
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.slow_call = slow_call
+        self.reset_timeout = reset_timeout
+        self.max_reset_timeout = max_reset_timeout
+        self.probe_interval = probe_interval
+        self.probe_timeout = probe_timeout
+        self.restart = restart
+        self.restarts = 0
+        self.api_up = True
+        self.circuits: typing.Dict[int, Circuit] = {}
+        self.__lock = threading.Lock()
+        self.__stopped = threading.Event()
+        wechat.breaker = self
+        self.__thread = threading.Thread(target=self.__probe_loop, daemon=True)
+        self.__thread.start()
+
+    def __circuit(self, client_id: int) -> Circuit:
+        circuit = self.circuits.get(client_id)
+        if circuit is None:
+            circuit = self.circuits[client_id] = Circuit(self.window, self.reset_timeout)
+        return circuit
+
+    def before(self, client_id: int) -> None:
+        """发送前检查熔断状态，熔断中直接抛出CircuitOpenError"""
+        with self.__lock:
+            circuit = self.__circuit(client_id)
+            if circuit.state == CLOSED:
+                return
+            if circuit.state == OPEN and time.monotonic() >= circuit.open_until:
+                circuit.state = HALF_OPEN
+                circuit.trial = False
+            if circuit.state == HALF_OPEN and not circuit.trial:
+                # 半开状态只放行一个试探请求
+                circuit.trial = True
+                return
+        raise CircuitOpenError(f"circuit of client {client_id} is open")
+
+    def record(self, client_id: int, ok: bool, elapsed: float) -> None:
+        ok = ok and elapsed < self.slow_call
+        with self.__lock:
+            circuit = self.__circuit(client_id)
+            circuit.latencies.append(elapsed)
+            if circuit.state == HALF_OPEN and circuit.trial:
+                circuit.trial = False
+                if ok:
+                    circuit.state = CLOSED
+                    circuit.outcomes.clear()
+                    circuit.reset_timeout = self.reset_timeout
+                    logger.info(f"Circuit of client {client_id} closed")
+                else:
+                    circuit.reset_timeout = min(self.max_reset_timeout, circuit.reset_timeout * 2)
+                    self.__open(client_id, circuit)
+                return
+            circuit.outcomes.append(ok)
+            if circuit.state == CLOSED and len(circuit.outcomes) >= self.min_calls:
+                failures = circuit.outcomes.count(False)
+                if failures / len(circuit.outcomes) >= self.failure_rate:
+                    self.__open(client_id, circuit)
+
+    def __open(self, client_id: int, circuit: Circuit) -> None:
+        circuit.state = OPEN
+        circuit.open_until = time.monotonic() + circuit.reset_timeout
+        circuit.opened += 1
+        logger.warning(f"Circuit of client {client_id} opened for {circuit.reset_timeout}s")
+
+    def __probe_loop(self) -> None:
+        while not self.__stopped.wait(self.probe_interval):
+            if not self.wechat.running:
+                continue
+            process = self.wechat.process
+            if self.restart and process is not None and process.poll() is not None:
+                logger.warning(f"Hook exited with code {process.returncode}, restarting")
+                try:
+                    self.wechat.restart_hook()
+                    self.restarts += 1
+                except Exception as e:
+                    logger.error(f"Restart hook failed: {e}")
+                continue
+            self.api_up = wait_for_port(self.wechat.host, self.wechat.port, self.probe_timeout)
+            now = time.monotonic()
+            for client_id, circuit in list(self.circuits.items()):
+                if circuit.state == OPEN and now >= circuit.open_until:
+                    try:
+                        self.wechat.get_self_info(client_id, self.probe_timeout)
+                    except Exception:
+                        pass
+
+    def stats(self) -> dict:
+        with self.__lock:
+            clients = {
+                client_id: {
+                    "state": circuit.state,
+                    "error_rate": circuit.outcomes.count(False) / len(circuit.outcomes) if circuit.outcomes else 0.0,
+                    "avg_latency": sum(circuit.latencies) / len(circuit.latencies) if circuit.latencies else 0.0,
+                    "opened": circuit.opened
+                }
+                for client_id, circuit in self.circuits.items()
+            }
+        return {"api_up": self.api_up, "restarts": self.restarts, "clients": clients}
+
+    def close(self) -> None:
+        self.__stopped.set()
+        if self.wechat.breaker is self:
+            self.wechat.breaker = None
@@ -0,0 +1,197 @@
+import collections
+import concurrent.futures
+import hashlib
+import heapq
+import itertools
+import threading
+import time
+import traceback
+import typing
+
+from wechat.core import Event
+from wechat.events import (
+    LIVE_ROOM_USER_ENTER_MESSAGE,
+    LIVE_ROOM_USER_LEAVE_MESSAGE,
+    LIVE_ROOM_COMMENT_MESSAGE,
+    LIVE_ROOM_UPDATE_MESSAGE
+)
+from wechat.logger import logger
+from wechat.utils import response_list
+
+USER_ID_FIELDS = ["username", "wxid", "user_name", "finder_username"]
+COMMENT_ID_FIELDS = ["seq", "msg_id", "client_msg_id", "id"]
+
+
+def _first(item: dict, fields: typing.List[str]) -> typing.Any:
+    for field in fields:
+        if item.get(field):
+            return item[field]
+    return None
+
+
+class LiveRoom:
+    __slots__ = ("key", "client_id", "object_id", "live_id", "object_nonce_id", "interval", "users",
+                 "seen_comments", "seen_order", "active")
+
+    def __init__(self, key: int, client_id: int, object_id: str, live_id: str, object_nonce_id: str,
+                 interval: float):
+        self.key = key
+        self.client_id = client_id
+        self.object_id = object_id
+        self.live_id = live_id
+        self.object_nonce_id = object_nonce_id
+        self.interval = interval
+        self.users: typing.Optional[typing.Dict[str, dict]] = None
+        self.seen_comments: typing.Set[str] = set()
+        self.seen_order: typing.Deque[str] = collections.deque()
+        self.active = True
+
+
+class LiveRoomStreamer:
+
+    def __init__(
+            self,
+            wechat,
+            min_interval: float = 1,
+            max_interval: float = 30,
+            backoff: float = 1.5,
+            max_workers: int = 4,
+            comment_cache_size: int = 2000,
+            timeout: typing.Optional[int] = None
+    ):
+        self.wechat = wechat
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.comment_cache_size = comment_cache_size
+        self.timeout = timeout
+        self.rooms: typing.Dict[int, LiveRoom] = {}
+        # get_live_room_updates返回的是客户端当前所在直播间的变动，每个客户端只能订阅一个直播间
+        self.client_rooms: typing.Dict[int, int] = {}
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers, thread_name_prefix="live")
+        self.__keys = itertools.count(1)
+        self.__schedule: typing.List[typing.Tuple[float, int]] = []
+        self.__cond = threading.Condition()
+        self.__running = True
+        self.__thread = threading.Thread(target=self.__loop, daemon=True)
+        self.__thread.start()
+        # WeChat停止时停止轮询
+        wechat.stop_hooks.append(lambda _: self.stop())
+
+    def subscribe(self, client_id: int, object_id: str, live_id: str, object_nonce_id: str) -> int:
+        """进入并订阅直播间，返回订阅id（客户端已订阅其他直播间时取消之前的订阅）"""
+        previous = self.client_rooms.get(client_id)
+        if previous is not None:
+            logger.info(f"Client {client_id} leaves live room subscription {previous}")
+            self.unsubscribe(previous)
+        if self.wechat.enter_live_room(client_id, object_id, live_id, object_nonce_id, self.timeout) is None:
+            raise Exception(f"enter live room {live_id} failed")
+        room = LiveRoom(next(self.__keys), client_id, object_id, live_id, object_nonce_id, self.min_interval)
+        with self.__cond:
+            self.rooms[room.key] = room
+            self.client_rooms[client_id] = room.key
+            heapq.heappush(self.__schedule, (time.monotonic(), room.key))
+            self.__cond.notify()
+        return room.key
+
+    def unsubscribe(self, key: int) -> None:
+        """取消订阅直播间"""
+        with self.__cond:
+            room = self.rooms.pop(key, None)
+            if room is not None:
+                room.active = False
+                if self.client_rooms.get(room.client_id) == key:
+                    del self.client_rooms[room.client_id]
+
+    def stop(self) -> None:
+        with self.__cond:
+            if not self.__running:
+                return
+            self.__running = False
+            self.__cond.notify()
+        self.executor.shutdown(wait=True)
+
+    def __loop(self) -> None:
+        while True:
+            with self.__cond:
+                while self.__running and (not self.__schedule or self.__schedule[0][0] > time.monotonic()):
+                    self.__cond.wait(self.__schedule[0][0] - time.monotonic() if self.__schedule else None)
+                if not self.__running:
+                    return
+                _, key = heapq.heappop(self.__schedule)
+                room = self.rooms.get(key)
+            if room is not None:
+                self.executor.submit(self.__poll, room)
+
+    def __reschedule(self, room: LiveRoom, changed: bool) -> None:
+        if changed:
+            room.interval = self.min_interval
+        else:
+            room.interval = min(self.max_interval, room.interval * self.backoff)
+        with self.__cond:
+            if room.active and self.__running:
+                heapq.heappush(self.__schedule, (time.monotonic() + room.interval, room.key))
+                self.__cond.notify()
+
+    def __poll(self, room: LiveRoom) -> None:
+        changed = False
+        try:
+            updates = self.wechat.get_live_room_updates(room.client_id, self.timeout)
+            changed |= self.__diff_comments(room, updates)
+            users = self.wechat.get_live_room_online_users(room.client_id, room.object_id, room.live_id,
+                                                           room.object_nonce_id, self.timeout)
+            changed |= self.__diff_users(room, users)
+            if changed and updates:
+                self.__emit(room, LIVE_ROOM_UPDATE_MESSAGE, {"updates": updates})
+        except Exception:
+            logger.warning(traceback.format_exc())
+        finally:
+            self.__reschedule(room, changed)
+
+    def __diff_users(self, room: LiveRoom, response: typing.Any) -> bool:
+        if response is None:
+            return False
+        users = {}
+        for item in response_list(response, "get_live_room_online_users"):
+            if isinstance(item, dict):
+                user_id = _first(item, USER_ID_FIELDS)
+                if user_id:
+                    users[user_id] = item
+        previous, room.users = room.users, users
+        if previous is None:
+            return bool(users)
+
+        entered = [users[user_id] for user_id in users.keys() - previous.keys()]
+        left = [previous[user_id] for user_id in previous.keys() - users.keys()]
+        if entered:
+            self.__emit(room, LIVE_ROOM_USER_ENTER_MESSAGE, {"user_list": entered})
+        if left:
+            self.__emit(room, LIVE_ROOM_USER_LEAVE_MESSAGE, {"user_list": left})
+        return bool(entered or left)
+
+    def __diff_comments(self, room: LiveRoom, response: typing.Any) -> bool:
+        comments = []
+        for item in response_list(response, "get_live_room_updates"):
+            if not isinstance(item, dict):
+                continue
+            comment_id = _first(item, COMMENT_ID_FIELDS)
+            if comment_id is None:
+                comment_id = hashlib.md5(repr(sorted(item.items())).encode("utf-8")).hexdigest()
+            comment_id = str(comment_id)
+            if comment_id in room.seen_comments:
+                continue
+            room.seen_comments.add(comment_id)
+            room.seen_order.append(comment_id)
+            if len(room.seen_order) > self.comment_cache_size:
+                room.seen_comments.discard(room.seen_order.popleft())
+            comments.append(item)
+        if comments:
+            self.__emit(room, LIVE_ROOM_COMMENT_MESSAGE, {"comment_list": comments})
+        return bool(comments)
+
+    def __emit(self, room: LiveRoom, msg_type: int, data: dict) -> None:
+        if not room.active:
+            # 已取消订阅（客户端切换了直播间），丢弃仍在进行的轮询结果
+            return
+        data.update({"object_id": room.object_id, "live_id": room.live_id, "object_nonce_id": room.object_nonce_id})
+        self.wechat.process_event(Event(msg_type, room.client_id, data))
@@ -0,0 +1,159 @@
+import collections
+import os
+import re
+import threading
+import time
+import typing
+
+from wechat.core import Event
+from wechat.events import TEXT_MESSAGE
+from wechat.logger import logger
+
+AT_USER_LIST_PATTERN = re.compile(r"<atuserlist>\s*(?:<!\[CDATA\[)?(.*?)(?:\]\]>)?\s*</atuserlist>", re.S)
+AT_ALL = "notify@all"
+
+
+def scan_at_list(raw_msg: str) -> typing.List[str]:
+    """从raw_msg中提取at列表（不构建完整的xml树）"""
+    if not raw_msg or "<atuserlist>" not in raw_msg:
+        return []
+    match = AT_USER_LIST_PATTERN.search(raw_msg)
+    if match is None:
+        return []
+    return [wxid.strip() for wxid in match.group(1).split(",") if wxid.strip()]
+
+
+class AhoCorasick:
+
+    def __init__(self, keywords: typing.Iterable[str]):
+        self.goto: typing.List[typing.Dict[str, int]] = [{}]
+        self.fail: typing.List[int] = [0]
+        self.output: typing.List[typing.Tuple[str, ...]] = [()]
+        for keyword in keywords:
+            if keyword:
+                self.__insert(keyword)
+        self.__build()
+
+    def __insert(self, keyword: str) -> None:
+        state = 0
+        for char in keyword:
+            next_state = self.goto[state].get(char)
+            if next_state is None:
+                next_state = len(self.goto)
+                self.goto[state][char] = next_state
+                self.goto.append({})
+                self.fail.append(0)
+                self.output.append(())
+            state = next_state
+        if keyword not in self.output[state]:
+            self.output[state] += (keyword,)
+
+    def __build(self) -> None:
+        queue = collections.deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self.goto[state].items():
+                queue.append(next_state)
+                fail = self.fail[state]
+                while fail and char not in self.goto[fail]:
+                    fail = self.fail[fail]
+                self.fail[next_state] = self.goto[fail].get(char, 0)
+                self.output[next_state] += self.output[self.fail[next_state]]
+
+    def iter(self, text: str) -> typing.Iterator[typing.Tuple[int, str]]:
+        goto, fail, output = self.goto, self.fail, self.output
+        state = 0
+        for i, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for keyword in output[state]:
+                yield i - len(keyword) + 1, keyword
+
+    def findall(self, text: str) -> typing.List[str]:
+        keywords = []
+        for _, keyword in self.iter(text):
+            if keyword not in keywords:
+                keywords.append(keyword)
+        return keywords
+
+    def __len__(self) -> int:
+        return len(self.goto)
+
+
+class KeywordMatcher:
+
+    def __init__(
+            self,
+            keywords: typing.Optional[typing.Iterable[str]] = None,
+            keywords_file: typing.Optional[str] = None,
+            ignore_case: bool = True,
+            reload_interval: float = 5,
+            event_types: typing.Iterable[int] = (TEXT_MESSAGE,),
+            room_only: bool = True
+    ):
+        self.keywords_file = keywords_file
+        self.ignore_case = ignore_case
+        self.reload_interval = reload_interval
+        self.event_types = set(event_types)
+        self.room_only = room_only
+        self.automaton = AhoCorasick(())
+        self.__mtime = 0.0
+        self.__checked_at = 0.0
+        self.__reloading = threading.Lock()
+        if keywords is not None:
+            self.load(keywords)
+        if keywords_file is not None:
+            self.reload()
+
+    def load(self, keywords: typing.Iterable[str]) -> None:
+        """编译关键词（构建完成后整体替换）"""
+        if self.ignore_case:
+            keywords = (keyword.lower() for keyword in keywords)
+        self.automaton = AhoCorasick(keyword.strip() for keyword in keywords)
+
+    def reload(self) -> None:
+        """从关键词文件重新加载"""
+        if not self.__reloading.acquire(blocking=False):
+            return
+        try:
+            mtime = os.path.getmtime(self.keywords_file)
+            if mtime == self.__mtime:
+                return
+            with open(self.keywords_file, "r", encoding="utf-8") as f:
+                self.load(f.read().splitlines())
+            self.__mtime = mtime
+            logger.info(f"Keywords reloaded from {self.keywords_file}: {len(self.automaton)} states")
+        except Exception as e:
+            logger.warning(f"Keywords reload failed: {e}")
+        finally:
+            self.__reloading.release()
+
+    def __maybe_reload(self) -> None:
+        now = time.monotonic()
+        if self.keywords_file is None or now - self.__checked_at < self.reload_interval:
+            return
+        self.__checked_at = now
+        threading.Thread(target=self.reload, daemon=True).start()
+
+    def match(self, text: str) -> typing.List[str]:
+        """匹配文本中出现的关键词"""
+        if not text:
+            return []
+        return self.automaton.findall(text.lower() if self.ignore_case else text)
+
+    def __call__(self, wechat, event: Event) -> Event:
+        if event["type"] not in self.event_types:
+            return event
+
+        data = event["data"]
+        room_wxid = data.get("room_wxid") or ""
+        if self.room_only and not room_wxid:
+            return event
+
+        self.__maybe_reload()
+        at_list = scan_at_list(data.get("raw_msg"))
+        data["at_list"] = at_list
+        data["is_at_me"] = AT_ALL in at_list or wechat.self_wxids.get(event["client_id"]) in at_list
+        data["matched_keywords"] = self.match(data.get("msg") or data.get("content") or "")
+        return event
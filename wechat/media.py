@@ -0,0 +1,231 @@
+import hashlib
+import html
+import itertools
+import os
+import pathlib
+import queue
+import re
+import shutil
+import sqlite3
+import threading
+import traceback
+import typing
+import uuid
+
+from wechat.cdn import CDNTransferManager, FILE_TYPE_IMAGE, FILE_TYPE_VIDEO, FILE_TYPE_FILE
+from wechat.core import Event
+from wechat.events import IMAGE_MESSAGE, VIDEO_MESSAGE, FILE_MESSAGE, MEDIA_READY_MESSAGE
+from wechat.logger import logger
+from wechat.utils import get_image_info, decode_image_data
+
+IMG_TAG_PATTERN = re.compile(r"<img\s([^>]*)>", re.S)
+VIDEO_TAG_PATTERN = re.compile(r"<videomsg\s([^>]*)>", re.S)
+ATTRIBUTE_PATTERN = re.compile(r'(\w+)="([^"]*)"')
+ELEMENT_PATTERN = re.compile(r"<(\w+)>(?:<!\[CDATA\[)?([^<\]]*)(?:\]\]>)?</\1>")
+# 事件中可能携带本地.dat文件路径的字段
+LOCAL_PATH_FIELDS = ("image_path", "file_path", "path")
+
+
+def _int(value: typing.Optional[str]) -> int:
+    try:
+        return int(value or 0)
+    except ValueError:
+        return 0
+
+
+def parse_media(msg_type: int, raw_msg: str) -> typing.Optional[dict]:
+    """从raw_msg中提取CDN下载参数（只匹配需要的属性和元素，不构建xml树）"""
+    if not raw_msg:
+        return None
+    if msg_type in (IMAGE_MESSAGE, VIDEO_MESSAGE):
+        match = (IMG_TAG_PATTERN if msg_type == IMAGE_MESSAGE else VIDEO_TAG_PATTERN).search(raw_msg)
+        if match is None:
+            return None
+        attributes = {key: html.unescape(value) for key, value in ATTRIBUTE_PATTERN.findall(match.group(1))}
+        if msg_type == IMAGE_MESSAGE:
+            file_id = attributes.get("cdnmidimgurl") or attributes.get("cdnbigimgurl")
+            file_type, suffix = FILE_TYPE_IMAGE, ".jpg"
+        else:
+            file_id = attributes.get("cdnvideourl")
+            file_type, suffix = FILE_TYPE_VIDEO, ".mp4"
+        file_size = _int(attributes.get("length") or attributes.get("hdlength"))
+        md5 = attributes.get("md5", "")
+        file_name = ""
+    else:
+        elements = {key: html.unescape(value) for key, value in ELEMENT_PATTERN.findall(raw_msg)}
+        file_id = elements.get("cdnattachurl")
+        attributes = {"aeskey": elements.get("aeskey")}
+        file_type = FILE_TYPE_FILE
+        file_name = elements.get("title", "")
+        suffix = "." + elements["fileext"] if elements.get("fileext") else pathlib.Path(file_name).suffix
+        file_size = _int(elements.get("totallen"))
+        md5 = elements.get("md5", "")
+    if not file_id or not attributes.get("aeskey"):
+        return None
+    return {
+        "file_id": file_id,
+        "aes_key": attributes["aeskey"],
+        "file_type": file_type,
+        "file_size": file_size,
+        "md5": md5,
+        "suffix": suffix,
+        "file_name": file_name
+    }
+
+
+class MediaPrefetcher:
+
+    def __init__(
+            self,
+            wechat,
+            directory: str = "media",
+            cdn: typing.Optional[CDNTransferManager] = None,
+            max_workers: int = 4,
+            max_pending: int = 10000,
+            events: typing.Iterable[int] = (IMAGE_MESSAGE, VIDEO_MESSAGE, FILE_MESSAGE)
+    ):
+        self.wechat = wechat
+        self.directory = pathlib.Path(directory)
+        self.objects_dir = self.directory / "objects"
+        self.tmp_dir = self.directory / "tmp"
+        self.objects_dir.mkdir(parents=True, exist_ok=True)
+        self.tmp_dir.mkdir(parents=True, exist_ok=True)
+        self.cdn = cdn or CDNTransferManager(wechat)
+        self.downloaded = 0
+        self.duplicates = 0
+        self.failed = 0
+        self.dropped = 0
+        self.__seq = itertools.count()
+        self.__queue: "queue.PriorityQueue[tuple]" = queue.PriorityQueue(max_pending)
+        self.__lock = threading.Lock()
+        self.__db = sqlite3.connect(str(self.directory / "index.db"), check_same_thread=False)
+        self.__db.execute(
+            "CREATE TABLE IF NOT EXISTS media (md5 TEXT PRIMARY KEY, sha256 TEXT, path TEXT, size INTEGER)"
+        )
+        self.__db.commit()
+        self.__threads = [threading.Thread(target=self.__work, daemon=True) for _ in range(max_workers)]
+        for thread in self.__threads:
+            thread.start()
+        wechat.handle(list(events))(self.on_media_message)
+
+    def on_media_message(self, wechat, event: Event) -> None:
+        data = event["data"]
+        if not isinstance(data, dict):
+            return
+        job = parse_media(event["type"], data.get("raw_msg"))
+        if job is None:
+            local_path = next((data[field] for field in LOCAL_PATH_FIELDS
+                               if str(data.get(field, "")).endswith(".dat")), None)
+            if local_path is None:
+                return
+            job = {"local_path": local_path, "file_size": 0, "md5": "", "suffix": ""}
+        job["event"] = event
+        self.submit(job)
+
+    def submit(self, job: dict) -> bool:
+        """加入下载队列（小文件优先），队列满时丢弃"""
+        try:
+            self.__queue.put_nowait((job["file_size"], next(self.__seq), job))
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def __work(self) -> None:
+        while True:
+            _, _, job = self.__queue.get()
+            if job is None:
+                return
+            try:
+                self.__process(job)
+            except Exception:
+                self.failed += 1
+                logger.error(traceback.format_exc())
+
+    def __lookup(self, md5: str) -> typing.Optional[tuple]:
+        if not md5:
+            return None
+        with self.__lock:
+            row = self.__db.execute("SELECT sha256, path, size FROM media WHERE md5 = ?", (md5,)).fetchone()
+        if row is not None and os.path.exists(row[1]):
+            return row
+        return None
+
+    def __store(self, tmp_path: pathlib.Path, suffix: str, md5: str) -> typing.Tuple[str, str, int, bool]:
+        sha256 = hashlib.sha256()
+        with open(tmp_path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                sha256.update(chunk)
+        digest = sha256.hexdigest()
+        path = self.objects_dir / digest[:2] / f"{digest}{suffix}"
+        size = tmp_path.stat().st_size
+        duplicate = path.exists()
+        if duplicate:
+            tmp_path.unlink()
+        else:
+            path.parent.mkdir(exist_ok=True)
+            shutil.move(str(tmp_path), str(path))
+        if md5:
+            with self.__lock:
+                self.__db.execute("INSERT OR REPLACE INTO media (md5, sha256, path, size) VALUES (?, ?, ?, ?)",
+                                  (md5, digest, str(path), size))
+                self.__db.commit()
+        return digest, str(path), size, duplicate
+
+    def __process(self, job: dict) -> None:
+        event = job["event"]
+        client_id = event["client_id"]
+        cached = self.__lookup(job["md5"])
+        if cached is not None:
+            self.duplicates += 1
+            return self.__ready(event, job, cached[0], cached[1], cached[2], True)
+
+        tmp_path = self.tmp_dir / uuid.uuid4().hex
+        if "local_path" in job:
+            with open(job["local_path"], "rb") as f:
+                data = f.read()
+            suffix, key = get_image_info(data)
+            with open(tmp_path, "wb") as f:
+                f.write(decode_image_data(data, key))
+            job["suffix"] = "." + suffix
+        else:
+            self.cdn.download(client_id, job["file_id"], job["aes_key"], str(tmp_path), job["file_type"],
+                              job["file_size"]).result()
+            if not tmp_path.exists():
+                self.failed += 1
+                logger.warning(f"cdn_download did not produce {tmp_path}")
+                return
+        sha256, path, size, duplicate = self.__store(tmp_path, job["suffix"], job["md5"])
+        if duplicate:
+            self.duplicates += 1
+        else:
+            self.downloaded += 1
+        self.__ready(event, job, sha256, path, size, duplicate)
+
+    def __ready(self, event: Event, job: dict, sha256: str, path: str, size: int, duplicate: bool) -> None:
+        data = event["data"]
+        self.wechat.process_event(Event(MEDIA_READY_MESSAGE, event["client_id"], {
+            "msg_type": event["type"],
+            "msgid": data.get("msgid"),
+            "from_wxid": data.get("from_wxid"),
+            "room_wxid": data.get("room_wxid"),
+            "to_wxid": data.get("to_wxid"),
+            "file_name": job.get("file_name", ""),
+            "path": path,
+            "sha256": sha256,
+            "size": size,
+            "duplicate": duplicate
+        }))
+
+    def stats(self) -> dict:
+        return {
+            "pending": self.__queue.qsize(),
+            "downloaded": self.downloaded,
+            "duplicates": self.duplicates,
+            "failed": self.failed,
+            "dropped": self.dropped
+        }
+
+    def close(self) -> None:
+        for _ in self.__threads:
+            self.__queue.put((float("inf"), next(self.__seq), None))
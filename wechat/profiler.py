@@ -0,0 +1,182 @@
+import collections
+import signal
+import sys
+import threading
+import time
+import traceback
+import typing
+
+from wechat.logger import logger
+from wechat.timeouts import LatencySketch
+
+
+def handler_name(func: typing.Callable) -> str:
+    func = getattr(func, "__func__", func)
+    return f"{getattr(func, '__module__', '?')}.{getattr(func, '__qualname__', repr(func))}"
+
+
+class HandlerStats:
+    __slots__ = ("calls", "errors", "slow", "wall", "cpu_time", "delay_time", "max_wall", "samples")
+
+    def __init__(self, max_samples: int):
+        self.calls = 0
+        self.errors = 0
+        self.slow = 0
+        self.wall = LatencySketch(min_value=0.00001)
+        self.cpu_time = 0.0
+        self.delay_time = 0.0
+        self.max_wall = 0.0
+        self.samples: typing.Deque[dict] = collections.deque(maxlen=max_samples)
+
+
+class HandlerProfiler:
+
+    def __init__(
+            self,
+            wechat,
+            slow_threshold: float = 0.5,
+            report_interval: typing.Optional[float] = 60,
+            max_samples: int = 5,
+            sample_chars: int = 300
+    ):
+        self.wechat = wechat
+        self.slow_threshold = slow_threshold
+        self.report_interval = report_interval
+        self.max_samples = max_samples
+        self.sample_chars = sample_chars
+        self.handlers: typing.Dict[str, HandlerStats] = {}
+        # 正在执行处理函数的线程（线程id -> 嵌套层数），采样分析时只采集这些线程
+        self.dispatch_threads: typing.Counter[int] = collections.Counter()
+        self.__lock = threading.Lock()
+        self.__stopped = threading.Event()
+        # 通过WeChat.handle注册的处理函数（包括已注册的）在process_event中经过run调用
+        wechat.profiler = self
+        if report_interval:
+            threading.Thread(target=self.__report_loop, daemon=True).start()
+
+    def run(self, func: typing.Callable, wechat, event, delay: float = 0.0) -> typing.Any:
+        """调用处理函数并记录耗时，delay为事件开始处理到该处理函数开始执行的时间"""
+        ident = threading.get_ident()
+        with self.__lock:
+            self.dispatch_threads[ident] += 1
+        started = time.perf_counter()
+        cpu_started = time.thread_time()
+        error = None
+        try:
+            return func(wechat, event)
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            with self.__lock:
+                self.dispatch_threads[ident] -= 1
+                if not self.dispatch_threads[ident]:
+                    del self.dispatch_threads[ident]
+            self.__record(handler_name(func), delay, time.perf_counter() - started,
+                          time.thread_time() - cpu_started, event, error)
+
+    def __record(self, name: str, delay: float, wall: float, cpu: float, event: typing.Any,
+                 error: typing.Optional[Exception]) -> None:
+        with self.__lock:
+            stats = self.handlers.get(name)
+            if stats is None:
+                stats = self.handlers[name] = HandlerStats(self.max_samples)
+            stats.calls += 1
+            stats.wall.add(wall)
+            stats.cpu_time += cpu
+            stats.delay_time += delay
+            stats.max_wall = max(stats.max_wall, wall)
+            if error is not None:
+                stats.errors += 1
+            if wall >= self.slow_threshold or error is not None:
+                stats.slow += wall >= self.slow_threshold
+                stats.samples.append({
+                    "time": time.time(),
+                    "wall": wall,
+                    "cpu": cpu,
+                    "error": repr(error) if error is not None else None,
+                    "event": repr(event)[:self.sample_chars]
+                })
+        if error is not None:
+            logger.error(f"Handler {name} raised: {traceback.format_exception_only(type(error), error)[-1].strip()}")
+
+    def stats(self) -> typing.Dict[str, dict]:
+        with self.__lock:
+            return {
+                name: {
+                    "calls": stats.calls,
+                    "errors": stats.errors,
+                    "slow": stats.slow,
+                    "p50": stats.wall.quantile(0.5),
+                    "p95": stats.wall.quantile(0.95),
+                    "p99": stats.wall.quantile(0.99),
+                    "max": stats.max_wall,
+                    "avg_cpu": stats.cpu_time / stats.calls,
+                    "avg_delay": stats.delay_time / stats.calls,
+                    "samples": list(stats.samples)
+                }
+                for name, stats in self.handlers.items()
+            }
+
+    def report(self, top: int = 10) -> str:
+        """慢处理函数报告（按p99排序，附带慢调用的事件样本）"""
+        handlers = sorted(self.stats().items(), key=lambda item: item[1]["p99"] or 0, reverse=True)[:top]
+        lines = ["handler calls errors slow p50(ms) p99(ms) max(ms) cpu(ms) delay(ms)"]
+        for name, stats in handlers:
+            lines.append(
+                f"{name} {stats['calls']} {stats['errors']} {stats['slow']} {stats['p50'] * 1000:.1f} "
+                f"{stats['p99'] * 1000:.1f} {stats['max'] * 1000:.1f} {stats['avg_cpu'] * 1000:.1f} "
+                f"{stats['avg_delay'] * 1000:.1f}"
+            )
+            for sample in stats["samples"]:
+                lines.append(f"    {sample['wall'] * 1000:.1f}ms {sample['error'] or ''} {sample['event']}")
+        return "\n".join(lines)
+
+    def __report_loop(self) -> None:
+        while not self.__stopped.wait(self.report_interval):
+            if any(stats.slow or stats.errors for stats in list(self.handlers.values())):
+                logger.warning("Slow handlers:\n" + self.report())
+
+    def profile(self, duration: float = 10, interval: float = 0.005,
+                output: typing.Optional[str] = None) -> typing.Dict[str, int]:
+        """采样分析事件分发线程，返回折叠栈（flamegraph.pl/speedscope格式），output不为空时写入文件"""
+        samples: typing.Counter[str] = collections.Counter()
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        deadline = time.monotonic() + duration
+        current = threading.get_ident()
+        while time.monotonic() < deadline:
+            with self.__lock:
+                active = set(self.dispatch_threads)
+            for ident, frame in sys._current_frames().items():
+                if ident == current or ident not in active:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(f"{frame.f_code.co_filename}:{frame.f_code.co_name}")
+                    frame = frame.f_back
+                stack.append(names.get(ident, str(ident)))
+                samples[";".join(reversed(stack))] += 1
+            time.sleep(interval)
+        if output is not None:
+            with open(output, "w", encoding="utf-8") as f:
+                for stack, count in samples.most_common():
+                    f.write(f"{stack} {count}\n")
+            logger.info(f"Profile written to {output}")
+        return dict(samples)
+
+    def enable_signal(self, signum: typing.Optional[int] = None, duration: float = 10,
+                      output: str = "profile-{time}.folded") -> None:
+        """收到信号时在后台采样分析（默认SIGUSR2，Windows下为SIGBREAK），需在主线程调用"""
+        if signum is None:
+            signum = getattr(signal, "SIGUSR2", None) or getattr(signal, "SIGBREAK")
+
+        def on_signal(*_):
+            path = output.format(time=time.strftime("%Y%m%d-%H%M%S"))
+            threading.Thread(target=self.profile, args=(duration, 0.005, path), daemon=True).start()
+
+        signal.signal(signum, on_signal)
+
+    def close(self) -> None:
+        self.__stopped.set()
+        if self.wechat.profiler is self:
+            self.wechat.profiler = None
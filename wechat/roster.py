@@ -0,0 +1,195 @@
+import bisect
+import sys
+import threading
+import typing
+
+from wechat.core import Event
+from wechat.events import GROUP_MEMBER_INCREASE_MESSAGE, GROUP_MEMBER_DECREASE_MESSAGE
+from wechat.logger import logger
+from wechat.utils import response_list
+
+# 微信at消息中昵称后的分隔符
+AT_SEPARATOR = "\u2005"
+
+
+def _intern(value: typing.Optional[str]) -> str:
+    return sys.intern(value) if value else ""
+
+
+class Member:
+    __slots__ = ("wxid", "nickname", "display_name")
+
+    def __init__(self, wxid: str, nickname: str = "", display_name: str = ""):
+        self.wxid = _intern(wxid)
+        self.nickname = _intern(nickname)
+        self.display_name = _intern(display_name)
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Member":
+        return cls(
+            data.get("wxid") or data.get("username") or data.get("user_name"),
+            data.get("nickname") or data.get("nick_name") or "",
+            data.get("room_nickname") or data.get("display_name") or ""
+        )
+
+    @property
+    def name(self) -> str:
+        return self.display_name or self.nickname or self.wxid
+
+    def __repr__(self) -> str:
+        return f"Member(wxid={self.wxid!r}, name={self.name!r})"
+
+
+class RoomRoster:
+    __slots__ = ("room_wxid", "members", "names")
+
+    def __init__(self, room_wxid: str, members: typing.Iterable[Member] = ()):
+        self.room_wxid = _intern(room_wxid)
+        self.members: typing.Dict[str, Member] = {}
+        self.names: typing.List[typing.Tuple[str, str]] = []
+        for member in members:
+            self.members[member.wxid] = member
+        self.names = sorted(pair for member in self.members.values() for pair in self.__name_keys(member))
+
+    @staticmethod
+    def __name_keys(member: Member) -> typing.Set[typing.Tuple[str, str]]:
+        return {(name, member.wxid) for name in (member.display_name, member.nickname) if name}
+
+    def add(self, member: Member) -> None:
+        self.remove(member.wxid)
+        self.members[member.wxid] = member
+        for pair in self.__name_keys(member):
+            bisect.insort(self.names, pair)
+
+    def remove(self, wxid: str) -> typing.Optional[Member]:
+        member = self.members.pop(wxid, None)
+        if member is not None:
+            for pair in self.__name_keys(member):
+                index = bisect.bisect_left(self.names, pair)
+                if index < len(self.names) and self.names[index] == pair:
+                    del self.names[index]
+        return member
+
+    def get(self, wxid: str) -> typing.Optional[Member]:
+        return self.members.get(wxid)
+
+    def find(self, name: str) -> typing.List[Member]:
+        """按群昵称/昵称精确查找"""
+        index = bisect.bisect_left(self.names, (name, ""))
+        result = []
+        while index < len(self.names) and self.names[index][0] == name:
+            result.append(self.members[self.names[index][1]])
+            index += 1
+        return result
+
+    def prefix(self, prefix: str, limit: int = 10) -> typing.List[Member]:
+        """按群昵称/昵称前缀查找"""
+        index = bisect.bisect_left(self.names, (prefix, ""))
+        result = []
+        while index < len(self.names) and len(result) < limit and self.names[index][0].startswith(prefix):
+            member = self.members[self.names[index][1]]
+            if member not in result:
+                result.append(member)
+            index += 1
+        return result
+
+    def __len__(self) -> int:
+        return len(self.members)
+
+    def __contains__(self, wxid: str) -> bool:
+        return wxid in self.members
+
+
+class RosterIndex:
+
+    def __init__(self, wechat, timeout: typing.Optional[int] = None):
+        self.wechat = wechat
+        self.timeout = timeout
+        self.rosters: typing.Dict[typing.Tuple[int, str], RoomRoster] = {}
+        self.__lock = threading.Lock()
+        wechat.handle(GROUP_MEMBER_INCREASE_MESSAGE)(self.on_member_increase)
+        wechat.handle(GROUP_MEMBER_DECREASE_MESSAGE)(self.on_member_decrease)
+
+    def roster(self, client_id: int, room_wxid: str, refresh: bool = False) -> RoomRoster:
+        """获取群成员索引（首次访问时通过get_room_members构建）"""
+        key = (client_id, room_wxid)
+        roster = self.rosters.get(key)
+        if roster is None or refresh:
+            response = self.wechat.get_room_members(client_id, room_wxid, self.timeout)
+            if response is None:
+                # 超时不缓存，保留旧索引（没有时返回空索引），下次访问重新获取
+                logger.warning(f"get_room_members of {room_wxid} got no response, roster not cached")
+                return roster if roster is not None else RoomRoster(room_wxid, ())
+            roster = RoomRoster(room_wxid, (
+                Member.from_dict(item) for item in response_list(response, "get_room_members")))
+            with self.__lock:
+                self.rosters[key] = roster
+            logger.debug(f"Roster of {room_wxid} built with {len(roster)} members")
+        return roster
+
+    def member(self, client_id: int, room_wxid: str, wxid: str) -> typing.Optional[Member]:
+        """获取群成员（索引中不存在时通过get_room_member_by_net补全）"""
+        roster = self.roster(client_id, room_wxid)
+        member = roster.get(wxid)
+        if member is None:
+            response = self.wechat.get_room_member_by_net(client_id, room_wxid, wxid, self.timeout)
+            if response:
+                member = Member.from_dict(dict(response, wxid=response.get("wxid") or wxid))
+                with self.__lock:
+                    roster.add(member)
+        return member
+
+    def display_name(self, client_id: int, room_wxid: str, wxid: str) -> str:
+        """获取群成员显示名称"""
+        member = self.member(client_id, room_wxid, wxid)
+        return member.name if member is not None else wxid
+
+    def resolve(self, client_id: int, room_wxid: str, names: typing.Iterable[str]) -> typing.List[Member]:
+        """将wxid或群昵称/昵称解析为群成员"""
+        roster = self.roster(client_id, room_wxid)
+        members = []
+        for name in names:
+            member = roster.get(name)
+            if member is None:
+                found = roster.find(name)
+                member = found[0] if found else None
+            if member is not None:
+                members.append(member)
+            else:
+                logger.warning(f"Member {name} not found in {room_wxid}")
+        return members
+
+    def build_at(self, client_id: int, room_wxid: str, content: str,
+                 names: typing.Iterable[str]) -> typing.Tuple[str, typing.List[str]]:
+        """构建群at消息的内容和at列表"""
+        members = self.resolve(client_id, room_wxid, names)
+        prefix = "".join(f"@{member.name}{AT_SEPARATOR}" for member in members)
+        return prefix + content, [member.wxid for member in members]
+
+    def send_room_at(self, client_id: int, room_wxid: str, content: str, names: typing.Iterable[str]) -> dict:
+        """发送群at消息（按wxid或群昵称/昵称）"""
+        content, at_list = self.build_at(client_id, room_wxid, content, names)
+        return self.wechat.send_room_at(client_id, room_wxid, content, at_list)
+
+    def send_room_at_by_cdn(self, client_id: int, room_wxid: str, content: str, names: typing.Iterable[str],
+                            timeout: typing.Optional[int] = None) -> dict:
+        """发送群at消息（CDN，按wxid或群昵称/昵称）"""
+        content, at_list = self.build_at(client_id, room_wxid, content, names)
+        return self.wechat.send_room_at_by_cdn(client_id, room_wxid, content, at_list, timeout=timeout)
+
+    def on_member_increase(self, wechat, event: Event) -> None:
+        roster = self.rosters.get((event["client_id"], event["data"].get("room_wxid")))
+        if roster is None:
+            return
+        with self.__lock:
+            # 群成员变动事件与get_room_members使用相同的member_list字段
+            for item in response_list(event["data"], "get_room_members"):
+                roster.add(Member.from_dict(item))
+
+    def on_member_decrease(self, wechat, event: Event) -> None:
+        roster = self.rosters.get((event["client_id"], event["data"].get("room_wxid")))
+        if roster is None:
+            return
+        with self.__lock:
+            for item in response_list(event["data"], "get_room_members"):
+                roster.remove(item.get("wxid") or item.get("username"))
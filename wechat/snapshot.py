@@ -0,0 +1,176 @@
+import json
+import pathlib
+import threading
+import time
+import typing
+
+from wechat.core import Event
+from wechat.events import CONTACT_CHANGE_MESSAGE, ROOM_CHANGE_MESSAGE, TAG_CHANGE_MESSAGE
+from wechat.logger import logger
+from wechat.utils import response_list
+
+# 快照类型: (获取方法, 主键字段, 变动事件)
+KINDS = {
+    "contacts": ("get_contacts", ["wxid", "username"], CONTACT_CHANGE_MESSAGE),
+    "rooms": ("get_rooms", ["wxid", "room_wxid", "username"], ROOM_CHANGE_MESSAGE),
+    "tags": ("get_tags", ["label_id", "id"], TAG_CHANGE_MESSAGE)
+}
+
+
+def _freeze(value: typing.Any) -> typing.Any:
+    # 列表/字典字段只在计算摘要时转成可哈希的形式，列中保存原值
+    if isinstance(value, (list, dict)):
+        return json.dumps(value, sort_keys=True, ensure_ascii=False)
+    return value
+
+
+class Snapshot:
+    __slots__ = ("fields", "keys", "index", "digests", "columns")
+
+    def __init__(self, fields: typing.List[str]):
+        self.fields = fields
+        self.keys: typing.List[typing.Any] = []
+        self.index: typing.Dict[typing.Any, int] = {}
+        self.digests: typing.List[int] = []
+        self.columns: typing.List[list] = [[] for _ in fields]
+
+    @classmethod
+    def from_rows(cls, fields: typing.List[str], rows: typing.Iterable[typing.Tuple[typing.Any, tuple]]) -> "Snapshot":
+        snapshot = cls(fields)
+        for key, values in rows:
+            snapshot.index[key] = len(snapshot.keys)
+            snapshot.keys.append(key)
+            snapshot.digests.append(hash(tuple(_freeze(value) for value in values)))
+            for column, value in zip(snapshot.columns, values):
+                column.append(value)
+        return snapshot
+
+    def row(self, key: typing.Any) -> typing.Optional[dict]:
+        index = self.index.get(key)
+        if index is None:
+            return None
+        return {field: column[index] for field, column in zip(self.fields, self.columns)}
+
+    def rows(self) -> typing.Iterator[typing.Tuple[typing.Any, tuple]]:
+        for index, key in enumerate(self.keys):
+            yield key, tuple(column[index] for column in self.columns)
+
+    def diff(self, new: "Snapshot") -> dict:
+        added, changed = [], []
+        for index, key in enumerate(new.keys):
+            old_index = self.index.get(key)
+            if old_index is None:
+                added.append(new.row(key))
+            elif self.digests[old_index] != new.digests[index]:
+                fields = {}
+                for field, old_column, new_column in zip(self.fields, self.columns, new.columns):
+                    if old_column[old_index] != new_column[index]:
+                        fields[field] = [old_column[old_index], new_column[index]]
+                if fields:
+                    changed.append({"key": key, "fields": fields})
+        removed = [key for key in self.keys if key not in new.index]
+        return {"added": added, "removed": removed, "changed": changed}
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+
+class SnapshotStore:
+
+    def __init__(
+            self,
+            wechat,
+            fields: typing.Optional[typing.Dict[str, typing.List[str]]] = None,
+            diff_dir: typing.Optional[str] = None,
+            timeout: typing.Optional[int] = None
+    ):
+        self.wechat = wechat
+        self.fields = fields or {}
+        self.diff_dir = pathlib.Path(diff_dir) if diff_dir else None
+        self.timeout = timeout
+        self.snapshots: typing.Dict[typing.Tuple[int, str], Snapshot] = {}
+        self.__lock = threading.Lock()
+        if self.diff_dir is not None:
+            self.diff_dir.mkdir(parents=True, exist_ok=True)
+
+    def __diff_file(self, client_id: int, kind: str) -> typing.Optional[pathlib.Path]:
+        return self.diff_dir / f"{client_id}_{kind}.jsonl" if self.diff_dir is not None else None
+
+    def __load(self, client_id: int, kind: str) -> typing.Optional[Snapshot]:
+        diff_file = self.__diff_file(client_id, kind)
+        if diff_file is None or not diff_file.exists():
+            return None
+        fields, rows = None, {}
+        with open(diff_file, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    logger.warning(f"Skip broken diff record in {diff_file}")
+                    continue
+                fields = record.get("fields", fields)
+                for row in record["added"]:
+                    rows[row[fields[0]]] = row
+                for key in record["removed"]:
+                    rows.pop(key, None)
+                for change in record["changed"]:
+                    for field, (_, value) in change["fields"].items():
+                        rows[change["key"]][field] = value
+        if fields is None:
+            return None
+        return Snapshot.from_rows(fields, ((key, tuple(row.get(f) for f in fields)) for key, row in rows.items()))
+
+    def __append(self, client_id: int, kind: str, record: dict) -> None:
+        diff_file = self.__diff_file(client_id, kind)
+        if diff_file is None:
+            return
+        with open(diff_file, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def __build(self, kind: str, items: list, previous: typing.Optional[Snapshot]) -> Snapshot:
+        key_fields = KINDS[kind][1]
+        items = [item for item in items if isinstance(item, dict)]
+        if previous is not None:
+            fields = previous.fields
+        elif kind in self.fields:
+            fields = list(self.fields[kind])
+        else:
+            key_field = next((field for field in key_fields if items and field in items[0]), key_fields[0])
+            fields = [key_field] + sorted({field for item in items for field in item} - {key_field})
+        return Snapshot.from_rows(fields, (
+            (item.get(fields[0]), tuple(item.get(field) for field in fields))
+            for item in items if item.get(fields[0]) is not None
+        ))
+
+    def get(self, client_id: int, kind: str) -> typing.Optional[Snapshot]:
+        with self.__lock:
+            key = (client_id, kind)
+            if key not in self.snapshots:
+                snapshot = self.__load(client_id, kind)
+                if snapshot is not None:
+                    self.snapshots[key] = snapshot
+            return self.snapshots.get(key)
+
+    def refresh(self, client_id: int, kind: str = "contacts") -> dict:
+        """拉取最新的好友/群/标签列表，计算并推送变动"""
+        method, _, msg_type = KINDS[kind]
+        response = getattr(self.wechat, method)(client_id, timeout=self.timeout)
+        if response is None:
+            raise Exception(f"{method} got no response")
+
+        previous = self.get(client_id, kind)
+        snapshot = self.__build(kind, response_list(response, method), previous)
+        diff = (previous or Snapshot(snapshot.fields)).diff(snapshot)
+        with self.__lock:
+            self.snapshots[(client_id, kind)] = snapshot
+
+        if diff["added"] or diff["removed"] or diff["changed"]:
+            record = dict(diff, time=int(time.time()))
+            if previous is None:
+                record["fields"] = snapshot.fields
+            self.__append(client_id, kind, record)
+            if previous is not None:
+                self.wechat.process_event(Event(msg_type, client_id, dict(diff, kind=kind)))
+        logger.debug(f"{kind} of client {client_id}: {len(diff['added'])} added, {len(diff['removed'])} removed, "
+                     f"{len(diff['changed'])} changed")
+        return diff
@@ -0,0 +1,159 @@
+"""生成wechat/core.pyi：core.py中的定义加上由命令注册表生成的WeChat方法（python -m wechat.stubgen）"""
+import ast
+import inspect
+import pathlib
+import typing
+
+from wechat.commands import COMMANDS, Command, _MISSING
+
+CORE_FILE = pathlib.Path(__file__).with_name("core.py")
+STUB_FILE = CORE_FILE.with_suffix(".pyi")
+MAX_LINE = 120
+
+HEADER = "# 由wechat/stubgen.py生成，请勿手动修改（修改core.py或命令注册表后执行python -m wechat.stubgen）\n"
+
+
+def _private(name: str) -> bool:
+    return name.startswith("__") and not name.endswith("__")
+
+
+def _def(indent: str, decorators: typing.List[str], name: str, params: typing.List[str], returns: typing.Optional[str],
+         doc: typing.Optional[str]) -> str:
+    lines = [f"{indent}@{decorator}" for decorator in decorators]
+    suffix = f" -> {returns}:" if returns else ":"
+    line = f"{indent}def {name}({', '.join(params)}){suffix}"
+    if len(line) <= MAX_LINE:
+        lines.append(line)
+    else:
+        lines.append(f"{indent}def {name}(")
+        lines.append(",\n".join(f"{indent}        {param}" for param in params))
+        lines.append(f"{indent}){suffix}")
+    if doc:
+        lines.append(f'{indent}    """{doc}"""')
+    lines.append(f"{indent}    ...")
+    return "\n".join(lines)
+
+
+def _params(args: ast.arguments) -> typing.List[str]:
+    params = []
+    positional = args.posonlyargs + args.args
+    defaults = [None] * (len(positional) - len(args.defaults)) + list(args.defaults)
+    for arg, default in zip(positional, defaults):
+        params.append(_param(arg, default))
+    if args.vararg is not None:
+        params.append("*" + _param(args.vararg, None))
+    elif args.kwonlyargs:
+        params.append("*")
+    for arg, default in zip(args.kwonlyargs, args.kw_defaults):
+        params.append(_param(arg, default))
+    if args.kwarg is not None:
+        params.append("**" + _param(args.kwarg, None))
+    return params
+
+
+def _param(arg: ast.arg, default: typing.Optional[ast.expr]) -> str:
+    param = arg.arg
+    if arg.annotation is not None:
+        param += f": {ast.unparse(arg.annotation)}"
+    if default is not None:
+        param += " = ..." if arg.annotation is not None else "=..."
+    return param
+
+
+def _function(node: ast.FunctionDef, indent: str) -> str:
+    return _def(indent, [ast.unparse(decorator) for decorator in node.decorator_list], node.name,
+                _params(node.args), ast.unparse(node.returns) if node.returns else None, ast.get_docstring(node))
+
+
+def _infer(value: ast.expr, params: typing.Dict[str, str]) -> str:
+    # 未注解的属性：同名参数的注解、常量的类型或构造的类，其余为typing.Any
+    if isinstance(value, ast.Name) and value.id in params:
+        return params[value.id]
+    if isinstance(value, ast.Constant) and type(value.value) in (bool, int, float, str):
+        return type(value.value).__name__
+    if isinstance(value, ast.JoinedStr):
+        return "str"
+    if isinstance(value, ast.Call) and isinstance(value.func, (ast.Name, ast.Attribute)):
+        name = ast.unparse(value.func)
+        if name.rsplit(".", 1)[-1][:1].isupper():
+            return name
+    return "typing.Any"
+
+
+def _attributes(init: ast.FunctionDef) -> typing.Dict[str, str]:
+    # __init__中赋值的公开属性
+    params = {arg.arg: ast.unparse(arg.annotation) for arg in init.args.args if arg.annotation is not None}
+    attributes = {}
+    for statement in init.body:
+        if isinstance(statement, ast.AnnAssign):
+            targets, annotation = [statement.target], ast.unparse(statement.annotation)
+        elif isinstance(statement, ast.Assign):
+            targets, annotation = statement.targets, _infer(statement.value, params)
+        else:
+            continue
+        for target in targets:
+            if (isinstance(target, ast.Attribute) and isinstance(target.value, ast.Name)
+                    and target.value.id == "self" and not _private(target.attr)):
+                attributes.setdefault(target.attr, annotation)
+    return attributes
+
+
+def _class(node: ast.ClassDef, extra: typing.List[str]) -> str:
+    bases = ", ".join(ast.unparse(base) for base in node.bases)
+    lines = [f"class {node.name}({bases}):" if bases else f"class {node.name}:"]
+    doc = ast.get_docstring(node)
+    if doc:
+        lines.append(f'    """{doc}"""')
+    body = []
+    for statement in node.body:
+        if isinstance(statement, ast.Assign) and not any(
+                isinstance(target, ast.Name) and _private(target.id) for target in statement.targets):
+            body.append(f"    {ast.unparse(statement)}")
+        elif isinstance(statement, ast.FunctionDef) and statement.name == "__init__":
+            body.extend(f"    {name}: {annotation}" for name, annotation in _attributes(statement).items())
+    for statement in node.body:
+        if isinstance(statement, ast.FunctionDef) and not _private(statement.name):
+            body.append("\n" + _function(statement, "    "))
+    body.extend("\n" + method for method in extra)
+    return "\n".join(lines + (body or ["    ..."]))
+
+
+def _annotation(annotation: typing.Any) -> str:
+    # typing中的注解保留typing.前缀，不依赖core.py从typing导入了哪些名称
+    if isinstance(annotation, type):
+        return inspect.formatannotation(annotation)
+    return repr(annotation)
+
+
+def command_stub(command: Command) -> str:
+    """注册表中命令生成的方法的存根"""
+    params = ["self", "client_id: int"]
+    for field in command.fields:
+        param = f"{field.name}: {_annotation(field.annotation)}"
+        if field.default is not _MISSING:
+            param += " = ..."
+        params.append(param)
+    if command.sync:
+        params.append("timeout: typing.Optional[int] = ...")
+    return _def("    ", [], command.name, params, "dict", command.doc)
+
+
+def generate(source: typing.Optional[str] = None) -> str:
+    """根据core.py源码和命令注册表生成存根内容"""
+    module = ast.parse(source if source is not None else CORE_FILE.read_text(encoding="utf-8"))
+    parts, imports = [], []
+    for node in module.body:
+        if isinstance(node, (ast.Import, ast.ImportFrom)):
+            imports.append(ast.unparse(node))
+        elif isinstance(node, ast.ClassDef):
+            extra = [command_stub(command) for command in COMMANDS.values()
+                     if command.generate] if node.name == "WeChat" else []
+            parts.append(_class(node, extra))
+        elif isinstance(node, ast.FunctionDef) and not node.name.startswith("_"):
+            parts.append(_function(node, ""))
+    return HEADER + "\n".join(imports) + "\n\n\n" + "\n\n\n".join(parts) + "\n"
+
+
+if __name__ == "__main__":
+    STUB_FILE.write_text(generate(), encoding="utf-8")
+    print(f"Stub written to {STUB_FILE}")
@@ -0,0 +1,181 @@
+import concurrent.futures
+import json
+import os
+import pathlib
+import threading
+import typing
+
+from wechat.logger import logger
+from wechat.utils import response_list
+
+def parse_label_ids(data: typing.Any) -> typing.Set[int]:
+    if isinstance(data, dict):
+        for field in ["labelid_list", "label_id_list", "label_ids"]:
+            value = data.get(field)
+            if isinstance(value, str):
+                return {int(label_id) for label_id in value.split(",") if label_id.strip()}
+            if isinstance(value, list):
+                return {int(label_id) for label_id in value}
+    label_ids = set()
+    for item in response_list(data, "get_contact_tags"):
+        if isinstance(item, dict):
+            label_id = item.get("label_id", item.get("id"))
+            if label_id is not None:
+                label_ids.add(int(label_id))
+        elif item is not None:
+            label_ids.add(int(item))
+    return label_ids
+
+
+class TagManager:
+
+    def __init__(
+            self,
+            wechat,
+            max_workers: int = 4,
+            checkpoint_file: typing.Optional[str] = None,
+            timeout: typing.Optional[int] = None
+    ):
+        self.wechat = wechat
+        self.max_workers = max_workers
+        self.checkpoint_file = pathlib.Path(checkpoint_file) if checkpoint_file else None
+        self.timeout = timeout
+        self.labels: typing.Dict[int, typing.Dict[str, int]] = {}
+        self.contact_labels: typing.Dict[typing.Tuple[int, str], typing.FrozenSet[int]] = {}
+        self.__lock = threading.Lock()
+
+    def get_labels(self, client_id: int, refresh: bool = False) -> typing.Dict[str, int]:
+        """获取标签名称到标签id的映射（缓存get_tags结果）"""
+        if refresh or client_id not in self.labels:
+            labels = {}
+            for item in response_list(self.wechat.get_tags(client_id, self.timeout), "get_tags"):
+                if isinstance(item, dict) and item.get("label_name") is not None:
+                    labels[item["label_name"]] = int(item.get("label_id", item.get("id")))
+            self.labels[client_id] = labels
+        return self.labels[client_id]
+
+    def ensure_labels(self, client_id: int, names: typing.Iterable[str]) -> typing.Set[int]:
+        """将标签名称转为标签id，不存在的标签会被创建"""
+        labels = self.get_labels(client_id)
+        missing = [name for name in names if name not in labels]
+        for name in missing:
+            self.wechat.add_tag(client_id, name, self.timeout)
+        if missing:
+            labels = self.get_labels(client_id, refresh=True)
+        return {labels[name] for name in names if name in labels}
+
+    def get_contact_labels(self, client_id: int, wxid: str, refresh: bool = False) -> typing.FrozenSet[int]:
+        """获取联系人标签id（缓存get_contact_tags结果）"""
+        key = (client_id, wxid)
+        if refresh or key not in self.contact_labels:
+            response = self.wechat.get_contact_tags(client_id, wxid, self.timeout)
+            if response is None:
+                raise Exception(f"get_contact_tags({wxid}) got no response")
+            self.contact_labels[key] = frozenset(parse_label_ids(response))
+        return self.contact_labels[key]
+
+    def seed(self, client_id: int, contact_labels: typing.Dict[str, typing.Iterable[int]]) -> None:
+        """使用已知的联系人标签初始化缓存（例如来自好友列表快照），避免逐个查询"""
+        for wxid, label_ids in contact_labels.items():
+            self.contact_labels[(client_id, wxid)] = frozenset(int(label_id) for label_id in label_ids)
+
+    def plan(self, client_id: int, wxids: typing.Iterable[str], add: typing.Iterable[int] = (),
+             remove: typing.Iterable[int] = (), failed: typing.Optional[typing.Dict[str, str]] = None
+             ) -> typing.Dict[typing.FrozenSet[int], typing.List[str]]:
+        """计算最小修改计划：按目标标签集合分组，跳过无需修改的联系人，无法计划的联系人及原因写入failed"""
+        add, remove = frozenset(add), frozenset(remove)
+        wxids = list(dict.fromkeys(wxids))
+        failed = {} if failed is None else failed
+        unknown = [wxid for wxid in wxids if (client_id, wxid) not in self.contact_labels]
+        if unknown:
+            with concurrent.futures.ThreadPoolExecutor(self.max_workers) as executor:
+                futures = {executor.submit(self.get_contact_labels, client_id, wxid): wxid for wxid in unknown}
+                for future in concurrent.futures.as_completed(futures):
+                    try:
+                        future.result()
+                    except Exception as e:
+                        failed[futures[future]] = str(e)
+
+        plan: typing.Dict[typing.FrozenSet[int], typing.List[str]] = {}
+        for wxid in wxids:
+            current = self.contact_labels.get((client_id, wxid))
+            if current is None:
+                continue
+            target = (current | add) - remove
+            if target == current:
+                continue
+            if not target:
+                # add_tags_to_contact不能清空联系人的全部标签
+                failed[wxid] = "cannot remove all labels of a contact"
+                continue
+            plan.setdefault(target, []).append(wxid)
+        if failed:
+            logger.warning(f"{len(failed)} contacts left out of the retag plan")
+        return plan
+
+    def __load_checkpoint(self) -> typing.Set[typing.Tuple[str, str]]:
+        # 检查点记录(wxid, 目标标签列表)，只跳过设置过相同目标标签的联系人，不同的修改计划互不影响
+        if self.checkpoint_file is None or not self.checkpoint_file.exists():
+            return set()
+        with open(self.checkpoint_file, "r", encoding="utf-8") as f:
+            return {tuple(item) for item in json.load(f) if isinstance(item, list) and len(item) == 2}
+
+    def __save_checkpoint(self, done: typing.Set[typing.Tuple[str, str]]) -> None:
+        if self.checkpoint_file is None:
+            return
+        tmp_file = self.checkpoint_file.with_suffix(self.checkpoint_file.suffix + ".tmp")
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump(sorted(done), f)
+        os.replace(tmp_file, self.checkpoint_file)
+
+    def apply(self, client_id: int, plan: typing.Dict[typing.FrozenSet[int], typing.List[str]],
+              progress: typing.Optional[typing.Callable[[int, int], None]] = None,
+              checkpoint_every: int = 100) -> typing.Dict[str, str]:
+        """执行修改计划，返回失败的联系人及原因"""
+        done = self.__load_checkpoint()
+        label_id_lists = {target: ",".join(str(label_id) for label_id in sorted(target)) for target in plan}
+        tasks = [(target, wxid) for target, wxids in plan.items() for wxid in wxids
+                 if (wxid, label_id_lists[target]) not in done]
+        total, finished, failed = len(tasks), 0, {}
+
+        def retag(target: typing.FrozenSet[int], label_id_list: str, wxid: str) -> None:
+            # add_tags_to_contact会覆盖联系人的全部标签，因此传入目标标签集合
+            response = self.wechat.add_tags_to_contact(client_id, wxid, label_id_list, self.timeout)
+            if response is None:
+                raise Exception("no response")
+            self.contact_labels[(client_id, wxid)] = target
+
+        with concurrent.futures.ThreadPoolExecutor(self.max_workers) as executor:
+            futures = {
+                executor.submit(retag, target, label_id_lists[target], wxid): (wxid, label_id_lists[target])
+                for target, wxid in tasks
+            }
+            for future in concurrent.futures.as_completed(futures):
+                wxid, label_id_list = futures[future]
+                try:
+                    future.result()
+                    done.add((wxid, label_id_list))
+                except Exception as e:
+                    failed[wxid] = str(e)
+                finished += 1
+                if finished % checkpoint_every == 0 or finished == total:
+                    self.__save_checkpoint(done)
+                    logger.info(f"Retag progress {finished}/{total}, {len(failed)} failed")
+                if progress is not None:
+                    progress(finished, total)
+
+        if not failed and self.checkpoint_file is not None and self.checkpoint_file.exists():
+            self.checkpoint_file.unlink()
+        return failed
+
+    def bulk_update(self, client_id: int, wxids: typing.Iterable[str], add: typing.Iterable[str] = (),
+                    remove: typing.Iterable[str] = (),
+                    progress: typing.Optional[typing.Callable[[int, int], None]] = None) -> typing.Dict[str, str]:
+        """批量给联系人添加/移除标签（按标签名称）"""
+        add_ids = self.ensure_labels(client_id, add)
+        labels = self.get_labels(client_id)
+        remove_ids = {labels[name] for name in remove if name in labels}
+        failed: typing.Dict[str, str] = {}
+        plan = self.plan(client_id, wxids, add_ids, remove_ids, failed)
+        failed.update(self.apply(client_id, plan, progress))
+        return failed
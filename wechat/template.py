@@ -0,0 +1,43 @@
+import binascii
+import json
+import typing
+
+
+def _hex(text: str) -> bytes:
+    return binascii.hexlify(text.encode("utf-8"))
+
+
+# 预编码的消息模板：固定部分只序列化一次，发送时只编码变化的字段
+class CommandTemplate:
+
+    def __init__(self, msg_type: int, fixed: typing.Optional[dict] = None, variables: typing.Iterable[str] = ()):
+        self.msg_type = msg_type
+        self.fixed = dict(fixed or {})
+        self.variables = tuple(variables)
+        if set(self.fixed) & set(self.variables):
+            raise ValueError("fixed fields and variables must not overlap.")
+
+        fields = [f"{json.dumps(key, ensure_ascii=False)}: {json.dumps(value, ensure_ascii=False)}"
+                  for key, value in self.fixed.items()]
+        segments = []
+        text = f'{{"type": {json.dumps(msg_type)}, "data": {{' + ", ".join(fields)
+        for i, variable in enumerate(self.variables):
+            separator = ", " if fields or i else ""
+            segments.append(_hex(text + f"{separator}{json.dumps(variable, ensure_ascii=False)}: "))
+            text = ""
+        segments.append(_hex(text + "}}"))
+        self.segments = tuple(segments)
+
+    def render(self, **values) -> bytes:
+        """生成hex编码的消息体"""
+        parts = [self.segments[0]]
+        try:
+            for variable, segment in zip(self.variables, self.segments[1:]):
+                parts.append(_hex(json.dumps(values[variable], ensure_ascii=False)))
+                parts.append(segment)
+        except KeyError as e:
+            raise TypeError(f"missing template value: {e.args[0]}")
+        return b"".join(parts)
+
+    def __repr__(self) -> str:
+        return f"CommandTemplate(type={self.msg_type}, fixed={self.fixed}, variables={self.variables})"
@@ -0,0 +1,216 @@
+import concurrent.futures
+import json
+import math
+import os
+import threading
+import time
+import typing
+
+from wechat.commands import Command
+from wechat.logger import logger
+
+
+# 对数分桶的分位数估计（相对误差约为(gamma - 1) / 2）
+class LatencySketch:
+
+    def __init__(self, gamma: float = 1.1, min_value: float = 0.001, max_count: int = 2000,
+                 buckets: typing.Optional[typing.Dict[int, float]] = None):
+        self.gamma = gamma
+        self.min_value = min_value
+        self.max_count = max_count
+        self.buckets: typing.Dict[int, float] = buckets or {}
+        self.count = sum(self.buckets.values())
+        self.__log_gamma = math.log(gamma)
+
+    def add(self, value: float) -> None:
+        index = max(0, math.ceil(math.log(max(value, self.min_value) / self.min_value) / self.__log_gamma))
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+        self.count += 1
+        if self.count > self.max_count:
+            # 衰减旧样本，使分位数跟随最近的延迟变化
+            self.buckets = {index: count / 2 for index, count in self.buckets.items() if count >= 1}
+            self.count = sum(self.buckets.values())
+
+    def quantile(self, q: float) -> typing.Optional[float]:
+        if not self.count:
+            return None
+        rank = q * self.count
+        total = 0
+        for index in sorted(self.buckets):
+            total += self.buckets[index]
+            if total >= rank:
+                return self.min_value * self.gamma ** index
+        return self.min_value * self.gamma ** max(self.buckets)
+
+
+class CommandLatency:
+    __slots__ = ("ewma", "sketch", "samples", "timeouts", "hedges", "hedge_wins")
+
+    def __init__(self, ewma: float = 0.0, buckets: typing.Optional[dict] = None, samples: int = 0):
+        self.ewma = ewma
+        self.sketch = LatencySketch(buckets=buckets)
+        self.samples = samples
+        self.timeouts = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+
+class AdaptiveTimeouts:
+
+    def __init__(
+            self,
+            wechat,
+            state_file: typing.Optional[str] = "timeouts.json",
+            factor: float = 3,
+            quantile: float = 0.99,
+            min_timeout: float = 1,
+            max_timeout: float = 120,
+            min_samples: int = 20,
+            alpha: float = 0.2,
+            hedge: bool = False,
+            hedge_quantile: float = 0.95,
+            hedge_workers: int = 32,
+            save_interval: float = 60
+    ):
+        self.wechat = wechat
+        self.state_file = state_file
+        self.factor = factor
+        self.quantile = quantile
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.min_samples = min_samples
+        self.alpha = alpha
+        self.hedge_quantile = hedge_quantile
+        self.save_interval = save_interval
+        self.latencies: typing.Dict[str, CommandLatency] = {}
+        self.__lock = threading.Lock()
+        self.__save_lock = threading.Lock()
+        self.__saved_at = time.monotonic()
+        self.__executor = None
+        self.__load()
+        wechat.command_hooks.append(self.on_command)
+        if hedge:
+            self.__executor = concurrent.futures.ThreadPoolExecutor(hedge_workers, thread_name_prefix="hedge")
+            wechat.read_sender = self.send_hedged
+
+    def __load(self) -> None:
+        if self.state_file is None or not os.path.exists(self.state_file):
+            return
+        with open(self.state_file, "r", encoding="utf-8") as f:
+            state = json.load(f)
+        for name, item in state.items():
+            buckets = {int(index): count for index, count in item["buckets"].items()}
+            self.latencies[name] = CommandLatency(item["ewma"], buckets, item["samples"])
+            if item.get("timeout") is not None:
+                self.wechat.command_timeouts[name] = item["timeout"]
+
+    def save(self) -> None:
+        """保存学习到的延迟和超时"""
+        if self.state_file is None:
+            return
+        with self.__lock:
+            state = {
+                name: {
+                    "ewma": latency.ewma,
+                    "samples": latency.samples,
+                    "buckets": latency.sketch.buckets,
+                    "timeout": self.wechat.command_timeouts.get(name)
+                }
+                for name, latency in self.latencies.items()
+            }
+            self.__saved_at = time.monotonic()
+        # 同一时间只有一个线程写临时文件
+        with self.__save_lock:
+            tmp_file = f"{self.state_file}.tmp"
+            with open(tmp_file, "w", encoding="utf-8") as f:
+                json.dump(state, f)
+            os.replace(tmp_file, self.state_file)
+
+    def current_timeout(self, command: Command) -> float:
+        return self.wechat.timeout_for(command)
+
+    def on_command(self, wechat, command: Command, client_id: int, elapsed: float, response: typing.Any,
+                   error: typing.Optional[BaseException]) -> None:
+        # 抛出异常（熔断、连接失败等）的命令与延迟无关，不记录也不放宽超时
+        if not command.sync or error is not None:
+            return
+        with self.__lock:
+            latency = self.latencies.get(command.name)
+            if latency is None:
+                latency = self.latencies[command.name] = CommandLatency()
+            if response is None:
+                # 超时只说明真实延迟大于当前超时，放宽超时而不记录样本
+                latency.timeouts += 1
+                if latency.samples >= self.min_samples:
+                    wechat.command_timeouts[command.name] = min(self.max_timeout, self.current_timeout(command) * 2)
+            else:
+                latency.ewma = elapsed if not latency.samples else latency.ewma + self.alpha * (elapsed - latency.ewma)
+                latency.sketch.add(elapsed)
+                latency.samples += 1
+                if latency.samples >= self.min_samples:
+                    timeout = latency.sketch.quantile(self.quantile) * self.factor
+                    wechat.command_timeouts[command.name] = min(self.max_timeout, max(self.min_timeout, timeout))
+            save = time.monotonic() - self.__saved_at >= self.save_interval
+            if save:
+                # 只由一个线程负责本轮保存
+                self.__saved_at = time.monotonic()
+        if save:
+            try:
+                self.save()
+            except Exception as e:
+                # 保存失败不影响命令本身的结果
+                logger.warning(f"Save adaptive timeouts to {self.state_file} failed: {e}")
+
+    def send_hedged(self, wechat, command: Command, client_id: int, data: dict, timeout: float) -> typing.Any:
+        """只读命令在超过hedge_quantile延迟仍未返回时再发送一次，取先返回的结果"""
+        latency = self.latencies.get(command.name)
+        if latency is None or latency.samples < self.min_samples:
+            return wechat.send_sync(client_id, data, timeout)
+        delay = latency.sketch.quantile(self.hedge_quantile)
+        if delay >= timeout:
+            return wechat.send_sync(client_id, data, timeout)
+
+        deadline = time.monotonic() + timeout
+        first = self.__executor.submit(wechat.send_sync, client_id, data, timeout)
+        try:
+            return first.result(delay)
+        except concurrent.futures.TimeoutError:
+            pass
+        latency.hedges += 1
+        second = self.__executor.submit(wechat.send_sync, client_id, {**data, "trace": None},
+                                        max(0.0, deadline - time.monotonic()))
+        pending = {first, second}
+        while pending:
+            done, pending = concurrent.futures.wait(pending, max(0.0, deadline - time.monotonic()),
+                                                    concurrent.futures.FIRST_COMPLETED)
+            if not done:
+                break
+            for future in done:
+                response = future.result()
+                if response is not None:
+                    if future is second:
+                        latency.hedge_wins += 1
+                    return response
+        logger.warning(f"{command.name} got no response after hedging")
+        return None
+
+    def stats(self) -> typing.Dict[str, dict]:
+        with self.__lock:
+            return {
+                name: {
+                    "samples": latency.samples,
+                    "ewma": latency.ewma,
+                    "p50": latency.sketch.quantile(0.5),
+                    "p99": latency.sketch.quantile(0.99),
+                    "timeout": self.wechat.command_timeouts.get(name),
+                    "timeouts": latency.timeouts,
+                    "hedges": latency.hedges,
+                    "hedge_wins": latency.hedge_wins
+                }
+                for name, latency in self.latencies.items()
+            }
+
+    def close(self) -> None:
+        self.save()
+        if self.__executor is not None:
+            self.__executor.shutdown(wait=False)
@@ -1,7 +1,9 @@
-import copy
 import typing
 import pathlib
+import socket
 import subprocess
+import threading
+import time
 
 import psutil
 import xmltodict
@@ -18,19 +20,92 @@ def hook(pid: int, ip: str, port: int, callback_url) -> subprocess.Popen:
 
 
 def get_processes(process_name: str) -> typing.List[psutil.Process]:
+    process_name = process_name.lower()
     processes = []
     for process in psutil.process_iter():
-        if process.name().lower() == process_name.lower():
-            processes.append(process)
+        try:
+            if process.name().lower() == process_name:
+                processes.append(process)
+        except psutil.Error:
+            # 遍历期间退出的进程
+            pass
     return processes
 
 
+# 响应（get_response_data的结果）不是列表时，列表所在的字段，按命令名登记
+RESPONSE_LIST_FIELDS = {
+    "get_room_members": "member_list",
+    "get_tags": "label_list",
+    "get_contact_tags": "label_list",
+    "get_live_room_online_users": "user_list",
+    "get_live_room_updates": "msg_list"
+}
+
+
+def response_list(data: typing.Any, command: str) -> list:
+    """取命令响应中的列表：响应本身是列表，或在RESPONSE_LIST_FIELDS登记的字段中"""
+    if isinstance(data, list):
+        return data
+    field = RESPONSE_LIST_FIELDS.get(command)
+    if field is not None and isinstance(data, dict) and isinstance(data.get(field), list):
+        return data[field]
+    return []
+
+
+def wait_for_port(host: str, port: int, timeout: float = 10, interval: float = 0.02) -> bool:
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            with socket.create_connection((host, port), timeout=interval * 10):
+                return True
+        except OSError:
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(interval)
+
+
+class TokenBucket:
+
+    def __init__(self, rate: float, capacity: float = 1):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def __refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def try_acquire(self, tokens: float = 1) -> float:
+        """尝试获取令牌，成功返回0，否则返回需要等待的秒数"""
+        with self.lock:
+            self.__refill(time.monotonic())
+            if self.tokens >= tokens:
+                self.tokens -= tokens
+                return 0
+            return (tokens - self.tokens) / self.rate
+
+    def acquire(self, tokens: float = 1, timeout: typing.Optional[float] = None) -> bool:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            wait = self.try_acquire(tokens)
+            if wait == 0:
+                return True
+            if deadline is not None and time.monotonic() + wait > deadline:
+                return False
+            time.sleep(wait)
+
+
 def parse_xml(xml: str) -> dict:
     return xmltodict.parse(xml)
 
 
-def parse_event(event: dict) -> dict:
-    data = copy.deepcopy(event)
+def parse_event(event: typing.Any) -> typing.Any:
+    data = event.copy()
+    if not isinstance(data["data"], dict):
+        return data
+    data["data"] = dict(data["data"])
     for field in ["raw_msg"]:
         try:
             data["data"][field] = parse_xml(data["data"][field])
@@ -65,10 +140,8 @@ def get_image_info(data: bytes) -> typing.Union[typing.Tuple[str, int], None]:
 
 
 def decode_image_data(data: bytes, key: int) -> bytes:
-    image_data = []
-    for byte in data:
-        image_data.append(byte ^ key)
-    return bytes(image_data)
+    # 单字节异或等价于查表替换，bytes.translate在C层完成
+    return data.translate(bytes(byte ^ key for byte in range(256)))
 
 
 def decode_image(src_file: str, output_path: str = ".") -> typing.Tuple[str, str]: